@@ -52,6 +52,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.loader.RequestLoaderMiddleware',
 ]
 
 ROOT_URLCONF = 'RentalApp.urls'
@@ -100,7 +101,7 @@ REST_FRAMEWORK = {
         'rest_framework.filters.SearchFilter',
         'rest_framework.filters.OrderingFilter',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.OptionalCursorPagination', # ?pagination=cursor for keyset pages
     'PAGE_SIZE': 20,
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'users.authentication.CookieJWTAuthentication',
@@ -137,6 +138,29 @@ SPECTACULAR_SETTINGS = {
     'SERVE_INCLUDE_SCHEMA': False,
 }
 
+# Listing search index
+SEARCH_INDEX_MAX_RESULTS = 1000
+SEARCH_INDEX_REBUILD_SECONDS = 300 # picks up changes made by other worker processes
+
+# Buffered listing views, at most VIEW_COUNTER_MAX_PENDING views per worker can be lost on a crash
+VIEW_COUNTER_FLUSH_SECONDS = env.int('VIEW_COUNTER_FLUSH_SECONDS', 5)
+VIEW_COUNTER_MAX_PENDING = env.int('VIEW_COUNTER_MAX_PENDING', 200)
+
+# Buffered search history, repeats of the same search by the same client are ignored within the dedupe window
+SEARCH_HISTORY_FLUSH_SECONDS = env.int('SEARCH_HISTORY_FLUSH_SECONDS', 5)
+SEARCH_HISTORY_MAX_PENDING = env.int('SEARCH_HISTORY_MAX_PENDING', 200)
+SEARCH_HISTORY_DEDUPE_SECONDS = 300
+
+# Popular searches, top queries kept per hour and checkpointed to db
+SEARCH_TRENDS_CAPACITY = 100
+SEARCH_TRENDS_CHECKPOINT_SECONDS = env.int('SEARCH_TRENDS_CHECKPOINT_SECONDS', 60)
+
+# Trending listings, score of an event halves every TRENDING_HALF_LIFE_HOURS
+TRENDING_HALF_LIFE_HOURS = 72
+TRENDING_WEIGHTS = {'view': 1, 'favorite': 3, 'booking': 5}
+# events are counted up to this long before each run, buffered views reach the db up to VIEW_COUNTER_FLUSH_SECONDS late
+TRENDING_EVENT_LAG_SECONDS = max(60, VIEW_COUNTER_FLUSH_SECONDS * 4)
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
@@ -149,3 +173,22 @@ STATIC_URL = 'static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Cache backend, shared by worker processes when CACHE_URL points to redis/memcached
+CACHES = {
+    'default': env.cache_url('CACHE_URL', default='locmemcache://'),
+}
+
+# Cached GET responses of public listing endpoints, purged by model signals on change
+RESPONSE_CACHE_TIMEOUT = env.int('RESPONSE_CACHE_TIMEOUT', 60)
+
+# Compiled nightly price calendars of listings, rebuilt when pricing rules or the base price change
+PRICING_HORIZON_DAYS = 730
+PRICING_CACHE_TIMEOUT = env.int('PRICING_CACHE_TIMEOUT', 24 * 3600)
+
+# Pending bookings expire at check-in or when the owner did not answer within this window
+BOOKING_OWNER_RESPONSE_HOURS = env.int('BOOKING_OWNER_RESPONSE_HOURS', 72)
+
+# Row locks (bookings of one listing) are taken with NOWAIT and retried with exponential backoff
+LOCK_RETRY_ATTEMPTS = 8
+LOCK_RETRY_BACKOFF_SECONDS = 0.02
@@ -26,6 +26,7 @@ urlpatterns = [
     path('api/', include('listings.urls')),
     path('api/', include('bookings.urls')),
     path('api/', include('reviews.urls')),
+    path('api/', include('core.urls')),
 
     path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
     path('api/docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger'),
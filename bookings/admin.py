@@ -1,5 +1,6 @@
 from django.contrib import admin
 from django import forms
+from django.db import transaction
 from .models import Booking, BookingStatusHistory
 from .services import BookingService
 
@@ -35,8 +36,7 @@ class BookingAdminForm(forms.ModelForm):
             if tenant and listing.owner == tenant:
                 raise forms.ValidationError({'tenant': 'Owner cannot book their own listing'})
 
-            nights = (check_out - check_in).days
-            cleaned_data['total_price'] = listing.price_per_night * nights
+            cleaned_data['total_price'] = BookingService.calculate_price(listing, check_in, check_out)
 
         return cleaned_data
 
@@ -76,7 +76,9 @@ class BookingAdmin(admin.ModelAdmin):
     def save_model(self, request, obj, form, change):
         if 'total_price' in form.cleaned_data:
             obj.total_price = form.cleaned_data['total_price']
-        super().save_model(request, obj, form, change)
+        with transaction.atomic():
+            super().save_model(request, obj, form, change)
+            BookingService.sync_booked_nights(obj)
 
 
 @admin.register(BookingStatusHistory)
@@ -0,0 +1,201 @@
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+from operator import attrgetter
+
+import numpy as np
+
+from core.enums import BookingStatus
+from listings.models import Listing
+from .models import Booking
+
+# listing field a cube is grouped by
+DIMENSIONS = {
+    'land': 'address__land',
+    'city': 'address__city',
+    'house_type': 'house_type',
+}
+BOOKED_STATUSES = (BookingStatus.confirmed.name, BookingStatus.completed.name)
+ANALYTICS_MAX_MONTHS = 36
+CHUNK_SIZE = 50000
+
+
+def month_bounds(first_month, months):
+    """First days of `months` months starting with first_month plus the day after the last one (datetime64[D])"""
+    start = np.datetime64(first_month, 'M')
+    return np.arange(start, start + months + 1).astype('datetime64[D]')
+
+
+def overlap_nights(starts, ends, bounds):
+    """Nights of every [start, end) range falling into every month, (ranges x months) matrix"""
+    first = np.maximum(starts[:, None], bounds[None, :-1])
+    last = np.minimum(ends[:, None], bounds[None, 1:])
+    return np.clip((last - first).astype(np.int64), 0, None)
+
+
+def listing_groups(dimension):
+    """Sorted listing ids, their group codes, creation days and group labels"""
+    rows = list(Listing.objects.order_by('pk').values_list('pk', DIMENSIONS[dimension], 'created_at'))
+    if not rows:
+        return np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, 'datetime64[D]'), []
+    ids, keys, created = zip(*rows)
+    labels, codes = np.unique(np.array(keys, dtype=str), return_inverse=True)
+    created_days = np.array([moment.date() for moment in created], dtype='datetime64[D]')
+    return np.array(ids, dtype=np.int64), codes, created_days, labels.tolist()
+
+
+def stay_chunks(start, end, chunk_size=CHUNK_SIZE):
+    """
+    Booked stays overlapping [start, end) as column arrays (listing id, check-in, check-out, total price),
+    keyset paginated so memory stays bounded by chunk_size
+    """
+    queryset = Booking.objects.filter(book_status__in=BOOKED_STATUSES, check_in__lt=end, check_out__gt=start)
+    last_id = 0
+    while True:
+        rows = list(
+            queryset.filter(pk__gt=last_id).order_by('pk')
+            .values_list('pk', 'listing_id', 'check_in', 'check_out', 'total_price')[:chunk_size]
+        )
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        _, listing_ids, check_ins, check_outs, prices = zip(*rows)
+        yield (
+            np.array(listing_ids, dtype=np.int64),
+            np.array(check_ins, dtype='datetime64[D]'),
+            np.array(check_outs, dtype='datetime64[D]'),
+            np.array([price or 0 for price in prices], dtype=np.float64),
+        )
+
+
+def build_cube(dimension, bounds, labels, listings, capacity, nights, revenue):
+    """Response structure shared by the vectorized and the reference implementation"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        occupancy = np.where(capacity > 0, nights / capacity, 0.0)
+    groups = [
+        {
+            'key': label,
+            'listings': int(listings[index]),
+            'nights': nights[index].tolist(),
+            'capacity': capacity[index].tolist(),
+            'occupancy': np.round(occupancy[index], 4).tolist(),
+            'revenue': np.round(revenue[index], 2).tolist(),
+        }
+        for index, label in enumerate(labels)
+    ]
+    total_capacity = int(capacity.sum())
+    return {
+        'dimension': dimension,
+        'months': [str(month) for month in bounds[:-1].astype('datetime64[M]')],
+        'groups': groups,
+        'totals': {
+            'nights': int(nights.sum()),
+            'capacity': total_capacity,
+            'occupancy': round(float(nights.sum()) / total_capacity, 4) if total_capacity else 0.0,
+            'revenue': round(float(revenue.sum()), 2),
+        },
+    }
+
+
+def occupancy_cube(dimension, first_month, months, chunk_size=CHUNK_SIZE):
+    """
+    Booked nights, occupancy rate and revenue per dimension value and month
+    Stays are loaded as NumPy columns in chunks and split into nights per month with broadcasting,
+    revenue is spread evenly over the nights of a stay. Capacity counts nights since the listing was created
+    """
+    bounds = month_bounds(first_month, months)
+    ids, codes, created, labels = listing_groups(dimension)
+    shape = (len(labels), months)
+    nights = np.zeros(shape, dtype=np.int64)
+    revenue = np.zeros(shape)
+
+    capacity = np.zeros(shape, dtype=np.int64)
+    np.add.at(capacity, codes, overlap_nights(created, np.full(len(created), bounds[-1]), bounds))
+    listings = np.bincount(codes, minlength=len(labels))
+
+    period = bounds[[0, -1]].astype(date).tolist()
+    for listing_ids, check_ins, check_outs, prices in stay_chunks(*period, chunk_size):
+        stay_codes = codes[np.searchsorted(ids, listing_ids)]
+        stay_nights = overlap_nights(check_ins, check_outs, bounds)
+        per_night = prices / (check_outs - check_ins).astype(np.int64)
+        np.add.at(nights, stay_codes, stay_nights)
+        np.add.at(revenue, stay_codes, stay_nights * per_night[:, None])
+
+    return build_cube(dimension, bounds, labels, listings, capacity, nights, revenue)
+
+
+def naive_cube(dimension, first_month, months):
+    """Reference implementation walking every night of every stay in Python, used by benchmark_analytics"""
+    bounds = month_bounds(first_month, months).astype(date).tolist()
+    start, end = bounds[0], bounds[-1]
+
+    def month_index(day):
+        return (day.year - start.year) * 12 + day.month - start.month
+
+    key = attrgetter(DIMENSIONS[dimension].replace('__', '.'))
+    listings = list(Listing.objects.select_related('address').order_by('pk'))
+    key_of = {listing.pk: str(key(listing)) for listing in listings}
+    labels = sorted(set(key_of.values()))
+    index = {label: position for position, label in enumerate(labels)}
+
+    counts = defaultdict(int)
+    capacity = defaultdict(int)
+    for listing in listings:
+        counts[key_of[listing.pk]] += 1
+        day = max(listing.created_at.date(), start)
+        while day < end:
+            capacity[key_of[listing.pk], month_index(day)] += 1
+            day += timedelta(days=1)
+
+    nights = defaultdict(int)
+    revenue = defaultdict(float)
+    bookings = Booking.objects.filter(book_status__in=BOOKED_STATUSES, check_in__lt=end, check_out__gt=start)
+    for booking in bookings:
+        per_night = float(booking.total_price or 0) / (booking.check_out - booking.check_in).days
+        day = max(booking.check_in, start)
+        while day < min(booking.check_out, end):
+            nights[key_of[booking.listing_id], month_index(day)] += 1
+            revenue[key_of[booking.listing_id], month_index(day)] += per_night
+            day += timedelta(days=1)
+
+    def matrix(values, dtype):
+        result = np.zeros((len(labels), months), dtype=dtype)
+        for (label, month), value in values.items():
+            result[index[label], month] = value
+        return result
+
+    return build_cube(
+        dimension, np.array(bounds, dtype='datetime64[D]'), labels,
+        np.array([counts[label] for label in labels], dtype=np.int64),
+        matrix(capacity, np.int64), matrix(nights, np.int64), matrix(revenue, np.float64)
+    )
+
+
+def benchmark(dimension, first_month, months, repeat=3, chunk_size=CHUNK_SIZE):
+    """Best of `repeat` runs of both implementations in seconds and whether their cubes are equal"""
+    timings = {}
+    cubes = {}
+    for name, func in (
+        ('vectorized', lambda: occupancy_cube(dimension, first_month, months, chunk_size)),
+        ('naive', lambda: naive_cube(dimension, first_month, months)),
+    ):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            cubes[name] = func()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        timings[name] = best
+    return timings, cubes_match(cubes['vectorized'], cubes['naive'])
+
+
+def cubes_match(first, second):
+    """Equal cubes, revenue may differ by a cent because the implementations sum in different order"""
+    if first['months'] != second['months'] or len(first['groups']) != len(second['groups']):
+        return False
+    for one, other in zip(first['groups'], second['groups']):
+        if {**one, 'revenue': None} != {**other, 'revenue': None}:
+            return False
+        if not np.allclose(one['revenue'], other['revenue'], atol=0.011):
+            return False
+    return True
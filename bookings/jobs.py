@@ -0,0 +1,14 @@
+from datetime import timedelta
+
+from core.scheduler import periodic_job
+from .services import BookingService
+
+
+@periodic_job('complete_bookings', interval=timedelta(hours=1), jitter=timedelta(minutes=5))
+def complete_bookings():
+    BookingService.complete_bookings()
+
+
+@periodic_job('expire_pending_bookings', interval=timedelta(minutes=30), jitter=timedelta(minutes=3))
+def expire_pending_bookings():
+    BookingService.expire_pending_bookings()
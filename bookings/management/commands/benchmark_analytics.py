@@ -0,0 +1,33 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bookings.analytics import benchmark, DIMENSIONS, CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    """Compares the vectorized occupancy cube with a Python loop over every booked night"""
+    help = 'Benchmarks occupancy analytics against the naive ORM implementation'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dimension', choices=list(DIMENSIONS), default='land')
+        parser.add_argument('--from', dest='first_month', default=None, help='First month (YYYY-MM), January by default')
+        parser.add_argument('--months', type=int, default=12)
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per implementation, the best one counts')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Bookings loaded per query')
+
+    def handle(self, *args, **options):
+        try:
+            first_month = date.fromisoformat(f'{options["first_month"]}-01') if options['first_month'] else date.today().replace(month=1, day=1)
+        except ValueError:
+            raise CommandError('--from must be in YYYY-MM format')
+
+        timings, match = benchmark(
+            options['dimension'], first_month, options['months'], options['repeat'], options['chunk_size']
+        )
+        self.stdout.write(f'vectorized: {timings["vectorized"]:.3f}s')
+        self.stdout.write(f'naive:      {timings["naive"]:.3f}s')
+        if not match:
+            raise CommandError('Results of both implementations differ')
+        speedup = timings['naive'] / timings['vectorized'] if timings['vectorized'] else 0
+        self.stdout.write(self.style.SUCCESS(f'Results match, vectorized is {speedup:.1f}x faster'))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from bookings.services import BookingService
+
+
+class Command(BaseCommand):
+    """Periodic job completing bookings after check-out, resumes after a crash"""
+    help = 'Marks confirmed bookings with passed check-out date as completed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help='Bookings per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Only count bookings to complete')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            stats = BookingService.complete_bookings(dry_run=True)
+            self.stdout.write(f'{stats["pending"]} bookings would be completed')
+            return
+
+        def report(stats):
+            if options['verbosity'] > 1:
+                self.stdout.write(f'{stats["processed"]} bookings processed, {stats["rate"]:.0f} rows/sec')
+
+        stats = BookingService.complete_bookings(chunk_size=options['chunk_size'], on_chunk=report)
+        self.stdout.write(self.style.SUCCESS(
+            f'Completed {stats["changed"]} bookings in {stats["seconds"]:.2f}s ({stats["rate"]:.0f} rows/sec)'
+        ))
@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from bookings.services import BookingService
+
+
+class Command(BaseCommand):
+    """Periodic job expiring pending bookings the owner did not answer in time"""
+    help = 'Marks stale pending bookings as expired'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help='Bookings per transaction')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        expired = BookingService.expire_pending_bookings(chunk_size=options['chunk_size'])
+        seconds = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Expired {expired} bookings in {seconds:.2f}s ({expired / seconds if seconds else 0:.0f} rows/sec)'
+        ))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from bookings.services import BookingService
+
+
+class Command(BaseCommand):
+    """Backfills/repairs the availability index from confirmed bookings"""
+    help = 'Recreates booked nights of confirmed bookings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('listing_ids', nargs='*', type=int, help='Only rebuild these listings')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            created = BookingService.rebuild_booked_nights(options['listing_ids'] or None)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt availability index with {created} booked nights'))
@@ -0,0 +1,20 @@
+# Generated by Django 6.0 on 2026-10-17 04:48
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0004_alter_booking_total_price'),
+        ('listings', '0012_listing_trending_score_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['created_at'], name='bookings_created_118d3e_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 6.0 on 2026-10-17 04:58
+
+import django.db.models.deletion
+from datetime import timedelta
+
+from django.db import migrations, models
+
+
+def fill_booked_nights(apps, schema_editor):
+    Booking = apps.get_model('bookings', 'Booking')
+    BookedNight = apps.get_model('bookings', 'BookedNight')
+    rows = [
+        BookedNight(listing_id=listing_id, booking_id=pk, night=check_in + timedelta(days=offset))
+        for pk, listing_id, check_in, check_out in Booking.objects.filter(book_status='confirmed').order_by('check_in').values_list(
+            'pk', 'listing_id', 'check_in', 'check_out'
+        )
+        for offset in range((check_out - check_in).days)
+    ]
+    BookedNight.objects.bulk_create(rows, batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0005_booking_bookings_created_118d3e_idx'),
+        ('listings', '0012_listing_trending_score_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookedNight',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('night', models.DateField()),
+                ('booking', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='booked_nights', to='bookings.booking')),
+                ('listing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='booked_nights', to='listings.listing')),
+            ],
+            options={
+                'db_table': 'booked_nights',
+                'indexes': [models.Index(fields=['night', 'listing'], name='booked_nigh_night_72746f_idx')],
+                'constraints': [models.UniqueConstraint(fields=('listing', 'night'), name='unique_listing_night')],
+            },
+        ),
+        migrations.RunPython(fill_booked_nights, migrations.RunPython.noop),
+    ]
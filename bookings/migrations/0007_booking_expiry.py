@@ -0,0 +1,38 @@
+# Generated by Django 6.0 on 2026-10-17 05:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0006_booked_nights'),
+        ('listings', '0012_listing_trending_score_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='booking',
+            name='bookings_book_st_b95d01_idx',
+        ),
+        migrations.AlterField(
+            model_name='booking',
+            name='book_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('rejected', 'Rejected'), ('confirmed', 'Confirmed'), ('cancelled', 'Cancelled'), ('completed', 'Completed'), ('expired', 'Expired')], default='pending', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='bookingstatushistory',
+            name='history_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('rejected', 'Rejected'), ('confirmed', 'Confirmed'), ('cancelled', 'Cancelled'), ('completed', 'Completed'), ('expired', 'Expired')], max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['book_status', 'check_in'], name='bookings_book_st_faea84_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['book_status', 'created_at'], name='bookings_book_st_4eac1c_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 6.0 on 2026-10-17 05:19
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0007_booking_expiry'),
+        ('listings', '0012_listing_trending_score_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['listing', 'book_status', 'check_in', 'check_out'], name='bookings_listing_cd2f0e_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='booking',
+            name='bookings_listing_f5464a_idx',
+        ),
+    ]
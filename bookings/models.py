@@ -25,10 +25,14 @@ class Booking(TimestampMixin):
         db_table = 'bookings'
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['listing']),
+            # overlap probe of a listing (availability, rejecting pending bookings on confirmation)
+            models.Index(fields=['listing', 'book_status', 'check_in', 'check_out']),
             models.Index(fields=['tenant']),
             models.Index(fields=['check_in']),
-            models.Index(fields=['book_status']),
+            models.Index(fields=['created_at']),
+            # range scans for batch jobs (completion, expiry of stale pending bookings)
+            models.Index(fields=['book_status', 'check_in']),
+            models.Index(fields=['book_status', 'created_at']),
         ]
 
     def __str__(self):
@@ -44,8 +48,9 @@ class Booking(TimestampMixin):
     def save(self, *args, **kwargs):
         """Calculation of total price beofre saving booking"""
         if self.total_price is None and self.listing and self.check_in and self.check_out:
-            nights = (self.check_out - self.check_in).days
-            self.total_price = self.listing.price_per_night * nights
+            from listings.pricing import pricing_engine
+
+            self.total_price = pricing_engine.quote(self.listing, self.check_in, self.check_out)
         super().save(*args, **kwargs)
 
     @property
@@ -80,4 +85,28 @@ class BookingStatusHistory(TimestampMixin):
         ordering = ['-created_at']
 
     def __str__(self):
-        return f'{self.booking.id} - {self.history_status}'
\ No newline at end of file
+        return f'{self.booking.id} - {self.history_status}'
+
+
+class BookedNight(models.Model):
+    """
+    Availability index, one row per night of a confirmed booking
+    Maintained by BookingService.sync_booked_nights (rebuild_booked_nights command for backfill),
+    so listings free in a date range are found with one range query instead of overlap checks per listing
+    """
+    listing = models.ForeignKey('listings.Listing', on_delete=models.CASCADE, related_name='booked_nights')
+    booking = models.ForeignKey(Booking, on_delete=models.CASCADE, related_name='booked_nights')
+    night = models.DateField()
+
+    class Meta:
+        db_table = 'booked_nights'
+        constraints = [
+            models.UniqueConstraint(fields=['listing', 'night'], name='unique_listing_night'),
+        ]
+        indexes = [
+            models.Index(fields=['night', 'listing']),
+        ]
+
+    def __str__(self):
+        return f'{self.listing_id} - {self.night}'
+
@@ -4,7 +4,8 @@ from .models import Booking, BookingStatusHistory
 from listings.serializers import ListingSerializer
 from users.serializers import UserProfileSerializer
 from listings.models import Listing
-from bookings.services import BookingService
+from core.loader import get_object
+from .services import BookingService, QUOTE_MAX_ITEMS
 
 
 class BookingStatusHistorySerializer(serializers.ModelSerializer):
@@ -69,18 +70,14 @@ class BookingCreateSerializer(serializers.ModelSerializer):
         if nights > 365:
             raise serializers.ValidationError({'check_out': 'Maximum booking length is 365 days'})
 
+        #availability is checked once by BookingService under the listing lock
         try:
-            listing = Listing.objects.get(id=data['listing_id'], is_active=True)
+            listing = get_object(Listing, id=data['listing_id'], is_active=True)
             if data['stayers'] > listing.max_stayers:
                 raise serializers.ValidationError({
                     'stayers': f'Maximum {listing.max_stayers} guests allowed'
                 })
 
-            if not BookingService.check_availability(listing, data['check_in'], data['check_out']):
-                raise serializers.ValidationError({
-                    'check_in': 'These dates are not available'
-                })
-
         except Listing.DoesNotExist:
             raise serializers.ValidationError({'listing_id': 'Listing not found or inactive'})
 
@@ -92,8 +89,7 @@ class BookingCreateSerializer(serializers.ModelSerializer):
         listing_id = validated_data.pop('listing_id')
         listing = Listing.objects.get(id=listing_id)
 
-        nights_to_stay = (validated_data['check_out'] - validated_data['check_in']).days
-        total_price = listing.price_per_night * nights_to_stay
+        total_price = BookingService.calculate_price(listing, validated_data['check_in'], validated_data['check_out'])
 
         booking = Booking.objects.create(
             tenant=self.context['request'].user,
@@ -108,4 +104,30 @@ class BookingCreateSerializer(serializers.ModelSerializer):
             changed_by=self.context['request'].user
         )
 
-        return booking
\ No newline at end of file
+        return booking
+
+class BookingBulkActionSerializer(serializers.Serializer):
+    """Serializer for confirming, rejecting or cancelling many bookings at once"""
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), min_length=1, max_length=500)
+    action = serializers.ChoiceField(choices=['confirm', 'reject', 'cancel'])
+    reason = serializers.CharField(required=False, allow_blank=True, max_length=500, default='')
+
+
+class BookingQuoteItemSerializer(serializers.Serializer):
+    """One stay to price"""
+    listing_id = serializers.IntegerField(min_value=1)
+    check_in = serializers.DateField()
+    check_out = serializers.DateField()
+    guests = serializers.IntegerField(min_value=1, max_value=100, required=False)
+
+    def validate(self, data):
+        if data['check_out'] <= data['check_in']:
+            raise serializers.ValidationError({'check_out': 'Check-out must be after check-in'})
+        if (data['check_out'] - data['check_in']).days > 365:
+            raise serializers.ValidationError({'check_out': 'Maximum booking length is 365 days'})
+        return data
+
+
+class BookingQuoteSerializer(serializers.Serializer):
+    """Serializer for pricing many stays in one request"""
+    items = BookingQuoteItemSerializer(many=True, min_length=1, max_length=QUOTE_MAX_ITEMS)
@@ -1,62 +1,192 @@
 import logging
-from django.db import transaction
+from collections import defaultdict
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction, IntegrityError
 from django.db.models import Q
-from .models import Booking, BookingStatusHistory
+from django.utils import timezone
+from .models import Booking, BookingStatusHistory, BookedNight
 from listings.models import Listing
+from listings.pricing import pricing_engine
 from core.enums import BookingStatus
-from core.exceptions import BookingNotAvailableError, ListingNotAvailableError, AccessRightsError
+from core.exceptions import (
+    BookingNotAvailableError, ListingNotAvailableError, AccessRightsError, BookingStatusConflictError
+)
+from core.cache import response_cache
+from core.locking import retry_on_lock
+from core.loader import get_object
+from core.batch import ChunkedJob
 
 logger = logging.getLogger(__name__)
 
+AVAILABILITY_MAX_DAYS = 366 #calendar range limit, 12 months
+QUOTE_MAX_ITEMS = 100 #stays per quote request
+
+# booking state machine, status -> statuses it can move to (rejected, cancelled, completed, expired are final)
+TRANSITIONS = {
+    BookingStatus.pending.name: {
+        BookingStatus.confirmed.name, BookingStatus.rejected.name,
+        BookingStatus.cancelled.name, BookingStatus.expired.name,
+    },
+    BookingStatus.confirmed.name: {BookingStatus.cancelled.name, BookingStatus.completed.name},
+}
+
+
+# bulk action -> target status and default history comment
+BULK_ACTIONS = {
+    'confirm': (BookingStatus.confirmed.name, 'Confirmed by owner'),
+    'reject': (BookingStatus.rejected.name, 'Rejected'),
+    'cancel': (BookingStatus.cancelled.name, 'Cancelled by tenant'),
+}
+
+
+def allowed_sources(new_status):
+    """Statuses a booking may be in to move to new_status"""
+    return [status for status, targets in TRANSITIONS.items() if new_status in targets]
+
 
 class BookingService:
     """Service for booking logic"""
     @staticmethod
     def calculate_price(listing, check_in, check_out):
-        """Calculates booking price based on amount of nights"""
-        nights = (check_out - check_in).days
-        return listing.price_per_night * nights
+        """Booking price from the listing price calendar (base price and pricing rules)"""
+        return pricing_engine.quote(listing, check_in, check_out)
+
+    @staticmethod
+    def quote(items):
+        """
+        Prices many (listing_id, check_in, check_out, guests) stays at once
+        Listings and their booked nights in the covered range are read with two queries for the whole batch,
+        stays are priced by listing price calendars. Results keep the order of items
+        """
+        listings = Listing.objects.filter(pk__in={item['listing_id'] for item in items}, is_active=True).in_bulk()
+        booked = defaultdict(set)
+        if listings:
+            nights = BookedNight.objects.filter(
+                listing_id__in=listings,
+                night__gte=min(item['check_in'] for item in items),
+                night__lt=max(item['check_out'] for item in items),
+            ).values_list('listing_id', 'night')
+            for listing_id, night in nights:
+                booked[listing_id].add(night)
+
+        priced = [
+            item for item in items
+            if item['listing_id'] in listings and item.get('guests', 1) <= listings[item['listing_id']].max_stayers
+        ]
+        totals = dict(zip(
+            map(id, priced),
+            pricing_engine.quote_many(listings, [(item['listing_id'], item['check_in'], item['check_out']) for item in priced])
+        ))
+
+        quotes = []
+        for item in items:
+            listing = listings.get(item['listing_id'])
+            quote = {
+                'listing_id': item['listing_id'],
+                'check_in': item['check_in'],
+                'check_out': item['check_out'],
+                'nights': (item['check_out'] - item['check_in']).days,
+            }
+            if listing is None:
+                quote['error'] = 'Listing not found or inactive'
+            elif item.get('guests') and item['guests'] > listing.max_stayers:
+                quote['error'] = f'Maximum {listing.max_stayers} guests allowed'
+            else:
+                stay = {item['check_in'] + timedelta(days=offset) for offset in range(quote['nights'])}
+                quote['available'] = not (stay & booked[listing.pk])
+                quote['total_price'] = totals[id(item)]
+            quotes.append(quote)
+        return quotes
 
     @staticmethod
-    def check_availability(listing, check_in, check_out):
+    def check_availability(listing, check_in, check_out, exclude_booking=None):
         """Checks if listing is available for chosen date"""
         overlapping = Booking.objects.filter(
             listing=listing,
             book_status='confirmed',
             check_in__lt=check_out,
             check_out__gt=check_in
-        ).exists()
-        return not overlapping
+        )
+        if exclude_booking is not None:
+            overlapping = overlapping.exclude(pk=exclude_booking.pk)
+        return not overlapping.exists()
 
     @staticmethod
-    def create_booking(tenant, validated_data):
-        listing_id = validated_data.pop('listing_id')
+    def get_availability(listing_id, start, end):
+        """
+        Booked and free nights of a listing in [start, end) compressed into runs
+        Computed from one range query over confirmed bookings, run end is exclusive like check_out
+        """
+        bookings = Booking.objects.filter(
+            listing_id=listing_id,
+            book_status=BookingStatus.confirmed.name,
+            check_in__lt=end,
+            check_out__gt=start
+        ).order_by('check_in').values_list('check_in', 'check_out')
+
+        runs = []
+        position = start
+        for check_in, check_out in bookings:
+            check_in, check_out = max(check_in, position), min(check_out, end)
+            if check_out <= check_in: #overlaps with a booking already added
+                continue
+            if check_in > position:
+                runs.append({'status': 'free', 'start': position, 'end': check_in})
+            if runs and runs[-1]['status'] == 'booked' and runs[-1]['end'] == check_in:
+                runs[-1]['end'] = check_out
+            else:
+                runs.append({'status': 'booked', 'start': check_in, 'end': check_out})
+            position = check_out
+        if position < end:
+            runs.append({'status': 'free', 'start': position, 'end': end})
 
-        try:
-            listing = Listing.objects.get(id=listing_id, is_active=True)
-        except Listing.DoesNotExist:
-            raise ListingNotAvailableError()
+        for run in runs:
+            run['nights'] = (run['end'] - run['start']).days
+        booked = sum(run['nights'] for run in runs if run['status'] == 'booked')
+        return {
+            'listing_id': listing_id,
+            'from': start,
+            'to': end,
+            'booked_nights': booked,
+            'free_nights': (end - start).days - booked,
+            'runs': runs,
+        }
 
-        if listing.owner == tenant:
-            raise AccessRightsError('Cannot book your own listing')
+    @staticmethod
+    def lock_listing(listing_id):
+        """
+        Locks listing row until the end of the transaction, so bookings of one listing are written one at a time
+        while other listings stay parallel. NOWAIT, use inside retry_on_lock. Returns False for inactive listings
+        """
+        return Listing.objects.select_for_update(nowait=True).filter(pk=listing_id, is_active=True).exists()
 
+    @staticmethod
+    def create_booking(tenant, validated_data):
+        listing_id = validated_data.pop('listing_id')
         check_in = validated_data['check_in']
         check_out = validated_data['check_out']
         stayers = validated_data['stayers']
 
-        if stayers > listing.max_stayers:
-            raise ValueError(f'Maximum {listing.max_stayers} stayers allowed')
+        def create():
+            if not BookingService.lock_listing(listing_id):
+                raise ListingNotAvailableError()
+            listing = get_object(Listing, id=listing_id, is_active=True) #usually loaded by the serializer already
 
-        if not BookingService.check_availability(listing, check_in, check_out):
-            raise BookingNotAvailableError()
+            if listing.owner_id == tenant.id:
+                raise AccessRightsError('Cannot book your own listing')
 
-        total_price = BookingService.calculate_price(listing, check_in, check_out)
+            if stayers > listing.max_stayers:
+                raise ValueError(f'Maximum {listing.max_stayers} stayers allowed')
+
+            #checked under the lock, a concurrent confirmation of this listing waits for us
+            if not BookingService.check_availability(listing, check_in, check_out):
+                raise BookingNotAvailableError()
 
-        with transaction.atomic():
             booking = Booking.objects.create(
                 tenant=tenant,
                 listing=listing,
-                total_price=total_price,
+                total_price=BookingService.calculate_price(listing, check_in, check_out),
                 **validated_data
             )
 
@@ -66,16 +196,295 @@ class BookingService:
                 comment='Booking created',
                 changed_by=tenant
             )
-
-            logger.info(f'Created booking {booking.id}')
             return booking
 
+        booking = retry_on_lock(create)
+        logger.info(f'Created booking {booking.id}')
+        return booking
+
+    @staticmethod
+    def sync_booked_nights(booking):
+        """
+        Keeps availability index in line with the booking: nights of a confirmed booking are stored,
+        any other status frees them. Raises BookingNotAvailableError if a night is already taken
+        """
+        wanted = set()
+        if booking.book_status == BookingStatus.confirmed.name:
+            wanted = {
+                booking.check_in + timedelta(days=offset)
+                for offset in range((booking.check_out - booking.check_in).days)
+            }
+        existing = set(BookedNight.objects.filter(booking=booking).values_list('night', flat=True))
+        if wanted == existing:
+            return
+
+        with transaction.atomic():
+            if existing - wanted:
+                BookedNight.objects.filter(booking=booking, night__in=existing - wanted).delete()
+            try:
+                with transaction.atomic(): #savepoint, so the caller can handle the conflict
+                    BookedNight.objects.bulk_create([
+                        BookedNight(listing_id=booking.listing_id, booking=booking, night=night)
+                        for night in sorted(wanted - existing)
+                    ])
+            except IntegrityError:
+                raise BookingNotAvailableError()
+        response_cache.purge_on_commit('booked-nights', f'availability:{booking.listing_id}')
+
+    @staticmethod
+    def rebuild_booked_nights(listing_ids=None):
+        """Recreates availability index from confirmed bookings"""
+        bookings = Booking.objects.filter(book_status=BookingStatus.confirmed.name).order_by('check_in')
+        nights = BookedNight.objects.all()
+        if listing_ids is not None:
+            bookings = bookings.filter(listing_id__in=listing_ids)
+            nights = nights.filter(listing_id__in=listing_ids)
+
+        affected = set(nights.values_list('listing_id', flat=True).distinct())
+        nights.delete()
+        rows = []
+        for pk, listing_id, check_in, check_out in bookings.values_list('pk', 'listing_id', 'check_in', 'check_out').iterator():
+            rows += [
+                BookedNight(listing_id=listing_id, booking_id=pk, night=check_in + timedelta(days=offset))
+                for offset in range((check_out - check_in).days)
+            ]
+            if len(rows) >= 1000:
+                BookedNight.objects.bulk_create(rows, ignore_conflicts=True) #overlapping legacy bookings keep the first one
+                rows = []
+        BookedNight.objects.bulk_create(rows, ignore_conflicts=True)
+        affected.update(nights.values_list('listing_id', flat=True).distinct())
+        response_cache.purge_on_commit('booked-nights', *[f'availability:{pk}' for pk in affected])
+        created = nights.count()
+        logger.info(f'Rebuilt availability index with {created} booked nights')
+        return created
+
+    @staticmethod
+    def _apply_transition(booking_ids, from_status, to_status, comment='', user=None):
+        """
+        Set-based transition of bookings that are still in from_status, call inside a transaction
+        One conditional UPDATE, history rows and booked nights with bulk_create. Returns ids of transitioned bookings
+        """
+        rows = list(
+            Booking.objects.select_for_update().filter(pk__in=booking_ids, book_status=from_status)
+            .order_by('pk').values_list('pk', 'listing_id', 'check_in', 'check_out')
+        )
+        if not rows:
+            return []
+        ids = [row[0] for row in rows]
+        Booking.objects.filter(pk__in=ids, book_status=from_status).update(
+            book_status=to_status, updated_at=timezone.now()
+        )
+        BookingStatusHistory.objects.bulk_create([
+            BookingStatusHistory(booking_id=pk, history_status=to_status, comment=comment, changed_by=user)
+            for pk in ids
+        ])
+
+        if from_status == BookingStatus.confirmed.name:
+            BookedNight.objects.filter(booking_id__in=ids).delete()
+        if to_status == BookingStatus.confirmed.name:
+            BookedNight.objects.bulk_create([
+                BookedNight(listing_id=listing_id, booking_id=pk, night=check_in + timedelta(days=offset))
+                for pk, listing_id, check_in, check_out in rows
+                for offset in range((check_out - check_in).days)
+            ], batch_size=1000)
+        if BookingStatus.confirmed.name in (from_status, to_status):
+            listing_ids = {row[1] for row in rows}
+            response_cache.purge_on_commit('booked-nights', *[f'availability:{pk}' for pk in listing_ids])
+
+        logger.info(f'{len(ids)} bookings {from_status} -> {to_status}')
+        return ids
+
+    @staticmethod
+    def bulk_transition(booking_ids, from_status, to_status, comment='', user=None):
+        """
+        Moves bookings that are still in from_status to to_status with one conditional UPDATE,
+        history rows are written with bulk_create. Returns ids of transitioned bookings
+        """
+        if to_status == BookingStatus.confirmed.name:
+            raise ValueError('Confirmations have to check overlaps, use bulk_change_status')
+        if to_status not in TRANSITIONS.get(from_status, ()):
+            raise ValueError(f'Booking cannot move from {from_status} to {to_status}')
+
+        with transaction.atomic():
+            return BookingService._apply_transition(booking_ids, from_status, to_status, comment, user)
+
+    @staticmethod
+    def _split_confirmable(rows):
+        """
+        Splits pending bookings into ones that fit into the calendar (in check-in order) and overlapping ones
+        Call with the listings locked, confirmed bookings of all listings are read with one query
+        """
+        if not rows:
+            return [], []
+        confirmed = Booking.objects.filter(
+            listing_id__in={row['listing_id'] for row in rows},
+            book_status=BookingStatus.confirmed.name,
+            check_in__lt=max(row['check_out'] for row in rows),
+            check_out__gt=min(row['check_in'] for row in rows),
+        ).values_list('listing_id', 'check_in', 'check_out')
+        taken = defaultdict(list)
+        for listing_id, check_in, check_out in confirmed:
+            taken[listing_id].append((check_in, check_out))
+
+        fits, overlapping = [], []
+        for row in sorted(rows, key=lambda row: (row['check_in'], row['pk'])):
+            stays = taken[row['listing_id']]
+            if any(check_in < row['check_out'] and check_out > row['check_in'] for check_in, check_out in stays):
+                overlapping.append(row)
+            else:
+                stays.append((row['check_in'], row['check_out']))
+                fits.append(row)
+        return fits, overlapping
+
+    @staticmethod
+    def reject_overlapping(confirmed, user=None):
+        """
+        Rejects pending bookings overlapping freshly confirmed ones, call inside the confirming transaction
+        confirmed - (pk, listing_id, check_in, check_out) rows. One probe over the
+        (listing, book_status, check_in, check_out) index, one UPDATE and bulk history rows. Returns rejected ids
+        """
+        if not confirmed:
+            return []
+        overlap = Q()
+        for pk, listing_id, check_in, check_out in confirmed:
+            overlap |= Q(listing_id=listing_id, check_in__lt=check_out, check_out__gt=check_in)
+        ids = list(
+            Booking.objects.filter(overlap, book_status=BookingStatus.pending.name)
+            .exclude(pk__in=[row[0] for row in confirmed]).values_list('pk', flat=True)
+        )
+        if not ids:
+            return []
+        return BookingService._apply_transition(
+            ids, BookingStatus.pending.name, BookingStatus.rejected.name, 'Dates are booked by another guest', user
+        )
+
+    @staticmethod
+    def bulk_change_status(booking_ids, action, user, reason=''):
+        """
+        Confirms, rejects or cancels many bookings at once, partial success is allowed
+        Permissions are checked with one query and all transitions run set-based in one transaction.
+        Returns result per id: ok, not_found, forbidden, conflict (status changed or not allowed), not_available
+        """
+        target, comment = BULK_ACTIONS[action]
+        comment = reason or comment
+        booking_ids = list(dict.fromkeys(booking_ids))
+        rows = {
+            row['pk']: row for row in Booking.objects.filter(pk__in=booking_ids).values(
+                'pk', 'tenant_id', 'listing_id', 'listing__owner_id', 'book_status', 'check_in', 'check_out'
+            )
+        }
+
+        today = timezone.now().date()
+        results, candidates = {}, []
+        for pk in booking_ids:
+            row = rows.get(pk)
+            if row is None:
+                results[pk] = 'not_found'
+            elif not user.is_admin and user.id != (row['tenant_id'] if action == 'cancel' else row['listing__owner_id']):
+                results[pk] = 'forbidden'
+            elif row['book_status'] not in allowed_sources(target) or (action == 'cancel' and row['check_in'] <= today):
+                results[pk] = 'conflict'
+            else:
+                candidates.append(row)
+
+        def apply():
+            changed, unavailable, rejected = set(), [], set()
+            if action == 'confirm':
+                list(Listing.objects.select_for_update(nowait=True).filter(
+                    pk__in={row['listing_id'] for row in candidates}
+                ).order_by('pk').values_list('pk', flat=True))
+                #re-read under the lock, bookings changed meanwhile must not claim nights (they end up as conflict)
+                pending = set(Booking.objects.filter(
+                    pk__in=[row['pk'] for row in candidates], book_status=BookingStatus.pending.name
+                ).values_list('pk', flat=True))
+                fits, unavailable = BookingService._split_confirmable([row for row in candidates if row['pk'] in pending])
+                changed.update(BookingService._apply_transition(
+                    [row['pk'] for row in fits], BookingStatus.pending.name, target, comment, user
+                ))
+                rejected.update(BookingService.reject_overlapping(
+                    [(row['pk'], row['listing_id'], row['check_in'], row['check_out']) for row in fits if row['pk'] in changed],
+                    user
+                ))
+            else:
+                by_status = defaultdict(list)
+                for row in candidates:
+                    by_status[row['book_status']].append(row['pk'])
+                for from_status, ids in by_status.items():
+                    changed.update(BookingService._apply_transition(ids, from_status, target, comment, user))
+            return changed, unavailable, rejected
+
+        changed, unavailable, rejected = retry_on_lock(apply) if candidates else (set(), [], set())
+        for row in unavailable:
+            results[row['pk']] = 'not_available'
+        for row in candidates:
+            results.setdefault(row['pk'], 'ok' if row['pk'] in changed else 'conflict')
+
+        def current_status(pk):
+            if results[pk] == 'ok':
+                return target
+            if pk in rejected:
+                return BookingStatus.rejected.name
+            return rows[pk]['book_status'] if pk in rows else None
+
+        return [
+            {'id': pk, 'result': results[pk], 'book_status': current_status(pk)}
+            for pk in booking_ids
+        ]
+
+    @staticmethod
+    def complete_bookings(chunk_size=500, dry_run=False, on_chunk=None):
+        """Completes confirmed bookings after their check-out date, chunked and resumable"""
+        job = ChunkedJob('complete_bookings', Booking.objects.filter(
+            book_status=BookingStatus.confirmed.name,
+            check_out__lt=timezone.now().date()
+        ), chunk_size)
+        if dry_run:
+            return {'pending': job.pending()}
+        return job.run(lambda ids: BookingService.bulk_transition(
+            ids, BookingStatus.confirmed.name, BookingStatus.completed.name,
+            'Automatically completed after check-out date'
+        ), on_chunk)
+
+    @staticmethod
+    def expire_pending_bookings(chunk_size=500, now=None):
+        """
+        Expires pending bookings that reached check-in or waited longer than BOOKING_OWNER_RESPONSE_HOURS
+        Each condition drains its own (book_status, ...) index range in chunks, expired rows drop out of the range,
+        so an interrupted run simply continues with the next one
+        """
+        now = now or timezone.now()
+        stale = [
+            Q(check_in__lte=now.date()),
+            Q(created_at__lt=now - timedelta(hours=settings.BOOKING_OWNER_RESPONSE_HOURS)),
+        ]
+        expired = 0
+        for condition in stale:
+            candidates = Booking.objects.filter(condition, book_status=BookingStatus.pending.name).order_by()
+            while True:
+                ids = list(candidates.values_list('pk', flat=True)[:chunk_size])
+                if not ids:
+                    break
+                expired += len(BookingService.bulk_transition(
+                    ids, BookingStatus.pending.name, BookingStatus.expired.name, 'Expired without owner response'
+                ))
+        return expired
+
     @staticmethod
     def update_status(booking, new_status, user, comment=''):
-        """Updating booking status"""
+        """
+        Updating booking status
+        Compare-and-set: the UPDATE only matches while the booking is in a status allowed by TRANSITIONS,
+        so concurrent transitions can't overwrite each other, the loser gets BookingStatusConflictError
+        """
         with transaction.atomic():
-            booking.book_status = new_status
-            booking.save()
+            now = timezone.now()
+            updated = Booking.objects.filter(pk=booking.pk, book_status__in=allowed_sources(new_status)).update(
+                book_status=new_status, updated_at=now
+            )
+            if not updated:
+                raise BookingStatusConflictError(f'Booking {booking.pk} cannot be changed to {new_status} anymore')
+            booking.book_status, booking.updated_at = new_status, now
+            BookingService.sync_booked_nights(booking)
 
             BookingStatusHistory.objects.create(
                 booking=booking,
@@ -92,9 +501,18 @@ class BookingService:
         if booking.listing.owner != user and not user.is_admin:
             raise AccessRightsError('Only owner can confirm')
 
-        return BookingService.update_status(
-            booking, BookingStatus.confirmed.name, user, 'Confirmed by owner'
-        )
+        def confirm():
+            if not BookingService.lock_listing(booking.listing_id):
+                raise ListingNotAvailableError()
+            if not BookingService.check_availability(booking.listing_id, booking.check_in, booking.check_out, booking):
+                raise BookingNotAvailableError()
+            BookingService.update_status(booking, BookingStatus.confirmed.name, user, 'Confirmed by owner')
+            BookingService.reject_overlapping(
+                [(booking.pk, booking.listing_id, booking.check_in, booking.check_out)], user
+            )
+            return booking
+
+        return retry_on_lock(confirm)
 
     @staticmethod
     def reject_booking(booking, user, reason=''):
@@ -1,12 +1,24 @@
-from datetime import timedelta
-from django.test import TestCase
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
 from django.urls import reverse
 from django.utils import timezone
+from io import StringIO
+from unittest import mock
 from rest_framework.test import APITestCase
 from rest_framework import status
-from .models import Booking
+from .models import Booking, BookedNight, BookingStatusHistory
+from .services import BookingService
+from .analytics import occupancy_cube, naive_cube, cubes_match
+from core.exceptions import BookingNotAvailableError, BookingStatusConflictError, ResourceBusyError
+from core.locking import retry_on_lock
+from core.models import JobCheckpoint
 from users.models import User
 from listings.models import Listing, Address
+from listings.pricing import pricing_engine
 
 
 class BookingModelTest(TestCase):
@@ -107,6 +119,23 @@ class BookingAPITest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(Booking.objects.count(), 1)
 
+    @override_settings(DEBUG=True)
+    def test_create_booking_loads_listing_once(self):
+        """Test booking creation shares the listing between serializer and service"""
+        self.client.force_authenticate(user=self.tenant)
+        data = {
+            "listing_id": self.listing.id,
+            "check_in": (timezone.now().date() + timedelta(days=10)).isoformat(),
+            "check_out": (timezone.now().date() + timedelta(days=12)).isoformat(),
+            "stayers": 2
+        }
+        pricing_engine.calendars([self.listing]) #price calendar is usually cached, rules are loaded on a miss only
+        #savepoints + listing, lock, overlap check, booking and history inserts
+        with self.assertNumQueries(7):
+            response = self.client.post(reverse("booking-list-create"), data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response["X-Loader-Stats"], "loads=1; hits=1")
+
     def test_create_booking_owner_forbidden(self):
         """Test owner cannot create a booking"""
         self.client.force_authenticate(user=self.owner)
@@ -188,6 +217,15 @@ class BookingActionTest(APITestCase):
         self.booking.refresh_from_db()
         self.assertEqual(self.booking.book_status, "confirmed")
 
+    def test_confirm_inactive_listing_fails(self):
+        """Test booking of a deactivated listing cannot be confirmed"""
+        Listing.objects.filter(pk=self.booking.listing_id).update(is_active=False)
+        self.client.force_authenticate(user=self.owner)
+        response = self.client.post(reverse("booking-confirm", args=[self.booking.id]))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.book_status, "pending")
+
     def test_reject_booking_owner(self):
         """Test owner can reject a booking"""
         self.client.force_authenticate(user=self.owner)
@@ -218,4 +256,489 @@ class BookingActionTest(APITestCase):
         self.client.force_authenticate(user=self.owner)
         url = reverse("booking-cancel", args=[self.booking.id])
         response = self.client.post(url)
-        self.assertIn(response.status_code, [status.HTTP_403_FORBIDDEN, status.HTTP_400_BAD_REQUEST])
\ No newline at end of file
+        self.assertIn(response.status_code, [status.HTTP_403_FORBIDDEN, status.HTTP_400_BAD_REQUEST])
+
+    def test_confirm_rejects_overlapping_pending(self):
+        """Test confirmation rejects overlapping pending bookings and keeps the others pending"""
+        overlapping = Booking.objects.create(
+            listing=self.listing,
+            tenant=self.tenant,
+            check_in=self.booking.check_in + timedelta(days=1),
+            check_out=self.booking.check_out + timedelta(days=2),
+            stayers=2
+        )
+        adjacent = Booking.objects.create(
+            listing=self.listing,
+            tenant=self.tenant,
+            check_in=self.booking.check_out,
+            check_out=self.booking.check_out + timedelta(days=2),
+            stayers=2
+        )
+        self.client.force_authenticate(user=self.owner)
+        response = self.client.post(reverse("booking-confirm", args=[self.booking.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(Booking.objects.get(pk=overlapping.pk).book_status, "rejected")
+        self.assertEqual(Booking.objects.get(pk=adjacent.pk).book_status, "pending")
+        history = BookingStatusHistory.objects.get(booking=overlapping, history_status="rejected")
+        self.assertEqual(history.changed_by, self.owner)
+
+    def test_transition_conflicts(self):
+        """Test a transition on a stale booking or outside of the state machine returns 409"""
+        stale = Booking.objects.get(pk=self.booking.pk)
+        BookingService.update_status(self.booking, "rejected", self.owner)
+        with self.assertRaises(BookingStatusConflictError):
+            BookingService.update_status(stale, "confirmed", self.owner)
+        self.assertEqual(Booking.objects.get(pk=self.booking.pk).book_status, "rejected")
+
+        self.client.force_authenticate(user=self.owner)
+        response = self.client.post(reverse("booking-confirm", args=[self.booking.id]))
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+    def test_detail_conditional_get(self):
+        """Test booking detail answers 304 with one query until its status changes"""
+        self.client.force_authenticate(user=self.tenant)
+        url = reverse("booking-detail", args=[self.booking.id])
+        etag = self.client.get(url)["ETag"]
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.client.force_authenticate(user=self.owner)
+        self.client.post(reverse("booking-confirm", args=[self.booking.id]))
+        self.client.force_authenticate(user=self.tenant)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["book_status"], "confirmed")
+
+    def test_detail_validators_change_with_date(self):
+        """Test date dependent booking detail sends no Last-Modified and its ETag expires the next day"""
+        self.client.force_authenticate(user=self.tenant)
+        url = reverse("booking-detail", args=[self.booking.id])
+        response = self.client.get(url)
+        self.assertNotIn("Last-Modified", response)
+
+        tomorrow = timezone.now() + timedelta(days=1)
+        with mock.patch("django.utils.timezone.now", return_value=tomorrow):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_bulk_action(self):
+        """Test bulk confirm returns a result per id and never confirms overlapping bookings"""
+        overlapping = Booking.objects.create(
+            listing=self.listing,
+            tenant=self.tenant,
+            check_in=self.booking.check_in + timedelta(days=1),
+            check_out=self.booking.check_out + timedelta(days=1),
+            stayers=2
+        )
+        later = Booking.objects.create(
+            listing=self.listing,
+            tenant=self.tenant,
+            check_in=self.booking.check_out,
+            check_out=self.booking.check_out + timedelta(days=3),
+            stayers=2
+        )
+        url = reverse("booking-bulk-action")
+        ids = [self.booking.id, overlapping.id, later.id, 999999]
+
+        self.client.force_authenticate(user=self.tenant)
+        response = self.client.post(url, {"ids": ids, "action": "confirm"}, format="json")
+        self.assertEqual(response.data["summary"], {"forbidden": 3, "not_found": 1})
+
+        self.client.force_authenticate(user=self.owner)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, {"ids": ids, "action": "confirm"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = {result["id"]: result["result"] for result in response.data["results"]}
+        self.assertEqual(results, {
+            self.booking.id: "ok", overlapping.id: "not_available", later.id: "ok", 999999: "not_found"
+        })
+        self.assertEqual(BookedNight.objects.filter(listing=self.listing).count(), 5)
+        self.assertEqual(BookingStatusHistory.objects.filter(history_status="confirmed").count(), 2)
+
+        self.assertEqual(response.data["results"][1]["book_status"], "rejected")
+        self.assertEqual(Booking.objects.get(pk=overlapping.pk).book_status, "rejected")
+
+        response = self.client.post(url, {"ids": [self.booking.id, later.id], "action": "reject"}, format="json")
+        self.assertEqual(response.data["summary"], {"conflict": 2})
+
+
+    def test_bulk_confirm_ignores_bookings_changed_meanwhile(self):
+        """Test a candidate cancelled after it was read doesn't block an overlapping booking of the same request"""
+        overlapping = Booking.objects.create(
+            listing=self.listing,
+            tenant=self.tenant,
+            check_in=self.booking.check_in + timedelta(days=1),
+            check_out=self.booking.check_out + timedelta(days=1),
+            stayers=2
+        )
+
+        def cancel_first(func):
+            Booking.objects.filter(pk=self.booking.pk).update(book_status="cancelled") #concurrent request
+            return retry_on_lock(func)
+
+        with mock.patch("bookings.services.retry_on_lock", side_effect=cancel_first):
+            results = BookingService.bulk_change_status([self.booking.id, overlapping.id], "confirm", self.owner)
+        self.assertEqual(
+            {result["id"]: result["result"] for result in results},
+            {self.booking.id: "conflict", overlapping.id: "ok"}
+        )
+
+class AvailabilitySearchTest(APITestCase):
+    """Tests for listing search by stay dates"""
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(
+            email="owner@example.com",
+            username="owner",
+            password="pass123",
+            role="owner"
+        )
+        self.tenant = User.objects.create_user(
+            email="tenant@example.com",
+            username="tenant",
+            password="pass123",
+            role="tenant"
+        )
+        self.listings = [
+            Listing.objects.create(
+                owner=self.owner,
+                title=f"Berlin Apartment {i}",
+                description="Central location in Berlin",
+                address=Address.objects.create(
+                    country="Germany", city="Berlin", street="Test Street", house_number=str(i), postal_code="12345"
+                ),
+                price_per_night=100.00,
+                bedrooms=2,
+                bathrooms=1,
+                max_stayers=4,
+                house_type="apartment"
+            )
+            for i in range(2)
+        ]
+        self.today = timezone.now().date()
+        self.booking = Booking.objects.create(
+            listing=self.listings[0],
+            tenant=self.tenant,
+            check_in=self.today + timedelta(days=10),
+            check_out=self.today + timedelta(days=12),
+            stayers=2
+        )
+
+    def search(self, check_in, check_out):
+        response = self.client.get(reverse("listing-list"), {
+            "check_in": (self.today + timedelta(days=check_in)).isoformat(),
+            "check_out": (self.today + timedelta(days=check_out)).isoformat(),
+        })
+        return sorted(item["id"] for item in response.data["results"])
+
+    def test_confirmed_nights_are_excluded(self):
+        """Test confirmed booking hides listing for overlapping stays only, cancellation frees it"""
+        self.client.force_authenticate(user=self.owner)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("booking-confirm", args=[self.booking.id]))
+        self.assertEqual(BookedNight.objects.filter(booking=self.booking).count(), 2)
+
+        self.assertEqual(self.search(11, 15), [self.listings[1].id])
+        self.assertEqual(self.search(12, 15), [listing.id for listing in self.listings]) #check-out day is free
+
+        self.client.force_authenticate(user=self.tenant)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("booking-cancel", args=[self.booking.id]))
+        self.assertEqual(self.search(11, 15), [listing.id for listing in self.listings])
+
+    def test_search_and_batch_quotes(self):
+        """Test search by dates returns stay totals and quotes are priced in one batch"""
+        response = self.client.get(reverse("listing-list"), {
+            "check_in": (self.today + timedelta(days=1)).isoformat(),
+            "check_out": (self.today + timedelta(days=4)).isoformat(),
+        })
+        self.assertEqual({(item["nights"], item["total_price"]) for item in response.data["results"]}, {(3, "300.00")})
+        self.assertNotIn("total_price", self.client.get(reverse("listing-list")).data["results"][0])
+
+        self.booking.book_status = "confirmed"
+        self.booking.save()
+        BookingService.sync_booked_nights(self.booking)
+        items = [
+            {"listing_id": self.listings[0].id, "check_in": self.today + timedelta(days=11), "check_out": self.today + timedelta(days=13)},
+            {"listing_id": self.listings[1].id, "check_in": self.today + timedelta(days=11), "check_out": self.today + timedelta(days=13)},
+            {"listing_id": self.listings[1].id, "check_in": self.today, "check_out": self.today + timedelta(days=7), "guests": 5},
+            {"listing_id": 999999, "check_in": self.today, "check_out": self.today + timedelta(days=1)},
+        ]
+        with self.assertNumQueries(2):
+            response = self.client.post(reverse("booking-quote"), {"items": items}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        quotes = response.data["quotes"]
+        self.assertEqual((quotes[0]["available"], quotes[0]["total_price"]), (False, 200))
+        self.assertEqual((quotes[1]["available"], quotes[1]["nights"]), (True, 2))
+        self.assertIn("error", quotes[2])
+        self.assertIn("error", quotes[3])
+
+        response = self.client.post(reverse("booking-quote"), {"items": items * 26}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_invalid_range(self):
+        """Test search with reversed or partial dates is rejected"""
+        self.assertEqual(self.client.get(reverse("listing-list"), {"check_in": "2030-01-05"}).status_code, 400)
+        response = self.client.get(reverse("listing-list"), {"check_in": "2030-01-05", "check_out": "2030-01-01"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_rebuild_command(self):
+        """Test rebuild command indexes bookings confirmed outside of the service"""
+        Booking.objects.filter(pk=self.booking.pk).update(book_status="confirmed")
+        call_command("rebuild_booked_nights", stdout=StringIO())
+        self.assertEqual(self.search(9, 11), [self.listings[1].id])
+
+    def test_availability_calendar(self):
+        """Test calendar runs follow confirmations and the cached calendar is purged"""
+        url = reverse("listing-availability", args=[self.listings[0].id])
+        params = {"from": (self.today + timedelta(days=8)).isoformat(), "to": (self.today + timedelta(days=15)).isoformat()}
+        response = self.client.get(url, params)
+        self.assertEqual(response.data["runs"], [
+            {"status": "free", "start": self.today + timedelta(days=8), "end": self.today + timedelta(days=15), "nights": 7}
+        ])
+
+        self.client.force_authenticate(user=self.owner)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("booking-confirm", args=[self.booking.id]))
+        self.client.force_authenticate(user=None)
+        response = self.client.get(url, params)
+        self.assertEqual([(run["status"], run["nights"]) for run in response.data["runs"]], [
+            ("free", 2), ("booked", 2), ("free", 3)
+        ])
+        self.assertEqual(response.data["booked_nights"], 2)
+
+        params["to"] = (self.today + timedelta(days=400)).isoformat()
+        self.assertEqual(self.client.get(url, params).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class BookingConcurrencyTest(TransactionTestCase):
+    """Stress test for parallel bookings of one listing"""
+    def setUp(self):
+        self.owner = User.objects.create_user(
+            email="owner@example.com",
+            username="owner",
+            password="pass123",
+            role="owner"
+        )
+        self.tenant = User.objects.create_user(
+            email="tenant@example.com",
+            username="tenant",
+            password="pass123",
+            role="tenant"
+        )
+        self.listing = Listing.objects.create(
+            owner=self.owner,
+            title="Berlin Apartment",
+            description="Central location in Berlin",
+            address=Address.objects.create(country="Germany", city="Berlin", street="Test Street", postal_code="12345"),
+            price_per_night=100.00,
+            bedrooms=2,
+            bathrooms=1,
+            max_stayers=4,
+            house_type="apartment"
+        )
+
+    def book(self, i):
+        today = timezone.now().date()
+        check_in = today + timedelta(days=1 + i % 20)
+        try:
+            booking = BookingService.create_booking(self.tenant, {
+                'listing_id': self.listing.id,
+                'check_in': check_in,
+                'check_out': check_in + timedelta(days=1 + i % 3),
+                'stayers': 1,
+            })
+            BookingService.confirm_booking(booking, self.owner)
+            return 'confirmed'
+        except (BookingNotAvailableError, ResourceBusyError) as e:
+            return type(e).__name__
+        finally:
+            connection.close()
+
+    def test_parallel_bookings_never_overlap(self):
+        """Test hundreds of parallel instant bookings of one listing leave no overlapping confirmed stays"""
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            results = list(pool.map(self.book, range(200)))
+
+        confirmed = list(
+            Booking.objects.filter(listing=self.listing, book_status="confirmed")
+            .order_by("check_in").values_list("check_in", "check_out")
+        )
+        self.assertTrue(confirmed)
+        self.assertEqual(results.count("confirmed"), len(confirmed))
+        for (_, previous_check_out), (next_check_in, _) in zip(confirmed, confirmed[1:]):
+            self.assertLessEqual(previous_check_out, next_check_in)
+        nights = sum((check_out - check_in).days for check_in, check_out in confirmed)
+        self.assertEqual(BookedNight.objects.filter(listing=self.listing).count(), nights)
+
+
+class BookingCompletionTest(TestCase):
+    """Tests for complete_bookings command"""
+    def setUp(self):
+        self.owner = User.objects.create_user(
+            email="owner@example.com",
+            username="owner",
+            password="pass123",
+            role="owner"
+        )
+        self.tenant = User.objects.create_user(
+            email="tenant@example.com",
+            username="tenant",
+            password="pass123",
+            role="tenant"
+        )
+        self.listing = Listing.objects.create(
+            owner=self.owner,
+            title="Berlin Apartment",
+            description="Central location in Berlin",
+            address=Address.objects.create(country="Germany", city="Berlin", street="Test Street", postal_code="12345"),
+            price_per_night=100.00,
+            bedrooms=2,
+            bathrooms=1,
+            max_stayers=4,
+            house_type="apartment"
+        )
+        today = timezone.now().date()
+        self.past = [
+            Booking.objects.create(
+                listing=self.listing, tenant=self.tenant, stayers=1, book_status="confirmed",
+                check_in=today - timedelta(days=10 - i * 2), check_out=today - timedelta(days=9 - i * 2)
+            )
+            for i in range(3)
+        ]
+        self.future = Booking.objects.create(
+            listing=self.listing, tenant=self.tenant, stayers=1, book_status="confirmed",
+            check_in=today + timedelta(days=5), check_out=today + timedelta(days=7)
+        )
+        BookingService.rebuild_booked_nights()
+
+    def test_completes_checked_out_bookings_in_chunks(self):
+        """Test checked-out bookings are completed with history and freed nights, future ones are kept"""
+        out = StringIO()
+        call_command("complete_bookings", "--chunk-size", "2", stdout=out)
+        self.assertIn("Completed 3 bookings", out.getvalue())
+        self.assertIn("rows/sec", out.getvalue())
+
+        self.assertEqual(Booking.objects.filter(book_status="completed").count(), 3)
+        self.assertEqual(Booking.objects.get(pk=self.future.pk).book_status, "confirmed")
+        self.assertEqual(BookingStatusHistory.objects.filter(history_status="completed").count(), 3)
+        self.assertFalse(BookedNight.objects.filter(booking__in=self.past).exists())
+        self.assertTrue(JobCheckpoint.load("complete_bookings").state["finished"])
+
+    def test_dry_run_and_resume(self):
+        """Test dry run changes nothing and an unfinished checkpoint resumes after its last id"""
+        out = StringIO()
+        call_command("complete_bookings", "--dry-run", stdout=out)
+        self.assertIn("3 bookings would be completed", out.getvalue())
+        self.assertEqual(Booking.objects.filter(book_status="completed").count(), 0)
+
+        JobCheckpoint.load("complete_bookings").save_state(last_id=self.past[0].pk, finished=False)
+        call_command("complete_bookings", stdout=StringIO())
+        self.assertEqual(Booking.objects.get(pk=self.past[0].pk).book_status, "confirmed")
+        self.assertEqual(Booking.objects.filter(book_status="completed").count(), 2)
+
+    def test_expire_stale_pending_bookings(self):
+        """Test pending bookings past check-in or the owner response window expire, fresh ones stay pending"""
+        today = timezone.now().date()
+        started = Booking.objects.create(
+            listing=self.listing, tenant=self.tenant, stayers=1,
+            check_in=today, check_out=today + timedelta(days=2)
+        )
+        unanswered = Booking.objects.create(
+            listing=self.listing, tenant=self.tenant, stayers=1,
+            check_in=today + timedelta(days=20), check_out=today + timedelta(days=22)
+        )
+        Booking.objects.filter(pk=unanswered.pk).update(created_at=timezone.now() - timedelta(days=5))
+        fresh = Booking.objects.create(
+            listing=self.listing, tenant=self.tenant, stayers=1,
+            check_in=today + timedelta(days=30), check_out=today + timedelta(days=32)
+        )
+
+        out = StringIO()
+        call_command("expire_pending_bookings", "--chunk-size", "1", stdout=out)
+        self.assertIn("Expired 2 bookings", out.getvalue())
+        statuses = dict(Booking.objects.filter(pk__in=[started.pk, unanswered.pk, fresh.pk]).values_list("pk", "book_status"))
+        self.assertEqual(statuses, {started.pk: "expired", unanswered.pk: "expired", fresh.pk: "pending"})
+        self.assertEqual(BookingStatusHistory.objects.filter(history_status="expired").count(), 2)
+
+
+class OccupancyAnalyticsTest(APITestCase):
+    """Tests for the occupancy and revenue cube"""
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(
+            email="owner@example.com",
+            username="owner",
+            password="pass123",
+            role="owner"
+        )
+        self.tenant = User.objects.create_user(
+            email="tenant@example.com",
+            username="tenant",
+            password="pass123",
+            role="tenant"
+        )
+        self.listings = [
+            Listing.objects.create(
+                owner=self.owner,
+                title=f"Apartment {land}",
+                description="Central location",
+                address=Address.objects.create(
+                    city=city, land=land, street="Test Street", house_number="1", postal_code="12345"
+                ),
+                price_per_night=100.00,
+                bedrooms=2,
+                bathrooms=1,
+                max_stayers=4,
+                house_type="apartment"
+            )
+            for city, land in (("Berlin", "berlin"), ("Munich", "bayern"))
+        ]
+        today = timezone.now().date()
+        self.first_month = date(today.year + 1, 1, 1)
+        for listing, check_in, nights, price, book_status in (
+            (self.listings[0], date(today.year + 1, 1, 31), 3, 300, "confirmed"),
+            (self.listings[1], date(today.year + 1, 1, 10), 2, 500, "completed"),
+            (self.listings[1], date(today.year + 1, 1, 20), 2, 200, "pending"),
+        ):
+            Booking.objects.create(
+                listing=listing, tenant=self.tenant, check_in=check_in, check_out=check_in + timedelta(days=nights),
+                total_price=price, stayers=1, book_status=book_status
+            )
+
+    def test_cube_matches_naive_implementation(self):
+        """Test stays are split into months and the vectorized cube equals the reference one"""
+        cube = occupancy_cube("land", self.first_month, 2)
+        self.assertEqual(cube["months"], [f"{self.first_month.year}-01", f"{self.first_month.year}-02"])
+        groups = {group["key"]: group for group in cube["groups"]}
+        self.assertEqual(groups["berlin"]["nights"], [1, 2])
+        self.assertEqual(groups["berlin"]["revenue"], [100.0, 200.0])
+        self.assertEqual(groups["bayern"]["nights"], [2, 0])
+        self.assertEqual(groups["bayern"]["capacity"], [31, 28])
+        self.assertEqual(groups["bayern"]["occupancy"], [round(2 / 31, 4), 0.0])
+        self.assertEqual(cube["totals"]["revenue"], 800.0)
+
+        for dimension in ("land", "city", "house_type"):
+            self.assertTrue(cubes_match(
+                occupancy_cube(dimension, self.first_month, 3, chunk_size=1), naive_cube(dimension, self.first_month, 3)
+            ))
+
+        out = StringIO()
+        call_command("benchmark_analytics", "--from", self.first_month.strftime("%Y-%m"), "--repeat", "1", stdout=out)
+        self.assertIn("Results match", out.getvalue())
+
+    def test_endpoint_for_admin_only(self):
+        """Test analytics endpoint validates params and is available for admins only"""
+        url = reverse("occupancy-analytics")
+        self.client.force_authenticate(user=self.owner)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+        admin = User.objects.create_user(email="admin@example.com", username="admin", password="pass123", role="admin")
+        self.client.force_authenticate(user=admin)
+        self.assertEqual(self.client.get(url, {"dimension": "street"}).status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(url, {"dimension": "city", "from": self.first_month.strftime("%Y-%m"), "months": 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["totals"]["nights"], 5)
@@ -4,9 +4,14 @@ from . import views
 urlpatterns = [
     path('bookings/', views.BookingListCreateView.as_view(), name='booking-list-create'),
 
+    path('bookings/quote/', views.quote_bookings, name='booking-quote'),
+    path('bookings/bulk/', views.bulk_booking_action, name='booking-bulk-action'),
     path('bookings/received/', views.OwnerBookingsView.as_view(), name='owner-bookings'),
     path('bookings/<int:pk>/', views.BookingDetailView.as_view(), name='booking-detail'),
     path('bookings/<int:pk>/confirm/', views.confirm_booking, name='booking-confirm'),
     path('bookings/<int:pk>/reject/', views.reject_booking, name='booking-reject'),
     path('bookings/<int:pk>/cancel/', views.cancel_booking, name='booking-cancel'),
+
+    path('analytics/occupancy/', views.occupancy_analytics, name='occupancy-analytics'),
+    path('listings/<int:pk>/availability/', views.listing_availability, name='listing-availability'),
 ]
\ No newline at end of file
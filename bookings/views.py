@@ -1,14 +1,28 @@
 import logging
+from datetime import date, timedelta
+
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema, OpenApiParameter
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import APIException
 from rest_framework.generics import ListAPIView, RetrieveAPIView, ListCreateAPIView
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 
-from .models import Booking
-from .serializers import BookingSerializer, BookingDetailSerializer, BookingCreateSerializer
-from .services import BookingService
-from users.permissions import Tenant
+from .models import Booking, BookingStatusHistory
+from .serializers import (
+    BookingSerializer, BookingDetailSerializer, BookingCreateSerializer,
+    BookingBulkActionSerializer, BookingQuoteSerializer
+)
+from .services import BookingService, AVAILABILITY_MAX_DAYS, QUOTE_MAX_ITEMS
+from .analytics import occupancy_cube, DIMENSIONS, ANALYTICS_MAX_MONTHS
+from listings.models import Listing
+from users.permissions import Tenant, Admin
+from core.conditional import ConditionalRetrieveMixin, related_version
+from core.cache import cache_response
 
 logger = logging.getLogger(__name__)
 
@@ -29,18 +43,33 @@ class BookingListCreateView(ListCreateAPIView):
         booking = BookingService.create_booking(self.request.user, serializer.validated_data)
         serializer.instance = booking
 
-class BookingDetailView(RetrieveAPIView):
+class BookingDetailView(ConditionalRetrieveMixin, RetrieveAPIView):
     """Retrieves booking details"""
     serializer_class = BookingDetailSerializer
     permission_classes = [IsAuthenticated]
     lookup_field = 'pk'
+    version_fields = (
+        'updated_at', 'tenant__updated_at', 'listing__updated_at', 'listing__address__updated_at',
+        'listing__owner__updated_at', 'listing__main_image__updated_at', 'listing__rating_sum',
+        'listing__rating_count', 'history_updated', 'history_count'
+    )
+    version_by_day = True
 
-    def get_queryset(self):
+    def get_visible_bookings(self):
         user = self.request.user
         if user.is_admin:
             return Booking.objects.all()
         return Booking.objects.filter(tenant=user) | Booking.objects.filter(listing__owner=user)
 
+    def get_version_queryset(self):
+        history_updated, history_count = related_version(BookingStatusHistory.objects.all(), 'booking')
+        return self.get_visible_bookings().annotate(history_updated=history_updated, history_count=history_count)
+
+    def get_queryset(self):
+        return self.get_visible_bookings().select_related(
+            'tenant', 'listing__owner', 'listing__address', 'listing__main_image'
+        ).prefetch_related('status_history__changed_by')
+
 class OwnerBookingsView(ListAPIView):
     """Bookings list received by owner"""
     serializer_class = BookingSerializer
@@ -60,6 +89,8 @@ def confirm_booking(request, pk):
         return Response({'id': booking.id, 'book_status': booking.book_status, 'message': 'Booking confirmed'})
     except Booking.DoesNotExist:
         return Response({'error': 'Booking not found'}, status=status.HTTP_404_NOT_FOUND)
+    except APIException as e: #access, conflict and busy errors keep their status code
+        return Response({'error': str(e.detail)}, status=e.status_code)
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -74,6 +105,8 @@ def reject_booking(request, pk):
         return Response({'id': booking.id, 'book_status': booking.book_status, 'message': 'Booking rejected'})
     except Booking.DoesNotExist:
         return Response({'error': 'Booking not found'}, status=status.HTTP_404_NOT_FOUND)
+    except APIException as e: #access, conflict and busy errors keep their status code
+        return Response({'error': str(e.detail)}, status=e.status_code)
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -87,5 +120,104 @@ def cancel_booking(request, pk):
         return Response({'id': booking.id, 'book_status': booking.book_status, 'message': 'Booking cancelled'})
     except Booking.DoesNotExist:
         return Response({'error': 'Booking not found'}, status=status.HTTP_404_NOT_FOUND)
+    except APIException as e: #access, conflict and busy errors keep their status code
+        return Response({'error': str(e.detail)}, status=e.status_code)
     except Exception as e:
-        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+@extend_schema(
+    request=BookingBulkActionSerializer,
+    responses={200: dict},
+    description='Confirms, rejects or cancels up to 500 bookings, every id gets its own result '
+                '(ok, not_found, forbidden, conflict, not_available)'
+)
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def bulk_booking_action(request):
+    """Bulk booking confirmation, rejection or cancellation"""
+    serializer = BookingBulkActionSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    try:
+        results = BookingService.bulk_change_status(
+            serializer.validated_data['ids'], serializer.validated_data['action'],
+            request.user, serializer.validated_data['reason']
+        )
+    except APIException as e: #busy error keeps its status code
+        return Response({'error': str(e.detail)}, status=e.status_code)
+
+    summary = {}
+    for result in results:
+        summary[result['result']] = summary.get(result['result'], 0) + 1
+    return Response({'results': results, 'summary': summary})
+
+@extend_schema(
+    request=BookingQuoteSerializer,
+    responses={200: dict},
+    description=f'Total price and availability of up to {QUOTE_MAX_ITEMS} stays (listing and dates) in one request'
+)
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def quote_bookings(request):
+    """Batch price quotes"""
+    serializer = BookingQuoteSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    return Response({'quotes': BookingService.quote(serializer.validated_data['items'])})
+
+@extend_schema(
+    parameters=[
+        OpenApiParameter('from', OpenApiTypes.DATE, description='First night, today by default'),
+        OpenApiParameter('to', OpenApiTypes.DATE, description='Day after the last night, 30 days after from by default'),
+    ],
+    responses={200: dict},
+    description=f'Booked and free nights of a listing as runs, range of at most {AVAILABILITY_MAX_DAYS} days'
+)
+@api_view(['GET'])
+@permission_classes([AllowAny])
+@cache_response('listing-availability', tags=lambda request, kwargs: [
+    f'availability:{kwargs["pk"]}', f'listing:{kwargs["pk"]}'
+])
+def listing_availability(request, pk):
+    """Availability calendar of a listing"""
+    try:
+        start = date.fromisoformat(request.query_params['from']) if 'from' in request.query_params else timezone.now().date()
+        end = date.fromisoformat(request.query_params['to']) if 'to' in request.query_params else start + timedelta(days=30)
+    except ValueError:
+        return Response({'error': 'Dates must be in YYYY-MM-DD format'}, status=status.HTTP_400_BAD_REQUEST)
+    if end <= start:
+        return Response({'error': 'to must be after from'}, status=status.HTTP_400_BAD_REQUEST)
+    if (end - start).days > AVAILABILITY_MAX_DAYS:
+        return Response({'error': f'Range is limited to {AVAILABILITY_MAX_DAYS} days'}, status=status.HTTP_400_BAD_REQUEST)
+
+    get_object_or_404(Listing.objects.filter(is_active=True).only('pk'), pk=pk)
+    return Response(BookingService.get_availability(pk, start, end))
+
+@extend_schema(
+    parameters=[
+        OpenApiParameter('dimension', str, enum=list(DIMENSIONS), description='Grouping of listings, land by default'),
+        OpenApiParameter('from', str, description='First month (YYYY-MM), 11 months before the current one by default'),
+        OpenApiParameter('months', int, description=f'Amount of months, 12 by default, at most {ANALYTICS_MAX_MONTHS}'),
+    ],
+    responses={200: dict},
+    description='Booked nights, occupancy rate and revenue per group of listings and month'
+)
+@api_view(['GET'])
+@permission_classes([Admin])
+@cache_response('occupancy-analytics', tags=['booked-nights', 'listings'])
+def occupancy_analytics(request):
+    """Platform occupancy and revenue cube for admins"""
+    dimension = request.query_params.get('dimension', 'land')
+    if dimension not in DIMENSIONS:
+        return Response({'error': f'dimension must be one of {", ".join(DIMENSIONS)}'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        months = int(request.query_params.get('months', 12))
+        if 'from' in request.query_params:
+            first_month = date.fromisoformat(f'{request.query_params["from"]}-01')
+        else:
+            today = timezone.now().date()
+            first_month = date(today.year - (1 if today.month < 12 else 0), today.month % 12 + 1, 1)
+    except ValueError:
+        return Response({'error': 'from must be in YYYY-MM format, months a number'}, status=status.HTTP_400_BAD_REQUEST)
+    if not 1 <= months <= ANALYTICS_MAX_MONTHS:
+        return Response({'error': f'months must be between 1 and {ANALYTICS_MAX_MONTHS}'}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response(occupancy_cube(dimension, first_month, months))
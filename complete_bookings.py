@@ -4,32 +4,13 @@ import django
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'RentalApp.settings')
 django.setup()
 
-from django.utils import timezone
-from bookings.models import Booking, BookingStatusHistory
+from django.core.management import call_command
 
 
 def complete_bookings():
-    today = timezone.now().date()
-
-    bookings = Booking.objects.filter(
-        book_status='confirmed',
-        check_out__lt=today
-    )
-
-    count = 0
-    for booking in bookings:
-        booking.book_status = 'completed'
-        booking.save()
-
-        BookingStatusHistory.objects.create(
-            booking=booking,
-            history_status='completed',
-            comment='Automatically completed after check-out date'
-        )
-        count += 1
-
-    print(f'Completed {count} bookings')
+    """Kept for existing cron entries, the work is done by the complete_bookings management command"""
+    call_command('complete_bookings')
 
 
 if __name__ == '__main__':
-    complete_bookings()
\ No newline at end of file
+    complete_bookings()
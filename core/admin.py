@@ -0,0 +1,19 @@
+from django.contrib import admin
+from .models import JobCheckpoint, ScheduledJob
+
+
+@admin.register(JobCheckpoint)
+class JobCheckpointAdmin(admin.ModelAdmin):
+    """Admin config. for job checkpoints"""
+    list_display = ['name', 'state', 'updated_at']
+    readonly_fields = ['created_at', 'updated_at']
+
+
+@admin.register(ScheduledJob)
+class ScheduledJobAdmin(admin.ModelAdmin):
+    """Admin config. for scheduled jobs"""
+    list_display = ['name', 'next_run_at', 'last_success_at', 'last_duration', 'runs', 'failures', 'lease_owner']
+    readonly_fields = [
+        'lease_owner', 'lease_until', 'last_started_at', 'last_success_at', 'last_duration',
+        'last_error', 'runs', 'failures', 'created_at', 'updated_at'
+    ]
@@ -0,0 +1,67 @@
+import logging
+import time
+
+from django.utils import timezone
+
+from .models import JobCheckpoint
+
+logger = logging.getLogger(__name__)
+
+
+class ChunkedJob:
+    """
+    Processes a queryset in id-ordered chunks, keyset paginated (no OFFSET)
+    Last finished chunk is stored in a JobCheckpoint, so a crashed run resumes after it,
+    a run that finished starts from the beginning next time
+    """
+    def __init__(self, name, queryset, chunk_size=500):
+        self.name = name
+        self.queryset = queryset
+        self.chunk_size = chunk_size
+
+    def start_id(self, checkpoint):
+        if checkpoint.state.get('finished', True):
+            return 0
+        return checkpoint.state.get('last_id', 0)
+
+    def pending(self):
+        """Amount of rows the next run would go through"""
+        checkpoint = JobCheckpoint.load(self.name)
+        return self.queryset.filter(pk__gt=self.start_id(checkpoint)).count()
+
+    def run(self, process, on_chunk=None):
+        """
+        Calls process(ids) for every chunk, it returns ids it actually changed
+        Returns stats: processed/changed rows, seconds and rows per second
+        """
+        checkpoint = JobCheckpoint.load(self.name)
+        last_id = self.start_id(checkpoint)
+        if last_id:
+            logger.info(f'{self.name}: resuming after id {last_id}')
+
+        stats = {'processed': 0, 'changed': 0, 'seconds': 0.0, 'rate': 0.0}
+        started = time.monotonic()
+        while True:
+            ids = list(
+                self.queryset.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:self.chunk_size]
+            )
+            if not ids:
+                break
+            stats['changed'] += len(process(ids))
+            stats['processed'] += len(ids)
+            last_id = ids[-1]
+            checkpoint.save_state(last_id=last_id, finished=False)
+
+            stats['seconds'] = time.monotonic() - started
+            stats['rate'] = stats['processed'] / stats['seconds'] if stats['seconds'] else 0.0
+            if on_chunk:
+                on_chunk(stats)
+
+        stats['seconds'] = time.monotonic() - started
+        stats['rate'] = stats['processed'] / stats['seconds'] if stats['seconds'] else 0.0
+        checkpoint.save_state(
+            last_id=last_id, finished=True, finished_at=timezone.now().isoformat(),
+            processed=stats['processed'], changed=stats['changed']
+        )
+        logger.info(f'{self.name}: {stats["changed"]} of {stats["processed"]} rows changed, {stats["rate"]:.0f} rows/sec')
+        return stats
@@ -0,0 +1,90 @@
+import atexit
+import logging
+import threading
+import time
+
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+class BufferedWriter:
+    """
+    Base for write-behind buffers
+    Records are collected in memory and written by flush(): from a background thread every flush_seconds,
+    synchronously once max_pending records are waiting and on interpreter shutdown
+    """
+    name = 'buffer'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        atexit.register(self.flush)
+
+    # settings are read lazily, so the buffer can be created at import time
+    @property
+    def flush_seconds(self):
+        raise NotImplementedError
+
+    @property
+    def max_pending(self):
+        raise NotImplementedError
+
+    def pending(self):
+        """Amount of buffered records, called with the lock held"""
+        raise NotImplementedError
+
+    def swap(self):
+        """Takes buffered records out of the buffer, called with the lock held"""
+        raise NotImplementedError
+
+    def restore(self, batch):
+        """Puts records of a failed flush back, called with the lock held"""
+        raise NotImplementedError
+
+    def write(self, batch):
+        """Writes records to database"""
+        raise NotImplementedError
+
+    def _after_record(self, pending):
+        """Call after adding records (outside of the lock)"""
+        self._ensure_thread()
+        if pending >= self.max_pending:
+            self.flush()
+
+    def _ensure_thread(self):
+        if self._thread is not None or not self.flush_seconds:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f'{self.name}-flusher', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_seconds)
+            close_old_connections()
+            self.flush()
+
+    def clear(self):
+        """Drops buffered records without writing them"""
+        with self._lock:
+            self.swap()
+
+    def flush(self):
+        """Writes buffered records, returns amount of written records"""
+        with self._flush_lock:
+            with self._lock:
+                if not self.pending():
+                    return 0
+                batch = self.swap()
+            try:
+                written = self.write(batch)
+            except Exception:
+                logger.exception(f'Flushing {self.name} failed, records are kept for the next flush')
+                with self._lock:
+                    self.restore(batch)
+                return 0
+        logger.debug(f'Flushed {written} records from {self.name}')
+        return written
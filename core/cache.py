@@ -0,0 +1,136 @@
+import hashlib
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+
+class ResponseCache:
+    """
+    Cache for rendered API responses with tag based invalidation
+    Every tag has a version counter, an entry stores versions of its tags and is treated as a miss
+    once any of them was purged. Works with any cache backend, no key scanning needed
+    """
+    prefix = 'resp'
+
+    def __init__(self):
+        self.names = set()
+
+    @property
+    def timeout(self):
+        return settings.RESPONSE_CACHE_TIMEOUT
+
+    def _tag_key(self, tag):
+        return f'{self.prefix}:tag:{tag}'
+
+    def make_key(self, name, request, defaults=None):
+        """Key from view name, auth class and query params (sorted, empty and default values stripped)"""
+        defaults = defaults or {}
+        params = sorted(
+            (param, value)
+            for param, values in request.query_params.lists()
+            for value in values
+            if value != '' and defaults.get(param) != value
+        )
+        auth = 'user' if request.user.is_authenticated else 'anon'
+        digest = hashlib.md5(json.dumps(params).encode()).hexdigest()
+        return f'{self.prefix}:{name}:{auth}:{digest}'
+
+    def tag_versions(self, tags):
+        keys = {self._tag_key(tag): tag for tag in tags}
+        found = cache.get_many(keys)
+        return {tag: found.get(key, 0) for key, tag in keys.items()}
+
+    def get(self, name, key):
+        entry = cache.get(key)
+        if entry is not None and self.tag_versions(entry['tags']) == entry['tags']:
+            self._count(name, 'hits')
+            return entry['data']
+        self._count(name, 'misses')
+        return None
+
+    def set(self, key, data, versions, extra_tags=(), timeout=None):
+        """
+        Stores data, versions have to be read before the data was rendered,
+        so a purge that happened meanwhile invalidates the entry right away
+        """
+        tags = dict(versions)
+        missing = [tag for tag in extra_tags if tag not in tags]
+        tags.update(self.tag_versions(missing))
+        cache.set(key, {'tags': tags, 'data': data}, timeout or self.timeout)
+
+    def purge(self, *tags):
+        for tag in set(tags):
+            key = self._tag_key(tag)
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, 1, None)
+
+    def purge_on_commit(self, *tags):
+        transaction.on_commit(lambda: self.purge(*tags))
+
+    def _count(self, name, kind):
+        for key in (f'{self.prefix}:stats:{kind}', f'{self.prefix}:stats:{name}:{kind}'):
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, 1, None)
+
+    def stats(self):
+        names = sorted(self.names)
+        keys = [f'{self.prefix}:stats:{kind}' for kind in ('hits', 'misses')]
+        keys += [f'{self.prefix}:stats:{name}:{kind}' for name in names for kind in ('hits', 'misses')]
+        values = cache.get_many(keys)
+
+        def summary(prefix):
+            hits = values.get(f'{prefix}:hits', 0)
+            misses = values.get(f'{prefix}:misses', 0)
+            total = hits + misses
+            return {'hits': hits, 'misses': misses, 'hit_rate': round(hits / total, 3) if total else None}
+
+        result = summary(f'{self.prefix}:stats')
+        result['views'] = {name: summary(f'{self.prefix}:stats:{name}') for name in names}
+        return result
+
+
+response_cache = ResponseCache()
+
+
+def cache_response(name, tags=(), tags_for=None, defaults=None):
+    """
+    Caches successful GET responses of a view method or @api_view function
+    tags - tags known before rendering (table tags), may be a callable(request, kwargs)
+    tags_for - callable(data, kwargs) returning tags that depend on response data (listing ids on a page)
+    defaults - query params equal to these are left out of the cache key, may be a callable(request)
+    """
+    response_cache.names.add(name)
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            request = args[0] if isinstance(args[0], Request) else args[1]
+            if request.method != 'GET':
+                return func(*args, **kwargs)
+
+            url_kwargs = ':'.join(str(kwargs[param]) for param in sorted(kwargs))
+            key = response_cache.make_key(
+                f'{name}:{url_kwargs}', request, defaults(request) if callable(defaults) else defaults
+            )
+            data = response_cache.get(name, key)
+            if data is not None:
+                return Response(data)
+
+            versions = response_cache.tag_versions(tags(request, kwargs) if callable(tags) else tags)
+            response = func(*args, **kwargs)
+            if response.status_code == 200:
+                extra_tags = tags_for(response.data, kwargs) if tags_for else ()
+                response_cache.set(key, response.data, versions, extra_tags)
+            return response
+        return wrapper
+    return decorator
+
@@ -0,0 +1,81 @@
+import calendar
+import hashlib
+from datetime import datetime
+
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.utils.cache import get_conditional_response
+from django.utils import timezone
+from django.utils.http import http_date
+
+
+def related_version(queryset, link, field='updated_at'):
+    """
+    Subqueries with the latest `field` and amount of related rows, `link` is the fk to the outer model
+    The amount catches deletions, the latest timestamp catches changes and additions
+    """
+    related = queryset.filter(**{link: OuterRef('pk')}).order_by().values(link)
+    return (
+        Subquery(related.annotate(value=Max(field)).values('value')[:1]),
+        Subquery(related.annotate(value=Count('pk')).values('value')[:1]),
+    )
+
+
+def make_validators(parts, by_day=False):
+    """
+    Weak ETag from all version parts and Last-Modified from the latest timestamp among them
+    Returns (etag, last_modified) with last_modified as unix timestamp or None
+    by_day - representation depends on the current date: the date goes into the ETag and Last-Modified is left out,
+    since it would not change at midnight and If-Modified-Since would keep matching
+    """
+    parts = list(parts)
+    if by_day:
+        parts.append(timezone.now().date().isoformat())
+    digest = hashlib.md5(repr(parts).encode()).hexdigest()
+    moments = [part for part in parts if isinstance(part, datetime)]
+    last_modified = calendar.timegm(max(moments).utctimetuple()) if moments and not by_day else None
+    return f'W/"{digest}"', last_modified
+
+
+def not_modified(request, etag, last_modified):
+    """304 response when client copy is still valid, None otherwise"""
+    response = get_conditional_response(getattr(request, '_request', request), etag=etag, last_modified=last_modified)
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+class ConditionalRetrieveMixin:
+    """
+    Conditional GET for retrieve views
+    Version of the object is read with one query over get_version_queryset() (no prefetches, no serialization),
+    a matching If-None-Match/If-Modified-Since is answered with 304 right away
+    """
+    version_fields = ('updated_at',)
+    version_by_day = False #representation has date dependent fields (age, cancelation)
+
+    def get_version_queryset(self):
+        return self.get_queryset()
+
+    def get_version(self):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.get_version_queryset().filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        row = queryset.order_by().values_list(*self.version_fields)[:1]
+        if not row:
+            return None
+        return make_validators(row[0], by_day=self.version_by_day)
+
+    def retrieve(self, request, *args, **kwargs):
+        validators = self.get_version()
+        if validators is None: #let get_object raise 404
+            return super().retrieve(request, *args, **kwargs)
+        response = not_modified(request, *validators)
+        if response is None:
+            response = set_validators(super().retrieve(request, *args, **kwargs), *validators)
+        return response
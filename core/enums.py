@@ -52,12 +52,24 @@ class BookingStatus(StrEnum):
     confirmed = "Confirmed"
     cancelled = "Cancelled"
     completed = "Completed"
+    expired = "Expired"
 
     @classmethod
     def choices(cls):
         return [(book_stat.name, book_stat.value) for book_stat in cls]
 
 
+class PricingRuleKind(StrEnum):
+    """kind of listing pricing rule"""
+    weekday = "Weekday"
+    season = "Season"
+    length_of_stay = "Length of stay"
+
+    @classmethod
+    def choices(cls):
+        return [(kind.name, kind.value) for kind in cls]
+
+
 class VerificationStatus(StrEnum):
     """Verification status"""
     pending = "Pending"
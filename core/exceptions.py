@@ -34,4 +34,17 @@ class ReviewError(APIException):
     """Exception if user already left a review"""
     status_code = status.HTTP_400_BAD_REQUEST
     default_detail = 'User already left a review'
-    default_code = 'already_reviewed'
\ No newline at end of file
+    default_code = 'already_reviewed'
+
+class ResourceBusyError(APIException):
+    """Exception if a lock could not be taken after retries"""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Resource is busy, please retry'
+    default_code = 'resource_busy'
+
+
+class BookingStatusConflictError(APIException):
+    """Exception if booking status was changed meanwhile or the transition is not allowed"""
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'Booking status cannot be changed'
+    default_code = 'booking_status_conflict'
@@ -0,0 +1,72 @@
+import logging
+from collections import Counter
+from contextvars import ContextVar
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_current_loader = ContextVar('request_loader', default=None)
+
+
+class RequestLoader:
+    """
+    Identity map shared by serializers and services during one request
+    Every lookup result is loaded once per request, `hits` counts lookups that were saved
+    """
+    def __init__(self):
+        self._results = {}
+        self.stats = Counter()
+
+    def load(self, key, func):
+        if key in self._results:
+            self.stats['hits'] += 1
+            return self._results[key]
+        self.stats['loads'] += 1
+        result = self._results[key] = func()
+        return result
+
+    def forget(self, key):
+        self._results.pop(key, None)
+
+
+def load(key, func):
+    """Result of func, called at most once per request for the key (every time outside of requests)"""
+    loader = _current_loader.get()
+    if loader is None:
+        return func()
+    return loader.load(key, func)
+
+
+def forget(key):
+    """Drops a cached result after the entity was changed"""
+    loader = _current_loader.get()
+    if loader is not None:
+        loader.forget(key)
+
+
+def get_object(model, **lookup):
+    """model.objects.get(**lookup) through the request identity map"""
+    key = ('object', model._meta.label, tuple(sorted(lookup.items())))
+    return load(key, lambda: model.objects.get(**lookup))
+
+
+class RequestLoaderMiddleware:
+    """Creates the identity map for every request, lookup stats go to the log and X-Loader-Stats header (DEBUG)"""
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        loader = RequestLoader()
+        token = _current_loader.set(loader)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_loader.reset(token)
+
+        if loader.stats:
+            loads, hits = loader.stats['loads'], loader.stats['hits']
+            logger.debug(f'{request.method} {request.path}: {loads} lookups loaded, {hits} saved')
+            if settings.DEBUG:
+                response['X-Loader-Stats'] = f'loads={loads}; hits={hits}'
+        return response
@@ -0,0 +1,43 @@
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.db import OperationalError, transaction
+
+from .exceptions import ResourceBusyError
+
+logger = logging.getLogger(__name__)
+
+# mysql: lock wait timeout, deadlock, NOWAIT lock not available
+MYSQL_LOCK_ERRORS = (1205, 1213, 3572)
+
+
+def is_lock_error(error):
+    """Lock conflicts that are worth a retry (row locked by NOWAIT, deadlock, sqlite database lock)"""
+    code = error.args[0] if error.args else None
+    if code in MYSQL_LOCK_ERRORS:
+        return True
+    message = str(error).lower()
+    return 'could not obtain lock' in message or 'database is locked' in message
+
+
+def retry_on_lock(func, attempts=None, backoff=None):
+    """
+    Runs func in its own transaction, retrying lock conflicts with jittered exponential backoff
+    Lock waits stay bounded: locks are taken with NOWAIT and the sum of sleeps is limited by attempts,
+    after the last attempt ResourceBusyError is raised
+    """
+    attempts = attempts or settings.LOCK_RETRY_ATTEMPTS
+    backoff = backoff or settings.LOCK_RETRY_BACKOFF_SECONDS
+    for attempt in range(attempts):
+        try:
+            with transaction.atomic():
+                return func()
+        except OperationalError as e:
+            if not is_lock_error(e):
+                raise
+            if attempt == attempts - 1:
+                logger.warning(f'Giving up after {attempts} lock conflicts: {e}')
+                raise ResourceBusyError()
+            time.sleep(min(backoff * 2 ** attempt, 1) * random.uniform(0.5, 1.5))
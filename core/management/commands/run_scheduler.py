@@ -0,0 +1,44 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils.module_loading import autodiscover_modules
+
+from core.scheduler import Scheduler, registry
+
+
+class Command(BaseCommand):
+    """Worker process running periodic jobs registered in <app>/jobs.py"""
+    help = 'Runs periodic maintenance jobs, safe to start on several replicas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run due jobs once and exit')
+        parser.add_argument('--max-sleep', type=int, default=60, help='Longest pause between checks (seconds)')
+
+    def handle(self, *args, **options):
+        autodiscover_modules('jobs')
+        scheduler = Scheduler()
+        scheduler.register_jobs()
+        self.stdout.write(f'Scheduler {scheduler.worker_id} with jobs: {", ".join(sorted(registry))}')
+
+        if options['once']:
+            ran = scheduler.run_pending()
+            self.stdout.write(self.style.SUCCESS(f'Ran {len(ran)} jobs: {", ".join(ran)}'))
+            return
+
+        self.running = True
+
+        def stop(signum, frame):
+            self.running = False
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        while self.running:
+            close_old_connections()
+            scheduler.run_pending()
+            sleep = scheduler.seconds_until_next(options['max_sleep'])
+            while self.running and sleep > 0: #short sleeps, so a stop signal is handled quickly
+                time.sleep(min(sleep, 1))
+                sleep -= 1
+        self.stdout.write('Scheduler stopped')
@@ -0,0 +1,29 @@
+# Generated by Django 6.0 on 2026-10-17 04:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Creation date')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Update date')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('state', models.JSONField(blank=True, default=dict)),
+            ],
+            options={
+                'verbose_name': 'Job checkpoint',
+                'verbose_name_plural': 'Job checkpoints',
+                'db_table': 'job_checkpoints',
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 6.0 on 2026-10-17 05:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduledJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Creation date')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Update date')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('next_run_at', models.DateTimeField(blank=True, null=True)),
+                ('lease_owner', models.CharField(blank=True, max_length=100)),
+                ('lease_until', models.DateTimeField(blank=True, null=True)),
+                ('last_started_at', models.DateTimeField(blank=True, null=True)),
+                ('last_success_at', models.DateTimeField(blank=True, null=True)),
+                ('last_duration', models.FloatField(blank=True, null=True, verbose_name='Last duration (s)')),
+                ('last_error', models.TextField(blank=True)),
+                ('runs', models.PositiveIntegerField(default=0)),
+                ('failures', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Scheduled job',
+                'verbose_name_plural': 'Scheduled jobs',
+                'db_table': 'scheduled_jobs',
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+from django.db import models
+from core.mixins import TimestampMixin
+
+
+class JobCheckpoint(TimestampMixin):
+    """Progress of a periodic/batch job, so the next run continues where the last one stopped"""
+    name = models.CharField(max_length=100, unique=True)
+    state = models.JSONField(default=dict, blank=True)
+
+    class Meta:
+        db_table = 'job_checkpoints'
+        verbose_name = 'Job checkpoint'
+        verbose_name_plural = 'Job checkpoints'
+
+    def __str__(self):
+        return self.name
+
+    @classmethod
+    def load(cls, name):
+        checkpoint, _ = cls.objects.get_or_create(name=name)
+        return checkpoint
+
+    def save_state(self, **state):
+        self.state = state
+        self.save(update_fields=['state', 'updated_at'])
+
+
+class ScheduledJob(TimestampMixin):
+    """
+    State of a periodic job run by the run_scheduler worker
+    Lease fields make sure only one worker across replicas runs the job at a time
+    """
+    name = models.CharField(max_length=100, unique=True)
+    next_run_at = models.DateTimeField(null=True, blank=True)
+    lease_owner = models.CharField(max_length=100, blank=True)
+    lease_until = models.DateTimeField(null=True, blank=True)
+    last_started_at = models.DateTimeField(null=True, blank=True)
+    last_success_at = models.DateTimeField(null=True, blank=True)
+    last_duration = models.FloatField(null=True, blank=True, verbose_name='Last duration (s)')
+    last_error = models.TextField(blank=True)
+    runs = models.PositiveIntegerField(default=0)
+    failures = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'scheduled_jobs'
+        verbose_name = 'Scheduled job'
+        verbose_name_plural = 'Scheduled jobs'
+
+    def __str__(self):
+        return self.name
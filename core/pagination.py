@@ -0,0 +1,238 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import date, datetime
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q, QuerySet
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def _encode_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination keyed on the queryset ordering plus pk as a tiebreaker
+    Every page is a range query (no OFFSET, no COUNT), so deep pages cost the same as the first one
+    """
+    cursor_query_param = 'cursor'
+    page_size = PageNumberPagination.page_size
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self):
+        self.base_url = None
+        self.next_position = None
+        self.previous_position = None
+
+    @staticmethod
+    def get_ordering(queryset):
+        """Ordering applied by OrderingFilter or model Meta, always ending with pk to make it unique"""
+        ordering = list(queryset.query.order_by) or list(queryset.query.get_meta().ordering)
+        ordering = [field for field in ordering if isinstance(field, str)]
+        if not any(field.lstrip('-') in ('pk', 'id') for field in ordering):
+            ordering.append('pk')
+        return ordering
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            cursor = json.loads(urlsafe_b64decode(encoded.encode('ascii')))
+            return list(cursor['v']), bool(cursor.get('r', False))
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, values, reverse=False):
+        payload = {'v': [_encode_value(value) for value in values]}
+        if reverse:
+            payload['r'] = True
+        return urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode('ascii')
+
+    @staticmethod
+    def _row_values(obj, ordering):
+        values = []
+        for field in ordering:
+            value = obj
+            for attr in field.lstrip('-').split('__'):
+                value = getattr(value, attr)
+            values.append(value)
+        return values
+
+    @staticmethod
+    def _ordering_field(queryset, name):
+        """Model field (or annotation output field) behind an ordering entry like 'address__city'"""
+        if name in queryset.query.annotations:
+            return queryset.query.annotations[name].output_field
+        model = queryset.model
+        *relations, name = name.split('__')
+        for relation in relations:
+            model = model._meta.get_field(relation).related_model
+        return model._meta.pk if name == 'pk' else model._meta.get_field(name)
+
+    def clean_cursor_values(self, queryset, ordering, values):
+        """Decoded cursor values converted to python by their ordering fields, NotFound if they dont fit"""
+        if len(values) != len(ordering):
+            raise NotFound(self.invalid_cursor_message)
+        cleaned = []
+        for field, value in zip(ordering, values):
+            if value is None or isinstance(value, (list, dict)):
+                raise NotFound(self.invalid_cursor_message)
+            try:
+                value = self._ordering_field(queryset, field.lstrip('-')).to_python(value)
+            except (ValidationError, FieldDoesNotExist, AttributeError, TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+            if value is None:
+                raise NotFound(self.invalid_cursor_message)
+            cleaned.append(value)
+        return cleaned
+
+    @staticmethod
+    def _keyset_filter(ordering, values, reverse):
+        """(f1 > v1) OR (f1 = v1 AND f2 > v2) OR ... with the direction of every field taken into account"""
+        conditions = []
+        for i, field in enumerate(ordering):
+            descending = field.startswith('-') != reverse
+            name = field.lstrip('-')
+            lookup = f'{name}__lt' if descending else f'{name}__gt'
+            equal = {ordering[j].lstrip('-'): values[j] for j in range(i)}
+            conditions.append(Q(**equal) & Q(**{lookup: values[i]}))
+        return reduce(or_, conditions)
+
+    def paginate_sequence(self, results, values, reverse):
+        """Already ordered results (e.g. search relevance), the cursor holds the position where the page starts or ends"""
+        if values is not None and (len(values) != 1 or type(values[0]) is not int or not 0 <= values[0] <= len(results)):
+            raise NotFound(self.invalid_cursor_message)
+        if values is None:
+            start, end = 0, min(self.page_size, len(results))
+        elif reverse:
+            start, end = max(values[0] - self.page_size, 0), values[0]
+        else:
+            start, end = values[0], min(values[0] + self.page_size, len(results))
+        self.next_position = self.encode_cursor([end]) if end < len(results) else None
+        self.previous_position = self.encode_cursor([start], reverse=True) if start > 0 else None
+        return list(results[start:end])
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        if not isinstance(queryset, QuerySet):
+            return self.paginate_sequence(queryset, *self.decode_cursor(request))
+        ordering = self.get_ordering(queryset)
+        values, reverse = self.decode_cursor(request)
+
+        if values is not None:
+            values = self.clean_cursor_values(queryset, ordering, values)
+            queryset = queryset.filter(self._keyset_filter(ordering, values, reverse))
+
+        if reverse:
+            ordering_query = [field[1:] if field.startswith('-') else f'-{field}' for field in ordering]
+        else:
+            ordering_query = ordering
+
+        results = list(queryset.order_by(*ordering_query)[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        self.next_position = self.previous_position = None
+        if results:
+            first, last = self._row_values(results[0], ordering), self._row_values(results[-1], ordering)
+            if has_more or reverse:
+                self.next_position = self.encode_cursor(last)
+            if values is not None and (has_more or not reverse):
+                self.previous_position = self.encode_cursor(first, reverse=True)
+        return results
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return replace_query_param(self.base_url, self.cursor_query_param, self.next_position)
+
+    def get_previous_link(self):
+        if self.previous_position is None:
+            return None
+        return replace_query_param(self.base_url, self.cursor_query_param, self.previous_position)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class OptionalCursorPagination(PageNumberPagination):
+    """
+    Page number pagination by default, keyset pagination when requested with ?pagination=cursor
+    (or when following a cursor link)
+    """
+    mode_query_param = 'pagination'
+
+    def __init__(self):
+        self.keyset = None
+
+    def use_cursor(self, request):
+        return (
+            request.query_params.get(self.mode_query_param) == 'cursor'
+            or KeysetPagination.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.use_cursor(request):
+            self.keyset = KeysetPagination()
+            self.keyset.page_size = self.get_page_size(request)
+            return self.keyset.paginate_queryset(queryset, request, view)
+        self.keyset = None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            response = self.keyset.get_paginated_response(data)
+            for link in ('next', 'previous'):
+                if response.data[link]:
+                    response.data[link] = remove_query_param(response.data[link], self.page_query_param)
+            return response
+        return super().get_paginated_response(data)
+
+    def get_schema_operation_parameters(self, view):
+        parameters = super().get_schema_operation_parameters(view)
+        parameters += [
+            {
+                'name': self.mode_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Set to "cursor" for keyset pagination without total count',
+                'schema': {'type': 'string', 'enum': ['cursor']},
+            },
+            {
+                'name': KeysetPagination.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Cursor value returned in next/previous links',
+                'schema': {'type': 'string'},
+            },
+        ]
+        return parameters
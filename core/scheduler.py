@@ -0,0 +1,109 @@
+import logging
+import os
+import random
+import socket
+import time
+import traceback
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import ScheduledJob
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PeriodicJob:
+    name: str
+    func: object
+    interval: timedelta
+    jitter: timedelta
+    lease: timedelta
+
+    def next_run(self, moment):
+        return moment + self.interval + self.jitter * random.random()
+
+
+registry = {}
+
+
+def periodic_job(name, interval, jitter=None, lease=None):
+    """
+    Registers function as periodic job, put jobs into <app>/jobs.py (autodiscovered by run_scheduler)
+    interval - time between runs, jitter - random extra delay so replicas and jobs don't fire together,
+    lease - how long a worker owns the job, has to be longer than the job takes
+    """
+    def decorator(func):
+        registry[name] = PeriodicJob(
+            name=name,
+            func=func,
+            interval=interval,
+            jitter=jitter or timedelta(0),
+            lease=lease or max(interval, timedelta(minutes=10)),
+        )
+        return func
+    return decorator
+
+
+class Scheduler:
+    """Runs registered jobs that are due, a DB lease lets only one worker run each job across replicas"""
+    def __init__(self, jobs=None, worker_id=None):
+        self.jobs = jobs if jobs is not None else registry
+        self.worker_id = worker_id or f'{socket.gethostname()}:{os.getpid()}'
+
+    def register_jobs(self):
+        now = timezone.now()
+        for job in self.jobs.values():
+            ScheduledJob.objects.get_or_create(name=job.name, defaults={'next_run_at': now})
+
+    def acquire(self, job, now):
+        """Conditional UPDATE, only one worker gets the row of a due job with a free or expired lease"""
+        return ScheduledJob.objects.filter(
+            Q(lease_until__isnull=True) | Q(lease_until__lt=now),
+            Q(next_run_at__isnull=True) | Q(next_run_at__lte=now),
+            name=job.name,
+        ).update(lease_owner=self.worker_id, lease_until=now + job.lease, last_started_at=now) == 1
+
+    def run_job(self, job):
+        started = time.monotonic()
+        try:
+            job.func()
+        except Exception as e:
+            finished = timezone.now()
+            logger.exception(f'Job {job.name} failed')
+            ScheduledJob.objects.filter(name=job.name, lease_owner=self.worker_id).update(
+                lease_owner='', lease_until=None, next_run_at=job.next_run(finished),
+                last_duration=time.monotonic() - started, last_error=f'{e}\n{traceback.format_exc()}'[:10000],
+                failures=F('failures') + 1, updated_at=finished
+            )
+            return False
+
+        finished = timezone.now()
+        duration = time.monotonic() - started
+        ScheduledJob.objects.filter(name=job.name, lease_owner=self.worker_id).update(
+            lease_owner='', lease_until=None, next_run_at=job.next_run(finished),
+            last_success_at=finished, last_duration=duration, last_error='',
+            runs=F('runs') + 1, updated_at=finished
+        )
+        logger.info(f'Job {job.name} finished in {duration:.2f}s')
+        return True
+
+    def run_pending(self):
+        """Runs every due job this worker could lease, returns names of jobs that ran"""
+        ran = []
+        for job in self.jobs.values():
+            if self.acquire(job, timezone.now()):
+                self.run_job(job)
+                ran.append(job.name)
+        return ran
+
+    def seconds_until_next(self, default=60):
+        next_run = ScheduledJob.objects.filter(name__in=list(self.jobs)).exclude(
+            next_run_at__isnull=True
+        ).order_by('next_run_at').values_list('next_run_at', flat=True).first()
+        if next_run is None:
+            return default
+        return min(max((next_run - timezone.now()).total_seconds(), 1), default)
@@ -0,0 +1,50 @@
+from datetime import timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from .models import ScheduledJob
+from .scheduler import PeriodicJob, Scheduler
+
+
+class SchedulerTest(TestCase):
+    """Tests for periodic job scheduler"""
+    def setUp(self):
+        self.calls = []
+        self.jobs = {
+            'ok': PeriodicJob('ok', lambda: self.calls.append('ok'), timedelta(hours=1), timedelta(minutes=5), timedelta(minutes=10)),
+            'broken': PeriodicJob('broken', lambda: 1 / 0, timedelta(hours=1), timedelta(0), timedelta(minutes=10)),
+        }
+        self.scheduler = Scheduler(self.jobs, worker_id='worker-1')
+        self.scheduler.register_jobs()
+
+    def test_due_jobs_run_once_and_record_stats(self):
+        """Test due jobs run, record success/failure and are rescheduled with jitter"""
+        self.assertEqual(self.scheduler.run_pending(), ['ok', 'broken'])
+        self.assertEqual(self.scheduler.run_pending(), [])
+        self.assertEqual(self.calls, ['ok'])
+
+        ok = ScheduledJob.objects.get(name='ok')
+        self.assertEqual((ok.runs, ok.failures, ok.lease_owner), (1, 0, ''))
+        self.assertIsNotNone(ok.last_success_at)
+        self.assertGreaterEqual(ok.next_run_at - ok.last_success_at, timedelta(hours=1))
+        self.assertLessEqual(ok.next_run_at - ok.last_success_at, timedelta(hours=1, minutes=5))
+
+        broken = ScheduledJob.objects.get(name='broken')
+        self.assertEqual((broken.runs, broken.failures), (0, 1))
+        self.assertIn('ZeroDivisionError', broken.last_error)
+
+    def test_lease_is_exclusive(self):
+        """Test a job leased by one worker is skipped by others until the lease expires"""
+        now = timezone.now()
+        self.assertTrue(self.scheduler.acquire(self.jobs['ok'], now))
+        other = Scheduler(self.jobs, worker_id='worker-2')
+        self.assertFalse(other.acquire(self.jobs['ok'], now))
+        self.assertTrue(other.acquire(self.jobs['ok'], now + timedelta(minutes=11)))
+
+    def test_command_runs_registered_jobs(self):
+        """Test run_scheduler --once discovers jobs of the apps"""
+        out = StringIO()
+        call_command('run_scheduler', '--once', stdout=out)
+        self.assertIn('complete_bookings', out.getvalue())
+        self.assertTrue(ScheduledJob.objects.filter(name='update_trending_scores', runs=1).exists())
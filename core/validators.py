@@ -39,3 +39,8 @@ def validate_apartment_number(value):
     """Validation that apartment number contains only digits"""
     if value and not value.isdigit():
         raise ValidationError('Apartment number must contain only digits', code='invalid_apartment_number')
+
+def validate_weekdays(value):
+    """Validation that value is comma separated weekday numbers (0 - Monday, 6 - Sunday)"""
+    if value and not all(part.strip().isdigit() and int(part) <= 6 for part in value.split(',')):
+        raise ValidationError('Weekdays must be comma separated numbers 0-6 (0 - Monday)', code='invalid_weekdays')
@@ -0,0 +1,14 @@
+from drf_spectacular.utils import extend_schema
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+
+from .cache import response_cache
+from users.permissions import Admin
+
+
+@extend_schema(responses={200: dict}, description='Response cache hit rates')
+@api_view(['GET'])
+@permission_classes([Admin])
+def cache_stats(request):
+    """Hits, misses and hit rate of cached endpoints, overall and per view"""
+    return Response(response_cache.stats())
@@ -15,6 +15,7 @@ from django.utils import timezone
 
 from users.models import User, Favorite
 from listings.models import Address, Amenity, Listing
+from listings.services import ListingService
 from bookings.models import Booking, BookingStatusHistory
 from reviews.models import Review
 from core.enums import UserRole, Gender, HouseType, BookingStatus, Land
@@ -115,6 +116,7 @@ if __name__ == "__main__":
                 rating=random.randint(3, 5),
                 comment=faker_.paragraph()
             )
+    ListingService.rebuild_ratings()
 
     print("Done!")
     print(f"Login: {tenants[0].email} / TestPass123!")
\ No newline at end of file
@@ -1,5 +1,9 @@
 from django.contrib import admin
-from .models import Address, Amenity, Listing, ListingImg, SearchHistory, ViewHistory
+from django.db import transaction
+
+from core.cache import response_cache
+from .models import Address, Amenity, Listing, ListingImg, PricingRule, SearchHistory, SearchTrendBucket, ViewHistory
+from .search import search_index
 
 
 @admin.register(Address)
@@ -29,6 +33,12 @@ class ListingImageInline(admin.TabularInline):
     extra = 1
 
 
+class PricingRuleInline(admin.TabularInline):
+    """Admin for listing pricing rules"""
+    model = PricingRule
+    extra = 0
+
+
 @admin.register(Listing)
 class ListingAdmin(admin.ModelAdmin):
     """Admin config. for listings"""
@@ -36,7 +46,7 @@ class ListingAdmin(admin.ModelAdmin):
     list_filter = ['house_type', 'is_active', 'created_at', 'address__land']
     date_hierarchy = 'created_at'
     search_fields = ['title', 'description', 'address__city']
-    inlines = [ListingImageInline]
+    inlines = [ListingImageInline, PricingRuleInline]
     filter_horizontal = ['amenities']
     readonly_fields = ['views_count', 'created_at', 'updated_at']
     actions = ['activate_listings', 'deactivate_listings']
@@ -51,14 +61,24 @@ class ListingAdmin(admin.ModelAdmin):
     def get_price(self, obj):
         return f"€{obj.price_per_night}"
 
+    @staticmethod
+    def set_active(queryset, is_active):
+        """Bulk update sends no signals, search index and cached pages are updated here"""
+        with transaction.atomic():
+            listing_ids = list(queryset.values_list('pk', flat=True))
+            count = Listing.objects.filter(pk__in=listing_ids).update(is_active=is_active)
+            transaction.on_commit(lambda: search_index.update_listings(listing_ids))
+            response_cache.purge_on_commit('listings', *[f'listing:{pk}' for pk in listing_ids])
+        return count
+
     @admin.action(description='Activate selected listings')
     def activate_listings(self, request, queryset):
-        count = queryset.update(is_active=True)
+        count = self.set_active(queryset, True)
         self.message_user(request, f'{count} listing(s) activated')
 
     @admin.action(description='Deactivate selected listings')
     def deactivate_listings(self, request, queryset):
-        count = queryset.update(is_active=False)
+        count = self.set_active(queryset, False)
         self.message_user(request, f'{count} listing(s) deactivated')
 
 @admin.register(SearchHistory)
@@ -73,6 +93,18 @@ class SearchHistoryAdmin(admin.ModelAdmin):
         return False
 
 
+@admin.register(SearchTrendBucket)
+class SearchTrendBucketAdmin(admin.ModelAdmin):
+    """Admin config. for popular searches checkpoints"""
+    list_display = ['query', 'bucket_start', 'count']
+    list_filter = ['bucket_start']
+    search_fields = ['query']
+    readonly_fields = ['query', 'bucket_start', 'count']
+
+    def has_add_permission(self, request):
+        return False
+
+
 @admin.register(ViewHistory)
 class ViewHistoryAdmin(admin.ModelAdmin):
     """Ability to search history"""
@@ -0,0 +1,73 @@
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Case, When, Value, PositiveIntegerField
+from django.utils import timezone
+
+from core.buffers import BufferedWriter
+from .models import Listing, ViewHistory
+from users.models import User
+
+
+class ViewCounter(BufferedWriter):
+    """
+    Write-behind listing views counter
+    Increments are aggregated per listing and written with one UPDATE ... CASE, history with one bulk_create
+    """
+    name = 'view-counter'
+
+    def __init__(self):
+        super().__init__()
+        self._counts = Counter()
+        self._history = []
+
+    @property
+    def flush_seconds(self):
+        return settings.VIEW_COUNTER_FLUSH_SECONDS
+
+    @property
+    def max_pending(self):
+        return settings.VIEW_COUNTER_MAX_PENDING
+
+    def record(self, listing_id, user_id=None):
+        with self._lock:
+            self._counts[listing_id] += 1
+            self._history.append(ViewHistory(listing_id=listing_id, user_id=user_id, created_at=timezone.now()))
+            pending = len(self._history)
+        self._after_record(pending)
+
+    def pending(self):
+        return len(self._history)
+
+    def swap(self):
+        batch = (self._counts, self._history)
+        self._counts, self._history = Counter(), []
+        return batch
+
+    def restore(self, batch):
+        counts, history = batch
+        self._counts.update(counts)
+        self._history = history + self._history
+
+    def write(self, batch):
+        counts, history = batch
+        with transaction.atomic():
+            Listing.objects.filter(pk__in=counts).update(views_count=F('views_count') + Case(
+                *[When(pk=pk, then=Value(count)) for pk, count in counts.items()],
+                default=Value(0),
+                output_field=PositiveIntegerField()
+            ))
+            #listings/users deleted in the meantime would break the whole batch
+            listing_ids = set(Listing.objects.filter(pk__in=counts).values_list('pk', flat=True))
+            user_ids = {h.user_id for h in history if h.user_id}
+            if user_ids:
+                user_ids = set(User.objects.filter(pk__in=user_ids).values_list('pk', flat=True))
+            ViewHistory.objects.bulk_create([
+                h for h in history
+                if h.listing_id in listing_ids and (h.user_id is None or h.user_id in user_ids)
+            ], batch_size=500)
+        return len(history)
+
+
+view_counter = ViewCounter()
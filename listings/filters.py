@@ -0,0 +1,23 @@
+from rest_framework import filters
+
+from .search import RankedResults, search_index
+
+
+class ListingOrderingFilter(filters.OrderingFilter):
+    """
+    Ordering filter that also applies ?search, runs last so the search index sees the db filtered listings
+    Results keep search relevance order unless ordering is given explicitly
+    """
+    def get_default_ordering(self, view):
+        if view.request.query_params.get('search'):
+            return None
+        return super().get_default_ordering(view)
+
+    def filter_queryset(self, request, queryset, view):
+        search = request.query_params.get('search')
+        if search:
+            ranked_ids = search_index.search(search)
+            queryset = queryset.filter(pk__in=ranked_ids)
+            if self.get_ordering(request, queryset, view) is None:
+                return RankedResults(queryset, ranked_ids)
+        return super().filter_queryset(request, queryset, view)
@@ -0,0 +1,87 @@
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils import timezone
+
+from core.buffers import BufferedWriter
+from .models import SearchHistory
+from users.models import User
+
+
+def normalize_query(query):
+    """Lowercase query with collapsed whitespace, used to detect repeated searches"""
+    return ' '.join(query.lower().split())[:255]
+
+
+class SearchRecorder(BufferedWriter):
+    """
+    Write-behind SearchHistory recorder
+    Same (client, normalized query) pair is recorded once per SEARCH_HISTORY_DEDUPE_SECONDS,
+    so paging through results or re-sorting them doesnt add rows
+    """
+    name = 'search-recorder'
+
+    def __init__(self):
+        super().__init__()
+        self._rows = []
+        self._seen = OrderedDict()  # key -> monotonic time, oldest first
+
+    @property
+    def flush_seconds(self):
+        return settings.SEARCH_HISTORY_FLUSH_SECONDS
+
+    @property
+    def max_pending(self):
+        return settings.SEARCH_HISTORY_MAX_PENDING
+
+    def _prune_seen(self, now, window):
+        """Drops expired keys from the front, each key is popped once so a record costs O(1) amortized"""
+        while self._seen and now - next(iter(self._seen.values())) >= window:
+            self._seen.popitem(last=False)
+
+    def record(self, query, user_id=None, client_ip=None):
+        """Queues search for saving, returns False if it was a repeat of a recent search"""
+        normalized = normalize_query(query)
+        if not normalized:
+            return False
+
+        key = (user_id or f'anon:{client_ip}', normalized)
+        window = settings.SEARCH_HISTORY_DEDUPE_SECONDS
+        now = time.monotonic()
+        with self._lock:
+            seen_at = self._seen.get(key)
+            if seen_at is not None and now - seen_at < window:
+                return False
+            self._prune_seen(now, window)
+            self._seen[key] = now
+            self._seen.move_to_end(key)
+            self._rows.append(SearchHistory(query=query.strip()[:255], user_id=user_id, created_at=timezone.now()))
+            pending = len(self._rows)
+        self._after_record(pending)
+        return True
+
+    def pending(self):
+        return len(self._rows)
+
+    def swap(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def restore(self, batch):
+        self._rows = batch + self._rows
+
+    def clear(self):
+        with self._lock:
+            self._rows, self._seen = [], OrderedDict()
+
+    def write(self, batch):
+        #users deleted in the meantime would break the whole batch
+        user_ids = {row.user_id for row in batch if row.user_id}
+        existing = set(User.objects.filter(pk__in=user_ids).values_list('pk', flat=True)) if user_ids else set()
+        rows = [row for row in batch if row.user_id is None or row.user_id in existing]
+        SearchHistory.objects.bulk_create(rows, batch_size=500)
+        return len(rows)
+
+
+search_recorder = SearchRecorder()
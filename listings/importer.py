@@ -0,0 +1,200 @@
+import csv
+import json
+import logging
+import time
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+
+from core.cache import response_cache
+from .models import Address, Listing, Amenity
+from .search import search_index
+
+logger = logging.getLogger(__name__)
+
+ADDRESS_FIELDS = ['country', 'city', 'land', 'street', 'house_number', 'apartment_number', 'postal_code']
+LISTING_FIELDS = ['title', 'description', 'house_type', 'max_stayers', 'bedrooms', 'bathrooms', 'price_per_night']
+ADDRESS_KEY = ['street', 'house_number', 'apartment_number', 'city', 'postal_code'] #unique_together of Address
+IMPORT_MAX_ERRORS = 1000 #reported row errors, the rest is only counted
+IMPORT_FORMATS = ('csv', 'jsonl')
+
+
+def read_rows(stream, fmt):
+    """
+    Rows of a CSV (header line, amenities separated by ;) or JSONL text stream, read lazily
+    Text that can't be decoded is yielded as a row error and ends the input, rows before it are still imported
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+    elif fmt == 'jsonl':
+        reader = (line for line in stream if line.strip())
+    else:
+        raise ValueError(f'Unknown format {fmt}, use csv or jsonl')
+
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except UnicodeDecodeError:
+            yield {'_error': 'File must be UTF-8 encoded, import stopped at this row'}
+            return
+        except csv.Error as e: #malformed line fails its row only
+            yield {'_error': f'Invalid CSV: {e}'}
+            continue
+
+        if fmt == 'csv':
+            row['amenities'] = [name.strip() for name in (row.get('amenities') or '').split(';') if name.strip()]
+            yield row
+            continue
+        try:
+            row = json.loads(row)
+        except json.JSONDecodeError as e:
+            yield {'_error': f'Invalid JSON: {e.msg}'}
+            continue
+        yield row if isinstance(row, dict) else {'_error': 'Line is not a JSON object'}
+
+
+class ListingImporter:
+    """
+    Bulk listing import, rows are validated with the model validators and inserted in chunks,
+    every chunk in its own transaction with one bulk_create per table. Input is consumed lazily,
+    so memory depends on chunk_size only. Failed rows are reported with their (1-based) number
+    """
+    def __init__(self, owner, chunk_size=500):
+        self.owner = owner
+        self.chunk_size = chunk_size
+        self.amenities = dict(Amenity.objects.values_list('name', 'id'))
+        self.report = {'created': 0, 'failed': 0, 'errors': [], 'seconds': 0.0}
+
+    def fail(self, number, errors):
+        self.report['failed'] += 1
+        if len(self.report['errors']) < IMPORT_MAX_ERRORS:
+            self.report['errors'].append({'row': number, 'errors': errors})
+
+    def build(self, row):
+        """Unsaved address, listing and amenity ids of a row, raises ValidationError"""
+        if '_error' in row:
+            raise ValidationError(row['_error'])
+        address = Address(**{field: str(row[field]).strip() for field in ADDRESS_FIELDS if row.get(field) not in (None, '')})
+        listing = Listing(owner=self.owner, **{field: row.get(field) for field in LISTING_FIELDS})
+        if row.get('is_active') not in (None, ''):
+            listing.is_active = str(row['is_active']).strip().lower() in ('1', 'true', 'yes')
+
+        errors = {}
+        for instance, exclude in ((address, []), (listing, ['address', 'owner', 'main_image'])):
+            try:
+                instance.full_clean(exclude=exclude, validate_unique=False)
+            except ValidationError as e:
+                errors.update(e.message_dict)
+        amenities = row.get('amenities') or []
+        if not isinstance(amenities, list) or not all(isinstance(name, str) for name in amenities):
+            errors['amenities'] = ['Expected a list of amenity names']
+        else:
+            unknown = [name for name in amenities if name not in self.amenities]
+            if unknown:
+                errors['amenities'] = [f'Unknown amenities: {", ".join(unknown)}']
+        if errors:
+            raise ValidationError(errors)
+        return address, listing, [self.amenities[name] for name in amenities]
+
+    @staticmethod
+    def normalize_key(values):
+        """Unique key compared the way the mysql index does (case-insensitive, trailing spaces ignored)"""
+        return tuple(value.rstrip().casefold() if isinstance(value, str) else value for value in values)
+
+    def address_key(self, address):
+        return self.normalize_key(getattr(address, field) for field in ADDRESS_KEY)
+
+    def existing_addresses(self, addresses):
+        """Ids of addresses by unique key among the given ones, one query"""
+        postal_codes = {address.postal_code for address in addresses}
+        rows = Address.objects.filter(postal_code__in=postal_codes).values_list('pk', *ADDRESS_KEY)
+        return {self.normalize_key(row[1:]): row[0] for row in rows}
+
+    def import_chunk(self, numbered_rows):
+        """Validates and inserts one chunk, returns ids of created listings"""
+        built = []
+        for number, row in numbered_rows:
+            try:
+                built.append((number, *self.build(row)))
+            except ValidationError as e:
+                self.fail(number, e.message_dict if hasattr(e, 'error_dict') else {'row': e.messages})
+
+        #addresses are unique, duplicates in the file and in the database fail their rows
+        existing = self.existing_addresses([address for _, address, _, _ in built]) if built else {}
+        seen = set()
+        valid = []
+        for number, address, listing, amenity_ids in built:
+            key = self.address_key(address)
+            if key in existing or key in seen:
+                self.fail(number, {'address': ['Address already exists']})
+                continue
+            seen.add(key)
+            valid.append((number, address, listing, amenity_ids))
+        if not valid:
+            return []
+
+        try:
+            listing_ids = self.insert(valid)
+        except IntegrityError as e: #address taken meanwhile, the chunk is rolled back and inserted row by row
+            logger.warning(f'Listing import chunk failed, retrying row by row: {e}')
+            listing_ids = []
+            for _, address, listing, _ in valid: #ids assigned by the rolled back insert
+                address.pk = listing.pk = None
+            for row in valid:
+                try:
+                    listing_ids += self.insert([row])
+                except IntegrityError:
+                    self.fail(row[0], {'address': ['Address already exists']})
+        self.report['created'] += len(listing_ids)
+        return listing_ids
+
+    def insert(self, valid):
+        """Inserts addresses, listings and amenity links of a validated chunk in one transaction"""
+        with transaction.atomic():
+            addresses = Address.objects.bulk_create([address for _, address, _, _ in valid])
+            if any(address.pk is None for address in addresses): #backend doesn't return ids (mysql), look them up
+                ids = self.existing_addresses(addresses)
+                for address in addresses:
+                    address.pk = ids[self.address_key(address)]
+
+            listings = []
+            for _, address, listing, _ in valid:
+                listing.address_id = address.pk
+                listings.append(listing)
+            Listing.objects.bulk_create(listings)
+            if any(listing.pk is None for listing in listings):
+                ids = dict(Listing.objects.filter(address_id__in=[listing.address_id for listing in listings])
+                           .values_list('address_id', 'pk'))
+                for listing in listings:
+                    listing.pk = ids[listing.address_id]
+
+            Listing.amenities.through.objects.bulk_create([
+                Listing.amenities.through(listing_id=listing.pk, amenity_id=amenity_id)
+                for listing, (_, _, _, amenity_ids) in zip(listings, valid)
+                for amenity_id in dict.fromkeys(amenity_ids)
+            ])
+
+            listing_ids = [listing.pk for listing in listings]
+            #bulk_create sends no signals, search index and cached pages are updated here
+            transaction.on_commit(lambda: search_index.update_listings(listing_ids))
+            response_cache.purge_on_commit('listings')
+        return listing_ids
+
+    def run(self, rows, on_chunk=None):
+        """Imports rows (dicts), returns report with created/failed counts, row errors and seconds"""
+        started = time.monotonic()
+        numbered = enumerate(rows, start=1)
+        while True:
+            chunk = list(islice(numbered, self.chunk_size))
+            if not chunk:
+                break
+            self.import_chunk(chunk)
+            if on_chunk:
+                on_chunk(self.report)
+
+        self.report['seconds'] = time.monotonic() - started
+        logger.info(f'Listing import for {self.owner}: {self.report["created"]} created, {self.report["failed"]} failed')
+        return self.report
@@ -0,0 +1,15 @@
+from datetime import timedelta
+
+from core.scheduler import periodic_job
+from .services import ListingService
+from .trends import search_trends
+
+
+@periodic_job('update_trending_scores', interval=timedelta(minutes=15), jitter=timedelta(minutes=1))
+def update_trending_scores():
+    ListingService.update_trending_scores()
+
+
+@periodic_job('prune_search_trends', interval=timedelta(hours=6), jitter=timedelta(minutes=10))
+def prune_search_trends():
+    search_trends.prune()
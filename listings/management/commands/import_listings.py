@@ -0,0 +1,44 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from listings.importer import ListingImporter, read_rows, IMPORT_FORMATS
+from users.models import User
+
+
+class Command(BaseCommand):
+    """Bulk listing import from CSV/JSONL, the file is streamed and inserted in chunks"""
+    help = 'Imports listings of an owner from a CSV or JSONL file (- for stdin)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or JSONL file, - reads stdin')
+        parser.add_argument('--owner', required=True, help='Email of the owner')
+        parser.add_argument('--format', choices=IMPORT_FORMATS, help='By file extension if not given')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Rows per transaction')
+
+    def handle(self, *args, **options):
+        try:
+            owner = User.objects.get(email=options['owner'])
+        except User.DoesNotExist:
+            raise CommandError(f'User {options["owner"]} not found')
+
+        fmt = options['format'] or options['path'].rsplit('.', 1)[-1].lower()
+        if fmt not in IMPORT_FORMATS:
+            raise CommandError('Unknown format, use --format csv or jsonl')
+
+        def progress(report):
+            if options['verbosity'] > 1:
+                self.stdout.write(f'{report["created"]} created, {report["failed"]} failed')
+
+        importer = ListingImporter(owner, chunk_size=options['chunk_size'])
+        if options['path'] == '-':
+            report = importer.run(read_rows(sys.stdin, fmt), on_chunk=progress)
+        else:
+            with open(options['path'], encoding='utf-8-sig', newline='') as stream:
+                report = importer.run(read_rows(stream, fmt), on_chunk=progress)
+
+        for error in report['errors']:
+            self.stderr.write(f'row {error["row"]}: {error["errors"]}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {report["created"]} listings in {report["seconds"]:.2f}s, {report["failed"]} rows failed'
+        ))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from listings.services import ListingService
+
+
+class Command(BaseCommand):
+    """Backfills/repairs denormalized listing rating aggregates from reviews"""
+    help = 'Recalculates rating_sum, rating_count and avg_rating of listings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('listing_ids', nargs='*', type=int, help='Only rebuild these listings')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            updated = ListingService.rebuild_ratings(options['listing_ids'] or None)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt ratings for {updated} listings'))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from listings.history import normalize_query
+from listings.models import SearchHistory, SearchTrendBucket
+from listings.trends import WINDOWS, bucket_start
+
+
+class Command(BaseCommand):
+    """Backfills popular searches checkpoints from search history of the last week"""
+    help = 'Rebuilds search trend buckets from SearchHistory'
+
+    def handle(self, *args, **options):
+        since = bucket_start(timezone.now() - WINDOWS['week'])
+        counts = {}
+        rows = SearchHistory.objects.filter(created_at__gte=since).annotate(
+            bucket=TruncHour('created_at')
+        ).values_list('bucket', 'query').annotate(total=Count('id')).order_by()
+        for bucket, query, total in rows.iterator():
+            key = (bucket, normalize_query(query))
+            counts[key] = counts.get(key, 0) + total
+
+        with transaction.atomic():
+            SearchTrendBucket.objects.filter(bucket_start__gte=since).delete()
+            SearchTrendBucket.objects.bulk_create([
+                SearchTrendBucket(bucket_start=bucket, query=query, count=total)
+                for (bucket, query), total in counts.items() if query
+            ], batch_size=1000)
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {len(counts)} search trend buckets'))
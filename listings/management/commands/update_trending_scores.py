@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from listings.services import ListingService
+
+
+class Command(BaseCommand):
+    """Periodic job for time-decayed trending scores"""
+    help = 'Decays trending scores and adds activity since the previous run'
+
+    def handle(self, *args, **options):
+        updated = ListingService.update_trending_scores()
+        self.stdout.write(self.style.SUCCESS(f'Trending scores updated, {updated} listings with new activity'))
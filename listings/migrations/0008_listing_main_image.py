@@ -0,0 +1,27 @@
+# Generated by Django 6.0 on 2026-10-17 04:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def set_main_images(apps, schema_editor):
+    Listing = apps.get_model('listings', 'Listing')
+    ListingImg = apps.get_model('listings', 'ListingImg')
+    for img_id, listing_id in ListingImg.objects.filter(main=True).values_list('pk', 'listing_id'):
+        Listing.objects.filter(pk=listing_id).update(main_image=img_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0007_listing_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listing',
+            name='main_image',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='listings.listingimg'),
+        ),
+        migrations.RunPython(set_main_images, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 6.0 on 2026-10-17 04:42
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0008_listing_main_image'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='viewhistory',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
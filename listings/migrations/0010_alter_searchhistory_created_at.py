@@ -0,0 +1,19 @@
+# Generated by Django 6.0 on 2026-10-17 04:43
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0009_alter_viewhistory_created_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='searchhistory',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
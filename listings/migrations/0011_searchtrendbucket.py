@@ -0,0 +1,27 @@
+# Generated by Django 6.0 on 2026-10-17 04:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0010_alter_searchhistory_created_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTrendBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket_start', models.DateTimeField()),
+                ('query', models.CharField(max_length=255)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'search_trend_buckets',
+                'indexes': [models.Index(fields=['bucket_start'], name='search_tren_bucket__10b18e_idx')],
+                'unique_together': {('bucket_start', 'query')},
+            },
+        ),
+    ]
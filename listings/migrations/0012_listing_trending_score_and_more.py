@@ -0,0 +1,28 @@
+# Generated by Django 6.0 on 2026-10-17 04:48
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0011_searchtrendbucket'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listing',
+            name='trending_score',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(fields=['trending_score'], name='listings_trendin_54a231_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='viewhistory',
+            index=models.Index(fields=['created_at'], name='view_histor_created_a8678f_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 6.0 on 2026-10-17 05:29
+
+import core.validators
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0012_listing_trending_score_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PricingRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Creation date')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Update date')),
+                ('kind', models.CharField(choices=[('weekday', 'Weekday'), ('season', 'Season'), ('length_of_stay', 'Length of stay')], max_length=20)),
+                ('percent', models.IntegerField(help_text='20 for 20% more, -10 for 10% discount', validators=[django.core.validators.MinValueValidator(-90), django.core.validators.MaxValueValidator(500)])),
+                ('weekdays', models.CharField(blank=True, help_text='Comma separated, 0 - Monday, 6 - Sunday', max_length=13, validators=[core.validators.validate_weekdays])),
+                ('start_date', models.DateField(blank=True, null=True)),
+                ('end_date', models.DateField(blank=True, null=True)),
+                ('min_nights', models.PositiveIntegerField(blank=True, null=True)),
+                ('listing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pricing_rules', to='listings.listing')),
+            ],
+            options={
+                'db_table': 'pricing_rules',
+                'ordering': ['pk'],
+                'indexes': [models.Index(fields=['listing'], name='pricing_rul_listing_738910_idx')],
+            },
+        ),
+    ]
@@ -1,9 +1,11 @@
+from django.core.exceptions import ValidationError
+from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db import models
+from django.utils import timezone
 from core.mixins import TimestampMixin
-from core.enums import HouseType, AmenityCategory, Land
+from core.enums import HouseType, AmenityCategory, Land, PricingRuleKind
 from core.validators import validate_positive_price, validate_positive_number, validate_no_digits, validate_postal_code, \
-    validate_apartment_number
-from django.db.models import Avg
+    validate_apartment_number, validate_weekdays
 
 
 class Amenity(TimestampMixin):
@@ -74,6 +76,16 @@ class Listing(TimestampMixin):
     bedrooms = models.PositiveIntegerField(validators=[validate_positive_number])
     bathrooms = models.PositiveIntegerField(validators=[validate_positive_number])
     price_per_night = models.DecimalField(max_digits=10, decimal_places=2, validators=[validate_positive_price], verbose_name='Price per night (€)')
+    # rating aggregates, maintained by ReviewService (rebuild_listing_ratings command for backfill)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    avg_rating = models.FloatField(default=0, editable=False)
+    trending_score = models.FloatField(default=0, editable=False) # time-decayed popularity, see update_trending_scores
+    # pointer to the main image, maintained by ListingImg.save so lists resolve it with a join
+    main_image = models.ForeignKey(
+        'ListingImg', on_delete=models.SET_NULL,
+        null=True, blank=True, editable=False, related_name='+'
+    )
 
     class Meta:
         db_table = 'listings'
@@ -85,15 +97,55 @@ class Listing(TimestampMixin):
             models.Index(fields=['is_active']),
             models.Index(fields=['house_type']),
             models.Index(fields=['price_per_night']),
+            models.Index(fields=['avg_rating']),
+            models.Index(fields=['trending_score']),
         ]
 
     def __str__(self):
         return f'{self.title} - {self.address.city}'
 
+class PricingRule(TimestampMixin):
+    """
+    Price adjustment of a listing in percent of price_per_night
+    weekday - nights on given weekdays (weekends), season - nights from start_date to end_date (inclusive),
+    length_of_stay - whole stay of at least min_nights. Compiled into price calendars by listings.pricing
+    """
+    listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='pricing_rules')
+    kind = models.CharField(max_length=20, choices=PricingRuleKind.choices())
+    percent = models.IntegerField(
+        validators=[MinValueValidator(-90), MaxValueValidator(500)], help_text='20 for 20% more, -10 for 10% discount'
+    )
+    weekdays = models.CharField(
+        max_length=13, blank=True, validators=[validate_weekdays], help_text='Comma separated, 0 - Monday, 6 - Sunday'
+    )
+    start_date = models.DateField(null=True, blank=True)
+    end_date = models.DateField(null=True, blank=True)
+    min_nights = models.PositiveIntegerField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'pricing_rules'
+        ordering = ['pk']
+        indexes = [models.Index(fields=['listing'])]
+
+    def __str__(self):
+        return f'{self.listing_id} - {self.kind} {self.percent:+}%'
+
+    def clean(self):
+        """Fields required by the kind of rule"""
+        if self.kind == PricingRuleKind.weekday.name and not self.weekdays:
+            raise ValidationError({'weekdays': 'Weekday rule needs weekdays'})
+        if self.kind == PricingRuleKind.season.name:
+            if not self.start_date or not self.end_date:
+                raise ValidationError({'end_date': 'Season rule needs start and end date'})
+            if self.end_date < self.start_date:
+                raise ValidationError({'end_date': 'End date must not be before start date'})
+        if self.kind == PricingRuleKind.length_of_stay.name and not self.min_nights:
+            raise ValidationError({'min_nights': 'Length of stay rule needs min_nights'})
+
     @property
-    def avg_rating(self):
-        result = self.reviews.aggregate(avg=Avg('rating'))
-        return result['avg']
+    def weekday_numbers(self):
+        return tuple(int(part) for part in self.weekdays.split(',') if part.strip())
+
 
 class ListingImg(TimestampMixin):
     """Model for images attached to listings"""
@@ -105,6 +157,10 @@ class ListingImg(TimestampMixin):
         if self.main:
             ListingImg.objects.filter(listing=self.listing, main=True).exclude(pk=self.pk).update(main=False)
         super().save(*args, **kwargs)
+        if self.main:
+            Listing.objects.filter(pk=self.listing_id).update(main_image=self)
+        else:
+            Listing.objects.filter(pk=self.listing_id, main_image=self.pk).update(main_image=None)
 
     class Meta:
         db_table = 'listing_imgs'
@@ -124,7 +180,7 @@ class SearchHistory(models.Model):
         null=True, blank=True
     )
     query = models.CharField(max_length=255)
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(default=timezone.now) #set when search happens, rows are written in batches
 
     class Meta:
         db_table = 'search_history'
@@ -138,6 +194,21 @@ class SearchHistory(models.Model):
         return f'{self.query} ({self.user or "anonymous"})'
 
 
+class SearchTrendBucket(models.Model):
+    """Checkpointed popular search counts per hour, written by listings.trends"""
+    bucket_start = models.DateTimeField()
+    query = models.CharField(max_length=255)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'search_trend_buckets'
+        unique_together = ('bucket_start', 'query')
+        indexes = [models.Index(fields=['bucket_start'])]
+
+    def __str__(self):
+        return f'{self.query} ({self.bucket_start:%Y-%m-%d %H}h: {self.count})'
+
+
 class ViewHistory(models.Model):
     """Listing search history"""
     user = models.ForeignKey(
@@ -151,7 +222,7 @@ class ViewHistory(models.Model):
         on_delete=models.CASCADE,
         related_name='view_history'
     )
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(default=timezone.now) #set when view happens, rows are written in batches
 
     class Meta:
         db_table = 'view_history'
@@ -159,6 +230,7 @@ class ViewHistory(models.Model):
         indexes = [
             models.Index(fields=['user']),
             models.Index(fields=['listing']),
+            models.Index(fields=['created_at']),
         ]
 
     def __str__(self):
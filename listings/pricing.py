@@ -0,0 +1,133 @@
+from collections import defaultdict
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from core.enums import PricingRuleKind
+from .models import PricingRule
+
+
+def to_cents(amount):
+    return int((Decimal(amount) * 100).to_integral_value())
+
+
+def from_cents(cents):
+    return (Decimal(int(cents)) / 100).quantize(Decimal('0.01'))
+
+
+def compact_rules(rules):
+    """Nightly rules as plain tuples (cheap to pickle into the cache) and stay discounts by min_nights"""
+    nightly, stay_discounts = [], []
+    for rule in rules:
+        if rule.kind == PricingRuleKind.weekday.name:
+            nightly.append((rule.kind, rule.percent, rule.weekday_numbers))
+        elif rule.kind == PricingRuleKind.season.name:
+            nightly.append((rule.kind, rule.percent, (rule.start_date, rule.end_date)))
+        elif rule.kind == PricingRuleKind.length_of_stay.name:
+            stay_discounts.append((rule.min_nights, rule.percent))
+    return nightly, sorted(stay_discounts)
+
+
+def compile_nights(price_cents, nightly_rules, start, days):
+    """Prices in cents of `days` nights from start, matching weekday and season rules are applied on top of each other"""
+    nights = np.arange(np.datetime64(start, 'D'), np.datetime64(start, 'D') + days)
+    weekdays = (nights.astype(np.int64) + 3) % 7 #1970-01-01 was a Thursday, 0 - Monday
+    prices = np.full(days, float(price_cents))
+    for kind, percent, scope in nightly_rules:
+        if kind == PricingRuleKind.weekday.name:
+            mask = np.isin(weekdays, scope)
+        else:
+            mask = (nights >= np.datetime64(scope[0], 'D')) & (nights <= np.datetime64(scope[1], 'D'))
+        prices[mask] *= 1 + percent / 100
+    return np.rint(prices).astype(np.int64)
+
+
+class PriceCalendar:
+    """
+    Prefix sums of nightly prices of one listing from origin on,
+    price of a stay inside the calendar is the difference of two entries
+    """
+    def __init__(self, price_cents, nightly_rules, stay_discounts, origin, days):
+        self.price_cents = price_cents
+        self.nightly_rules = nightly_rules
+        self.stay_discounts = stay_discounts
+        self.origin = np.datetime64(origin, 'D')
+        self.cumulative = np.concatenate(([0], np.cumsum(compile_nights(price_cents, nightly_rules, origin, days))))
+
+    def totals(self, check_ins, check_outs):
+        """Prices in cents of stays given as datetime64[D] arrays, stays outside of the calendar are compiled directly"""
+        first = (check_ins - self.origin).astype(np.int64)
+        last = (check_outs - self.origin).astype(np.int64)
+        inside = (first >= 0) & (last < len(self.cumulative))
+        totals = np.zeros(len(first), dtype=np.int64)
+        totals[inside] = self.cumulative[last[inside]] - self.cumulative[first[inside]]
+        for index in np.flatnonzero(~inside):
+            totals[index] = compile_nights(
+                self.price_cents, self.nightly_rules, check_ins[index], int(last[index] - first[index])
+            ).sum()
+
+        percents = np.zeros(len(first))
+        for min_nights, percent in self.stay_discounts: #ascending, the longest matching stay rule wins
+            percents[last - first >= min_nights] = percent
+        return np.rint(totals * (1 + percents / 100)).astype(np.int64)
+
+
+class PricingEngine:
+    """
+    Quotes stays from cached per-listing price calendars
+    A calendar covers PRICING_HORIZON_DAYS from the day it was built. It is cached by listing version (updated_at),
+    saving the listing or changing its rules (see signals) bumps the version, so the calendar is rebuilt
+    """
+    def key(self, listing):
+        return f'pricing:{listing.pk}:{listing.updated_at.timestamp()}'
+
+    def build(self, listing, rules):
+        nightly, stay_discounts = compact_rules(rules)
+        return PriceCalendar(
+            to_cents(listing.price_per_night), nightly, stay_discounts,
+            timezone.now().date(), settings.PRICING_HORIZON_DAYS
+        )
+
+    def calendars(self, listings):
+        """Calendars by listing id, rules of listings missing in the cache are loaded with one query"""
+        keys = {self.key(listing): listing for listing in listings}
+        found = cache.get_many(list(keys))
+        missing = [listing for key, listing in keys.items() if key not in found]
+        if missing:
+            rules = defaultdict(list)
+            for rule in PricingRule.objects.filter(listing_id__in=[listing.pk for listing in missing]):
+                rules[rule.listing_id].append(rule)
+            built = {self.key(listing): self.build(listing, rules[listing.pk]) for listing in missing}
+            cache.set_many(built, settings.PRICING_CACHE_TIMEOUT)
+            found.update(built)
+        return {listing.pk: found[self.key(listing)] for listing in listings}
+
+    def quote_many(self, listings, stays):
+        """
+        Total prices of (listing_id, check_in, check_out) stays, listings - {id: Listing}
+        Stays of every listing are priced with one vectorized lookup
+        """
+        calendars = self.calendars(listings.values())
+        by_listing = defaultdict(list)
+        for index, (listing_id, check_in, check_out) in enumerate(stays):
+            by_listing[listing_id].append(index)
+
+        totals = [None] * len(stays)
+        for listing_id, indexes in by_listing.items():
+            cents = calendars[listing_id].totals(
+                np.array([stays[index][1] for index in indexes], dtype='datetime64[D]'),
+                np.array([stays[index][2] for index in indexes], dtype='datetime64[D]'),
+            )
+            for index, amount in zip(indexes, cents):
+                totals[index] = from_cents(amount)
+        return totals
+
+    def quote(self, listing, check_in, check_out):
+        """Total price of one stay"""
+        return self.quote_many({listing.pk: listing}, [(listing.pk, check_in, check_out)])[0]
+
+
+pricing_engine = PricingEngine()
@@ -0,0 +1,239 @@
+import math
+import re
+import threading
+import time
+import logging
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r'[^\W_]+', re.UNICODE)
+
+# Field boosts: a hit in the title or city is worth more than one in the description
+FIELD_WEIGHTS = {
+    'title': 2,
+    'city': 2,
+    'description': 1,
+    'amenities': 1,
+}
+
+
+def tokenize(text):
+    """Splits text into lowercase word tokens"""
+    if not text:
+        return []
+    return TOKEN_RE.findall(text.lower())
+
+
+class ListingSearchIndex:
+    """
+    In-process inverted index over listings with BM25 ranking
+    Only active listings are indexed. Kept up to date by signals in listings.signals and rebuilt from db
+    in a background thread after SEARCH_INDEX_REBUILD_SECONDS, so changes made by other worker processes
+    are picked up as well
+    """
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings = defaultdict(dict)  # term -> {listing_id: weighted term frequency}
+        self._doc_terms = {}  # listing_id -> Counter of terms
+        self._doc_len = {}
+        self._total_len = 0
+        self._vocabulary = []
+        self._vocabulary_dirty = False
+        self._built_at = None
+        self._rebuild_lock = threading.Lock()  # single flight, one rebuild at a time
+
+    @staticmethod
+    def _document_terms(title, description, city, amenity_names):
+        terms = Counter()
+        fields = {
+            'title': title,
+            'description': description,
+            'city': city,
+            'amenities': ' '.join(amenity_names),
+        }
+        for field, text in fields.items():
+            for token in tokenize(text):
+                terms[token] += FIELD_WEIGHTS[field]
+        return terms
+
+    def _remove_unlocked(self, listing_id):
+        terms = self._doc_terms.pop(listing_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(listing_id, None)
+            if not postings:
+                del self._postings[term]
+                self._vocabulary_dirty = True
+        self._total_len -= self._doc_len.pop(listing_id)
+
+    def _add_unlocked(self, listing_id, terms):
+        self._remove_unlocked(listing_id)
+        if not terms:
+            return
+        for term, freq in terms.items():
+            if term not in self._postings:
+                self._vocabulary_dirty = True
+            self._postings[term][listing_id] = freq
+        self._doc_terms[listing_id] = terms
+        length = sum(terms.values())
+        self._doc_len[listing_id] = length
+        self._total_len += length
+
+    def _load_documents(self, listing_ids=None):
+        """Loads indexable fields with two queries, regardless of amount of listings"""
+        from .models import Listing
+
+        queryset = Listing.objects.filter(is_active=True)
+        if listing_ids is not None:
+            queryset = queryset.filter(pk__in=listing_ids)
+
+        rows = list(queryset.values_list('pk', 'title', 'description', 'address__city'))
+        amenities = defaultdict(list)
+        through = Listing.amenities.through.objects.filter(listing_id__in=[row[0] for row in rows])
+        for listing_id, name in through.values_list('listing_id', 'amenity__name'):
+            amenities[listing_id].append(name)
+
+        return {
+            pk: self._document_terms(title, description, city, amenities[pk])
+            for pk, title, description, city in rows
+        }
+
+    def rebuild(self):
+        """Rebuilds the whole index from database"""
+        documents = self._load_documents()
+        with self._lock:
+            self._postings = defaultdict(dict)
+            self._doc_terms = {}
+            self._doc_len = {}
+            self._total_len = 0
+            for listing_id, terms in documents.items():
+                self._add_unlocked(listing_id, terms)
+            self._vocabulary_dirty = True
+            self._built_at = time.monotonic()
+        logger.info(f'Search index rebuilt with {len(documents)} listings')
+
+    def _rebuild_in_background(self):
+        try:
+            self.rebuild()
+        except Exception:
+            logger.exception('Search index rebuild failed')
+        finally:
+            connections.close_all()
+            self._rebuild_lock.release()
+
+    def _ensure_fresh(self):
+        """
+        First search builds the index (concurrent ones wait for it), a stale index keeps serving
+        while one background thread rebuilds it
+        """
+        if self._built_at is None:
+            with self._rebuild_lock:
+                if self._built_at is None:
+                    self.rebuild()
+            return
+        max_age = getattr(settings, 'SEARCH_INDEX_REBUILD_SECONDS', 300)
+        if time.monotonic() - self._built_at > max_age and self._rebuild_lock.acquire(blocking=False):
+            threading.Thread(target=self._rebuild_in_background, daemon=True).start()
+
+    def update_listings(self, listing_ids):
+        """Reindexes given listings, deleted and inactive listings are removed from index"""
+        listing_ids = set(listing_ids)
+        if not listing_ids or self._built_at is None:
+            return
+        documents = self._load_documents(listing_ids)
+        with self._lock:
+            for listing_id in listing_ids:
+                if listing_id in documents:
+                    self._add_unlocked(listing_id, documents[listing_id])
+                else:
+                    self._remove_unlocked(listing_id)
+
+    def remove_listing(self, listing_id):
+        with self._lock:
+            self._remove_unlocked(listing_id)
+
+    def _expand(self, token):
+        """Exact term if indexed, otherwise all terms starting with the token (for 'berl' -> 'berlin')"""
+        if token in self._postings:
+            return [token]
+        if self._vocabulary_dirty:
+            self._vocabulary = sorted(self._postings)
+            self._vocabulary_dirty = False
+        matches = []
+        pos = bisect_left(self._vocabulary, token)
+        while pos < len(self._vocabulary) and self._vocabulary[pos].startswith(token):
+            matches.append(self._vocabulary[pos])
+            pos += 1
+        return matches
+
+    def search(self, query, limit=None):
+        """Returns listing ids ranked by BM25 score (all of them unless limit is given), every query token has to match"""
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return []
+
+        self._ensure_fresh()
+        with self._lock:
+            docs_count = len(self._doc_terms)
+            if not docs_count:
+                return []
+            avg_len = self._total_len / docs_count
+
+            scores = None
+            for token in tokens:
+                token_scores = defaultdict(float)
+                for term in self._expand(token):
+                    postings = self._postings[term]
+                    idf = math.log(1 + (docs_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                    for listing_id, freq in postings.items():
+                        norm = self.k1 * (1 - self.b + self.b * self._doc_len[listing_id] / avg_len)
+                        token_scores[listing_id] += idf * freq * (self.k1 + 1) / (freq + norm)
+                if scores is None:
+                    scores = token_scores
+                else:
+                    scores = {pk: score + token_scores[pk] for pk, score in scores.items() if pk in token_scores}
+                if not scores:
+                    return []
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [listing_id for listing_id, _ in ranked[:limit]]
+
+
+class RankedResults:
+    """
+    Listings of a filtered queryset in relevance order, capped at SEARCH_INDEX_MAX_RESULTS after filtering
+    Ids are ordered in Python, only the sliced page is loaded from db
+    """
+    def __init__(self, queryset, ranked_ids):
+        matching = set(queryset.values_list('pk', flat=True))
+        limit = getattr(settings, 'SEARCH_INDEX_MAX_RESULTS', 1000)
+        self.queryset = queryset
+        self.ids = [pk for pk in ranked_ids if pk in matching][:limit]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def count(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        ids = self.ids[index]
+        if not isinstance(index, slice):
+            return self.queryset.get(pk=ids)
+        listings = self.queryset.in_bulk(ids)
+        return [listings[pk] for pk in ids if pk in listings]
+
+
+search_index = ListingSearchIndex()
@@ -1,5 +1,7 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
 from rest_framework import serializers
-from .models import Address, Listing, Amenity, ListingImg
+from .models import Address, Listing, Amenity, ListingImg, PricingRule
 from core.enums import Land
 
 
@@ -40,22 +42,44 @@ class ListingImgSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
+class PricingRuleSerializer(serializers.ModelSerializer):
+    """Serializer for listing pricing rules"""
+    class Meta:
+        model = PricingRule
+        fields = ['id', 'kind', 'percent', 'weekdays', 'start_date', 'end_date', 'min_nights']
+
+    def validate(self, data):
+        values = {field: getattr(self.instance, field) for field in self.Meta.fields[1:]} if self.instance else {}
+        values.update(data)
+        try:
+            PricingRule(**values).clean()
+        except DjangoValidationError as e:
+            raise serializers.ValidationError(e.message_dict)
+        return data
+
+
 class ListingSerializer(serializers.ModelSerializer):
     """Serializer for listing views"""
     owner_name = serializers.CharField(source='owner.get_full_name', read_only=True)
     city = serializers.CharField(source='address.city', read_only=True)
-    avg_rating = serializers.FloatField(read_only=True)
+    avg_rating = serializers.SerializerMethodField()
     main_img = serializers.SerializerMethodField()
+    #only present when searching by stay dates
+    nights = serializers.IntegerField(read_only=True)
+    total_price = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
 
     class Meta:
         model = Listing
         fields = [
             'id', 'title', 'created_at', 'city', 'owner_name', 'house_type',
             'max_stayers', 'bedrooms', 'bathrooms', 'price_per_night',
-            'views_count', 'avg_rating', 'main_img', 'is_active']
+            'views_count', 'avg_rating', 'rating_count', 'main_img', 'is_active', 'nights', 'total_price']
+
+    def get_avg_rating(self, obj):
+        return obj.avg_rating if obj.rating_count else None
 
     def get_main_img(self, obj):
-        main_img = obj.images.filter(main=True).first()
+        main_img = obj.main_image #select_related('main_image') keeps list pages at constant amount of queries
         if main_img:
             request = self.context.get('request')
             if request:
@@ -69,14 +93,17 @@ class ListingDetailSerializer(serializers.ModelSerializer):
     address = AddressSerializer(read_only=True)
     amenities = AmenitySerializer(many=True, read_only=True)
     images = ListingImgSerializer(many=True, read_only=True)
-    avg_rating = serializers.FloatField(read_only=True)
+    avg_rating = serializers.SerializerMethodField()
 
     class Meta:
         model = Listing
         fields = [
             'id', 'title', 'description', 'address', 'owner', 'house_type', 'price_per_night',
             'bedrooms', 'bathrooms', 'max_stayers', 'amenities', 'images',
-            'is_active', 'views_count', 'avg_rating', 'created_at', 'updated_at']
+            'is_active', 'views_count', 'avg_rating', 'rating_count', 'created_at', 'updated_at']
+
+    def get_avg_rating(self, obj):
+        return obj.avg_rating if obj.rating_count else None
 
 
 class ListingCreateSerializer(serializers.ModelSerializer):
@@ -105,11 +132,12 @@ class ListingCreateSerializer(serializers.ModelSerializer):
         address_data = validated_data.pop('address')
         amenity_ids = validated_data.pop('amenity_ids', [])
 
-        address = Address.objects.create(**address_data)
-        listing = Listing.objects.create(owner=request.user, address=address, **validated_data)
+        with transaction.atomic():
+            address = Address.objects.create(**address_data)
+            listing = Listing.objects.create(owner=request.user, address=address, **validated_data)
 
-        if amenity_ids:
-            listing.amenities.set(amenity_ids)
+            if amenity_ids:
+                listing.amenities.set(amenity_ids)
 
         return listing
 
@@ -1,6 +1,22 @@
 import logging
-from django.db.models import Q, F, Count
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.db import transaction
+from django.db.models import (
+    F, Q, Count, Sum, Case, When, Value, FloatField, DecimalField, OuterRef, Subquery
+)
+from django.db.models.functions import Cast, Coalesce, TruncHour
+from django.utils import timezone
+from core.models import JobCheckpoint
+from core.cache import response_cache
+from core.enums import BookingStatus
+from core.exceptions import DateRangeError
 from .models import Listing, ListingImg, SearchHistory, ViewHistory
+from .counters import view_counter
+from .history import search_recorder
+from .trends import search_trends
 
 logger = logging.getLogger(__name__)
 
@@ -9,14 +25,46 @@ class ListingService:
     """Service for listing logic"""
     @staticmethod
     def increment_views(listing, user=None):
-        """Increase listing views counter by 1"""
-        Listing.objects.filter(pk=listing.pk).update(views_count=F('views_count') + 1)
+        """Increase listing views counter by 1, written to db in batches by view_counter"""
+        view_counter.record(listing.pk, user.pk if user and user.is_authenticated else None)
 
-        ViewHistory.objects.create(
-            listing=listing,
-            user=user if user and user.is_authenticated else None
+    @staticmethod
+    def _refresh_avg_rating(queryset):
+        queryset.update(avg_rating=Case(
+            When(rating_count__gt=0, then=Cast('rating_sum', FloatField()) / Cast('rating_count', FloatField())),
+            default=Value(0.0),
+            output_field=FloatField()
+        ))
+
+    @staticmethod
+    def update_rating(listing_id, rating_delta, count_delta):
+        """Applies review rating change to listing aggregates, call inside the reviews transaction"""
+        queryset = Listing.objects.filter(pk=listing_id)
+        queryset.update(
+            rating_sum=F('rating_sum') + rating_delta,
+            rating_count=F('rating_count') + count_delta
         )
-        logger.info(f'Incremented views for listing {listing.id}')
+        ListingService._refresh_avg_rating(queryset)
+        response_cache.purge_on_commit('listings', f'listing:{listing_id}')
+
+    @staticmethod
+    def rebuild_ratings(listing_ids=None):
+        """Recalculates rating aggregates from reviews table"""
+        from reviews.models import Review
+
+        reviews = Review.objects.filter(listing=OuterRef('pk')).order_by().values('listing')
+        queryset = Listing.objects.all()
+        if listing_ids is not None:
+            queryset = queryset.filter(pk__in=listing_ids)
+
+        updated = queryset.update(
+            rating_sum=Coalesce(Subquery(reviews.annotate(total=Sum('rating')).values('total')), 0),
+            rating_count=Coalesce(Subquery(reviews.annotate(total=Count('pk')).values('total')), 0)
+        )
+        ListingService._refresh_avg_rating(queryset)
+        response_cache.purge_on_commit('listings', *[f'listing:{pk}' for pk in queryset.values_list('pk', flat=True)])
+        logger.info(f'Rebuilt rating aggregates for {updated} listings')
+        return updated
 
     @staticmethod
     def toggle_active_status(listing):
@@ -28,25 +76,17 @@ class ListingService:
         return listing
 
     @staticmethod
-    def search_listings(query_params, user=None):
+    def record_search(search, user=None, client_ip=None):
+        """Queues search for history and popular searches"""
+        if search_recorder.record(search, user.pk if user and user.is_authenticated else None, client_ip):
+            search_trends.add(search)
+
+    @staticmethod
+    def search_listings(query_params):
         """For searching and filtering listings by query parameters"""
         queryset = Listing.objects.filter(is_active=True).select_related(
-            'owner', 'address'
-        ).prefetch_related('amenities', 'images')
-
-        search = query_params.get('search')
-        if search:
-            queryset = queryset.filter(
-                Q(title__icontains=search) |
-                Q(description__icontains=search) |
-                Q(address__city__icontains=search)
-            )
-
-            SearchHistory.objects.create(
-                query=search,
-                user=user if user and user.is_authenticated else None
-            )
-            logger.info(f'Search recorded: {search}')
+            'owner', 'address', 'main_image'
+        )
 
         min_price = query_params.get('min_price')
         max_price = query_params.get('max_price')
@@ -63,6 +103,10 @@ class ListingService:
         if min_bedrooms:
             queryset = queryset.filter(bedrooms__gte=min_bedrooms)
 
+        min_rating = query_params.get('min_rating')
+        if min_rating:
+            queryset = queryset.filter(rating_count__gt=0, avg_rating__gte=min_rating)
+
         house_type = query_params.get('house_type')
         if house_type:
             queryset = queryset.filter(house_type=house_type)
@@ -71,24 +115,59 @@ class ListingService:
         if guests:
             queryset = queryset.filter(max_stayers__gte=guests)
 
+        check_in = query_params.get('check_in')
+        check_out = query_params.get('check_out')
+        if check_in or check_out:
+            from bookings.models import BookedNight
+
+            check_in, check_out = ListingService.parse_stay(check_in, check_out)
+            #one range scan over the availability index instead of an overlap query per listing
+            booked = BookedNight.objects.filter(night__gte=check_in, night__lt=check_out).values('listing_id')
+            queryset = queryset.exclude(pk__in=booked)
+
         return queryset
 
+    @staticmethod
+    def add_stay_prices(listings, check_in, check_out):
+        """Sets nights and total_price of the stay on a page of listings, priced in one batch"""
+        from .pricing import pricing_engine
+
+        stays = [(listing.pk, check_in, check_out) for listing in listings]
+        totals = pricing_engine.quote_many({listing.pk: listing for listing in listings}, stays)
+        for listing, total in zip(listings, totals):
+            listing.nights = (check_out - check_in).days
+            listing.total_price = total
+        return listings
+
+    @staticmethod
+    def parse_stay(check_in, check_out):
+        """Parses check_in/check_out query params (YYYY-MM-DD)"""
+        if not check_in or not check_out:
+            raise DateRangeError('Both check_in and check_out are required')
+        try:
+            check_in, check_out = date.fromisoformat(check_in), date.fromisoformat(check_out)
+        except ValueError:
+            raise DateRangeError('Dates must be in YYYY-MM-DD format')
+        if check_out <= check_in:
+            raise DateRangeError('Check-out must be after check-in')
+        return check_in, check_out
+
     @staticmethod
     def add_image(listing, img, main=False):
         """Adding image to listing"""
         if main:
             ListingImg.objects.filter(listing=listing, main=True).update(main=False)
 
-        img_obj = ListingImg.objects.create(listing=listing, img=img, main=main)
+        img_obj = ListingImg.objects.create(listing=listing, img=img, main=main) #also moves listing.main_image pointer
+        if main:
+            listing.main_image = img_obj
         logger.info(f'Added image to listing {listing.id}')
         return img_obj
 
     @staticmethod
-    def get_popular_searches(limit=10):
-        """Service for getting popular searches"""
-        return SearchHistory.objects.values('query').annotate(
-            count=Count('id')
-        ).order_by('-count')[:limit]
+    def get_popular_searches(limit=10, window='week'):
+        """Service for getting popular searches of the last hour/day/week"""
+        return search_trends.top(window, limit)
 
     @staticmethod
     def get_user_search_history(user, limit=20):
@@ -101,6 +180,98 @@ class ListingService:
         return ViewHistory.objects.filter(user=user).select_related('listing').order_by('-created_at')[:limit]
 
     @staticmethod
-    def get_popular_listings(limit=10):
-        """Service for getting popular listings"""
-        return Listing.objects.filter(is_active=True).order_by('-views_count')[:limit]
\ No newline at end of file
+    def get_popular_listings(limit=10, city=None, land=None):
+        """Service for getting trending listings, optionally within one city or land"""
+        queryset = Listing.objects.filter(is_active=True).select_related('owner', 'address', 'main_image')
+        if city:
+            queryset = queryset.filter(address__city__iexact=city)
+        if land:
+            queryset = queryset.filter(address__land=land)
+        return queryset.order_by('-trending_score', '-views_count')[:limit]
+
+    @staticmethod
+    def get_owner_stats(owner, start, end):
+        """
+        Owner listings with booking counts, upcoming booked nights, revenue of stays checked in within [start, end),
+        rating and views. One query: conditional aggregates over bookings, booked nights as a subquery
+        (joining both relations would multiply the aggregates)
+        """
+        from bookings.models import BookedNight
+
+        booked = Q(bookings__book_status__in=[BookingStatus.confirmed.name, BookingStatus.completed.name])
+        upcoming_nights = BookedNight.objects.filter(
+            listing=OuterRef('pk'), night__gte=timezone.now().date()
+        ).order_by().values('listing').annotate(nights=Count('pk')).values('nights')[:1]
+
+        return Listing.objects.filter(owner=owner).annotate(
+            pending_bookings=Count('bookings', filter=Q(bookings__book_status=BookingStatus.pending.name)),
+            confirmed_bookings=Count('bookings', filter=Q(bookings__book_status=BookingStatus.confirmed.name)),
+            completed_bookings=Count('bookings', filter=Q(bookings__book_status=BookingStatus.completed.name)),
+            revenue=Coalesce(
+                Sum('bookings__total_price', filter=booked & Q(bookings__check_in__gte=start, bookings__check_in__lt=end)),
+                Value(Decimal('0')), output_field=DecimalField(max_digits=12, decimal_places=2)
+            ),
+            upcoming_nights=Coalesce(Subquery(upcoming_nights), 0),
+        ).order_by('-created_at').values(
+            'id', 'title', 'is_active', 'price_per_night', 'pending_bookings', 'confirmed_bookings',
+            'completed_bookings', 'upcoming_nights', 'revenue', 'avg_rating', 'rating_count', 'views_count'
+        )
+
+    @staticmethod
+    def _trending_events(since, now):
+        """Weighted events per listing since last run, every event decayed from the hour it happened"""
+        from bookings.models import Booking
+        from users.models import Favorite
+
+        decay_per_hour = 0.5 ** (1 / settings.TRENDING_HALF_LIFE_HOURS)
+        weights = settings.TRENDING_WEIGHTS
+        sources = [
+            (ViewHistory.objects, weights['view']),
+            (Favorite.objects, weights['favorite']),
+            (Booking.objects, weights['booking']),
+        ]
+        increments = defaultdict(float)
+        for manager, weight in sources:
+            rows = manager.filter(created_at__gt=since, created_at__lte=now).annotate(
+                hour=TruncHour('created_at')
+            ).values_list('listing_id', 'hour').annotate(events=Count('pk')).order_by()
+            for listing_id, hour, events in rows:
+                age_hours = max((now - hour).total_seconds() / 3600, 0)
+                increments[listing_id] += weight * events * decay_per_hour ** age_hours
+        return increments
+
+    @staticmethod
+    def update_trending_scores(now=None):
+        """
+        Decays all trending scores for the time passed since last run and adds views, favorites and bookings
+        that happened in between, so every run only reads new events. Runs stop TRENDING_EVENT_LAG_SECONDS
+        before now, so views written late by the buffered view counter still fall into the next run
+        """
+        now = (now or timezone.now()) - timedelta(seconds=settings.TRENDING_EVENT_LAG_SECONDS)
+        with transaction.atomic():
+            checkpoint = JobCheckpoint.objects.select_for_update().get_or_create(name='trending_scores')[0]
+            computed_at = checkpoint.state.get('computed_at')
+            if computed_at:
+                since = datetime.fromisoformat(computed_at)
+            else:
+                since = now - timedelta(hours=settings.TRENDING_HALF_LIFE_HOURS * 4)
+            if since >= now:
+                return 0
+
+            factor = 0.5 ** ((now - since).total_seconds() / 3600 / settings.TRENDING_HALF_LIFE_HOURS)
+            Listing.objects.filter(trending_score__gt=0).update(trending_score=F('trending_score') * factor)
+            Listing.objects.filter(trending_score__gt=0, trending_score__lt=0.01).update(trending_score=0)
+
+            increments = list(ListingService._trending_events(since, now).items())
+            for offset in range(0, len(increments), 500):
+                chunk = increments[offset:offset + 500]
+                Listing.objects.filter(pk__in=[pk for pk, _ in chunk]).update(trending_score=F('trending_score') + Case(
+                    *[When(pk=pk, then=Value(score)) for pk, score in chunk],
+                    default=Value(0.0),
+                    output_field=FloatField()
+                ))
+            checkpoint.save_state(computed_at=now.isoformat())
+            response_cache.purge_on_commit('listings')
+
+        logger.info(f'Updated trending scores, {len(increments)} listings had new activity')
+        return len(increments)
\ No newline at end of file
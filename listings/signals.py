@@ -0,0 +1,84 @@
+from django.db import transaction
+from django.db.models.signals import post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Listing, Address, Amenity, ListingImg, PricingRule
+from .search import search_index
+from core.cache import response_cache
+
+
+def _reindex_on_commit(listing_ids):
+    listing_ids = list(listing_ids)
+    transaction.on_commit(lambda: search_index.update_listings(listing_ids))
+
+
+def _touch_listings(listing_ids):
+    """Bumps updated_at of listings whose amenities or pricing rules changed, it is their version (ETag, price calendar)"""
+    Listing.objects.filter(pk__in=listing_ids).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Listing)
+def reindex_listing(sender, instance, **kwargs):
+    _reindex_on_commit([instance.pk])
+    response_cache.purge_on_commit('listings', f'listing:{instance.pk}')
+
+
+@receiver(post_delete, sender=Listing)
+def unindex_listing(sender, instance, **kwargs):
+    search_index.remove_listing(instance.pk)
+    response_cache.purge_on_commit('listings', f'listing:{instance.pk}')
+
+
+@receiver(post_save, sender=Address)
+def reindex_address_listing(sender, instance, created, **kwargs):
+    if created: #new address has no listing yet, the listing save reindexes it
+        return
+    listing_ids = list(Listing.objects.filter(address=instance).values_list('pk', flat=True))
+    _reindex_on_commit(listing_ids)
+    response_cache.purge_on_commit('listings', *[f'listing:{pk}' for pk in listing_ids])
+
+
+@receiver([post_save, post_delete], sender=ListingImg)
+def purge_listing_images(sender, instance, **kwargs):
+    response_cache.purge_on_commit('listings', f'listing:{instance.listing_id}') #main image is shown on list pages
+
+
+@receiver([post_save, post_delete], sender=PricingRule)
+def rebuild_listing_prices(sender, instance, **kwargs):
+    _touch_listings([instance.listing_id]) #new listing version, price calendar gets rebuilt
+    response_cache.purge_on_commit(f'listing:{instance.listing_id}') #stay totals on search pages
+
+
+@receiver(post_save, sender=Amenity)
+def reindex_amenity_listings(sender, instance, created, **kwargs):
+    response_cache.purge_on_commit('amenities')
+    if created:
+        return
+    _reindex_on_commit(instance.listings.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Amenity)
+def unindex_amenity(sender, instance, **kwargs):
+    #m2m rows of a deleted amenity are removed without m2m_changed, so listings are collected beforehand
+    listing_ids = list(instance.listings.values_list('pk', flat=True))
+    _reindex_on_commit(listing_ids)
+    _touch_listings(listing_ids)
+    response_cache.purge_on_commit('amenities', *[f'listing:{pk}' for pk in listing_ids])
+
+
+@receiver(m2m_changed, sender=Listing.amenities.through)
+def reindex_listing_amenities(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        _reindex_on_commit([instance.pk])
+        _touch_listings([instance.pk])
+        response_cache.purge_on_commit(f'listing:{instance.pk}')
+    elif pk_set:
+        _reindex_on_commit(pk_set)
+        _touch_listings(pk_set)
+        response_cache.purge_on_commit(*[f'listing:{pk}' for pk in pk_set])
+    else: #amenity.listings.clear() doesnt tell which listings lost it
+        transaction.on_commit(search_index.rebuild)
+        response_cache.purge_on_commit('listings', 'amenities')
@@ -1,9 +1,32 @@
-from django.test import TestCase
+import json
+import os
+from base64 import urlsafe_b64encode
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
 from django.urls import reverse
 from rest_framework.test import APITestCase
 from rest_framework import status
-from .models import Listing, Address, SearchHistory, ViewHistory
+from io import StringIO
+from unittest import mock
+from django.conf import settings
+from .models import Listing, ListingImg, Address, Amenity, PricingRule, SearchHistory, SearchTrendBucket, ViewHistory
+from .admin import ListingAdmin
+from .importer import ListingImporter, read_rows
+from .pricing import pricing_engine
+from .search import search_index
+from .services import ListingService
+from .counters import view_counter
+from .history import search_recorder
+from .trends import SpaceSaving, search_trends
 from users.models import User
+from bookings.models import Booking
+from bookings.services import BookingService
 
 
 class ListingModelTest(TestCase):
@@ -44,6 +67,7 @@ class ListingModelTest(TestCase):
 class ListingListViewTest(APITestCase):
     """Tests for listings list view and creation"""
     def setUp(self):
+        cache.clear()
         self.owner = User.objects.create_user(
             email="owner@example.com",
             username="owner",
@@ -134,7 +158,11 @@ class ListingListViewTest(APITestCase):
 
 class ListingDetailViewTest(APITestCase):
     """Tests for listing detail view"""
+    def tearDown(self):
+        view_counter.clear()
+
     def setUp(self):
+        cache.clear()
         self.owner = User.objects.create_user(
             email="owner@example.com",
             username="owner",
@@ -201,6 +229,7 @@ class ListingDetailViewTest(APITestCase):
 class ListingHistoryTest(APITestCase):
     """Tests for search and view history"""
     def setUp(self):
+        cache.clear()
         self.owner = User.objects.create_user(
             email="owner@example.com",
             username="owner",
@@ -232,21 +261,64 @@ class ListingHistoryTest(APITestCase):
             max_stayers=4,
             house_type="apartment"
         )
+        view_counter.clear()
+        search_recorder.clear()
+        self.addCleanup(view_counter.clear)
+        self.addCleanup(search_recorder.clear)
+        self.addCleanup(search_trends.clear)
 
     def test_view_saves_history(self):
         """Test that listing views are saved to history"""
         self.client.force_authenticate(user=self.tenant)
         url = reverse("listing-detail", args=[self.listing.id])
         self.client.get(url)
+        view_counter.flush()
         self.assertTrue(ViewHistory.objects.filter(listing=self.listing, user=self.tenant).exists())
 
+    def test_views_are_written_in_batches(self):
+        """Test buffered views are aggregated into one counter update"""
+        url = reverse("listing-detail", args=[self.listing.id])
+        for _ in range(3):
+            self.client.get(url)
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.views_count, 0)
+
+        with self.assertNumQueries(5): #savepoint, update, existing ids, bulk insert, release
+            self.assertEqual(view_counter.flush(), 3)
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.views_count, 3)
+        self.assertEqual(ViewHistory.objects.filter(listing=self.listing).count(), 3)
+
     def test_search_saves_history(self):
         """Test that search queries are saved to history"""
         self.client.force_authenticate(user=self.tenant)
         url = reverse("listing-list")
         self.client.get(url, {"search": "Berlin"})
+        search_recorder.flush()
         self.assertTrue(SearchHistory.objects.filter(query="Berlin", user=self.tenant).exists())
 
+    def test_repeated_search_recorded_once(self):
+        """Test paging and re-sorting the same search doesnt add history rows"""
+        self.client.force_authenticate(user=self.tenant)
+        url = reverse("listing-list")
+        search_index.rebuild()
+        with self.assertNumQueries(2): #count and page, no insert
+            self.client.get(url, {"search": "Berlin"})
+        self.client.get(url, {"search": " berlin ", "ordering": "price_per_night"})
+        self.client.get(url, {"search": "Berlin", "page": 2})
+        self.assertEqual(search_recorder.flush(), 1)
+        self.assertEqual(SearchHistory.objects.filter(user=self.tenant).count(), 1)
+
+    def test_recorder_prunes_expired_searches(self):
+        """Test expired dedupe keys are dropped as new searches come in, repeats after the window are recorded"""
+        self.addCleanup(search_recorder.clear)
+        with mock.patch("listings.history.time.monotonic", return_value=1000.0):
+            for i in range(50):
+                search_recorder.record(f"query {i}", client_ip="1.2.3.4")
+        with mock.patch("listings.history.time.monotonic", return_value=1000.0 + settings.SEARCH_HISTORY_DEDUPE_SECONDS):
+            self.assertTrue(search_recorder.record("query 0", client_ip="1.2.3.4"))
+        self.assertEqual(len(search_recorder._seen), 1)
+
     def test_popular_listings(self):
         """Test retrieving popular listings"""
         url = reverse("popular-listings")
@@ -254,5 +326,692 @@ class ListingHistoryTest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
 
+class ListingSearchIndexTest(APITestCase):
+    """Tests for the inverted search index"""
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(
+            email="owner@example.com",
+            username="owner",
+            password="pass123",
+            role="owner"
+        )
+        self.berlin = Listing.objects.create(
+            owner=self.owner,
+            title="Berlin Loft",
+            description="Bright loft close to the river",
+            address=Address.objects.create(
+                city="Berlin", land="berlin", street="Test Street", house_number="1", postal_code="10115"
+            ),
+            price_per_night=100.00,
+            bedrooms=1,
+            bathrooms=1,
+            max_stayers=2,
+            house_type="apartment"
+        )
+        self.munich = Listing.objects.create(
+            owner=self.owner,
+            title="Quiet Studio",
+            description="Studio near Berlin street in the old town",
+            address=Address.objects.create(
+                city="Munich", land="bayern", street="Main Street", house_number="2", postal_code="80331"
+            ),
+            price_per_night=80.00,
+            bedrooms=1,
+            bathrooms=1,
+            max_stayers=2,
+            house_type="studio"
+        )
+        search_index.rebuild()
+        self.addCleanup(search_recorder.clear)
+        self.addCleanup(search_trends.clear)
+
+    def test_ranking_and_prefix(self):
+        """Test title/city hits rank higher and prefixes are matched"""
+        self.assertEqual(search_index.search("berlin"), [self.berlin.id, self.munich.id])
+        self.assertEqual(search_index.search("berl loft"), [self.berlin.id])
+        self.assertEqual(search_index.search("castle"), [])
+
+    def test_incremental_updates(self):
+        """Test index follows listing, address and amenity changes"""
+        wifi = Amenity.objects.create(name="Wifi", category="basic")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.munich.amenities.add(wifi)
+        self.assertEqual(search_index.search("wifi"), [self.munich.id])
+
+        self.munich.address.city = "Hamburg"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.munich.address.save()
+        self.assertEqual(search_index.search("hamburg"), [self.munich.id])
+
+        self.berlin.delete()
+        self.assertEqual(search_index.search("loft"), [])
+
+    def test_list_view_uses_index(self):
+        """Test list endpoint returns listings in relevance order"""
+        response = self.client.get(reverse("listing-list"), {"search": "berlin"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item["id"] for item in response.data["results"]], [self.berlin.id, self.munich.id])
+
+    def test_cached_relevance_and_default_ordering_differ(self):
+        """Test search pages in relevance order and ordered by the default field are cached separately"""
+        url = reverse("listing-list")
+        relevance = self.client.get(url, {"search": "berlin"})
+        newest = self.client.get(url, {"search": "berlin", "ordering": "-created_at"})
+        self.assertEqual([item["id"] for item in relevance.data["results"]], [self.berlin.id, self.munich.id])
+        self.assertEqual([item["id"] for item in newest.data["results"]], [self.munich.id, self.berlin.id])
+
+    def test_schema_documents_list_parameters(self):
+        """Test the OpenAPI schema lists the search and stay query parameters of the list endpoint"""
+        response = self.client.get(reverse("schema"), {"format": "json"})
+        parameters = {item["name"] for item in response.json()["paths"]["/api/listings/"]["get"]["parameters"]}
+        self.assertTrue({"search", "check_in", "check_out", "guests"} <= parameters)
+
+    def test_inactive_listings_not_indexed(self):
+        """Test deactivated listings are removed from the index"""
+        self.berlin.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.berlin.save()
+        self.assertEqual(search_index.search("berlin"), [self.munich.id])
+        search_index.rebuild()
+        self.assertEqual(search_index.search("berlin"), [self.munich.id])
+
+    def test_admin_activation_updates_index(self):
+        """Test bulk (de)activation from the admin updates the index and purges cached pages"""
+        url = reverse("listing-list")
+        self.assertEqual(len(self.client.get(url, {"search": "berlin"}).data["results"]), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            ListingAdmin.set_active(Listing.objects.filter(pk=self.berlin.pk), False)
+        self.assertEqual(search_index.search("berlin"), [self.munich.id])
+        self.assertEqual([item["id"] for item in self.client.get(url, {"search": "berlin"}).data["results"]], [self.munich.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ListingAdmin.set_active(Listing.objects.filter(pk=self.berlin.pk), True)
+        self.assertEqual(search_index.search("loft"), [self.berlin.id])
+
+    @override_settings(SEARCH_INDEX_MAX_RESULTS=1)
+    def test_filters_apply_before_cap(self):
+        """Test db filters run before the result cap, so lower ranked matches are not cut off"""
+        response = self.client.get(reverse("listing-list"), {"search": "berlin", "city": "Munich"})
+        self.assertEqual([item["id"] for item in response.data["results"]], [self.munich.id])
+
+
+class ListingCursorPaginationTest(APITestCase):
+    """Tests for opt-in keyset pagination"""
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(
+            email="owner@example.com",
+            username="owner",
+            password="pass123",
+            role="owner"
+        )
+        for i in range(25):
+            Listing.objects.create(
+                owner=self.owner,
+                title=f"Listing {i}",
+                description="Central location in Berlin",
+                address=Address.objects.create(
+                    city="Berlin", land="berlin", street="Test Street", house_number=str(i), postal_code="10115"
+                ),
+                price_per_night=50 + i % 5,
+                bedrooms=1,
+                bathrooms=1,
+                max_stayers=2,
+                house_type="apartment"
+            )
+
+    def walk(self, params):
+        ids, url, pages = [], reverse("listing-list"), 0
+        response = self.client.get(url, params)
+        while True:
+            self.assertNotIn("count", response.data)
+            ids += [item["id"] for item in response.data["results"]]
+            pages += 1
+            if not response.data["next"]:
+                return ids, pages, response
+            response = self.client.get(response.data["next"])
+
+    def test_cursor_pages_keep_search_relevance(self):
+        """Test cursor pages walk search results in relevance order and previous links go back"""
+        search_index.rebuild()
+        self.addCleanup(search_recorder.clear)
+        self.addCleanup(search_trends.clear)
+        ids, pages, last = self.walk({"pagination": "cursor", "search": "berlin listing"})
+        self.assertEqual(ids, search_index.search("berlin listing"))
+        self.assertEqual(pages, 2)
+        response = self.client.get(last.data["previous"])
+        self.assertEqual([item["id"] for item in response.data["results"]], ids[:20])
+        self.assertIsNone(response.data["previous"])
+
+    def test_cursor_pages_cover_all_listings(self):
+        """Test cursor pages return every listing once in the requested order"""
+        ids, pages, last = self.walk({"pagination": "cursor", "ordering": "price_per_night"})
+        expected = list(Listing.objects.order_by("price_per_night", "pk").values_list("pk", flat=True))
+        self.assertEqual(ids, expected)
+        self.assertEqual(pages, 2)
+
+        previous = self.client.get(last.data["previous"])
+        self.assertEqual([item["id"] for item in previous.data["results"]], expected[:20])
+
+    def test_invalid_cursor_values(self):
+        """Test cursors with values not fitting the ordering are rejected with 404"""
+        url = reverse("listing-list")
+        for values in (["abc", "x"], [None, 1], [50], [[1], 1], ["50.00", "2", "3"]):
+            cursor = urlsafe_b64encode(json.dumps({"v": values}).encode()).decode()
+            response = self.client.get(url, {"ordering": "price_per_night", "cursor": cursor})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, values)
+
+        cursor = urlsafe_b64encode(json.dumps({"v": ["50.00", "1"]}).encode()).decode()
+        response = self.client.get(url, {"ordering": "price_per_night", "cursor": cursor})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_page_number_is_default(self):
+        """Test page number pagination stays the default"""
+        response = self.client.get(reverse("listing-list"))
+        self.assertEqual(response.data["count"], 25)
+
+
+class ListingMainImageTest(APITestCase):
+    """Tests for main image pointer"""
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(
+            email="owner@example.com",
+            username="owner",
+            password="pass123",
+            role="owner"
+        )
+        self.listings = []
+        for i in range(5):
+            listing = Listing.objects.create(
+                owner=self.owner,
+                title=f"Listing {i}",
+                description="Central location in Berlin",
+                address=Address.objects.create(
+                    city="Berlin", land="berlin", street="Test Street", house_number=str(i), postal_code="10115"
+                ),
+                price_per_night=100,
+                bedrooms=1,
+                bathrooms=1,
+                max_stayers=2,
+                house_type="apartment"
+            )
+            ListingImg.objects.create(listing=listing, img=f"listings/{i}.jpg", main=True)
+            self.listings.append(listing)
+
+    def test_pointer_follows_main_flag(self):
+        """Test main image pointer moves with main flag and is cleared on delete"""
+        listing = self.listings[0]
+        second = ListingImg.objects.create(listing=listing, img="listings/second.jpg", main=True)
+        listing.refresh_from_db()
+        self.assertEqual(listing.main_image_id, second.id)
+
+        second.delete()
+        listing.refresh_from_db()
+        self.assertIsNone(listing.main_image_id)
+
+    def test_list_queries_do_not_grow_with_page(self):
+        """Test list endpoint renders main images without per-listing queries"""
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("listing-list"))
+        self.assertTrue(all(item["main_img"] for item in response.data["results"]))
+
+
+class PopularSearchesTest(APITestCase):
+    """Tests for streaming popular searches"""
+    def setUp(self):
+        cache.clear()
+        search_trends.clear()
+        self.addCleanup(search_trends.clear)
+
+    def test_space_saving_keeps_heavy_hitters(self):
+        """Test frequent items survive evictions in a small summary"""
+        summary = SpaceSaving(capacity=3)
+        for i in range(50):
+            summary.add("berlin")
+            summary.add(f"rare {i}")
+        self.assertIn("berlin", summary.counts)
+        self.assertGreaterEqual(summary.counts["berlin"], 50)
+        self.assertEqual(len(summary.counts), 3)
+
+    def test_windows_and_checkpoint(self):
+        """Test popular searches per window survive a checkpoint and reload"""
+        now = timezone.now()
+        for _ in range(3):
+            search_trends.add("Berlin", now)
+        search_trends.add("munich", now)
+        search_trends.add("hamburg", now - timedelta(days=2))
+        self.assertEqual(search_trends.flush(), 3)
+        self.assertEqual(SearchTrendBucket.objects.get(query="berlin").count, 3)
+
+        search_trends.clear()
+        response = self.client.get(reverse("popular-searches"), {"window": "day"})
+        self.assertEqual(response.data, [{"query": "berlin", "count": 3}, {"query": "munich", "count": 1}])
+        response = self.client.get(reverse("popular-searches"))
+        self.assertEqual(len(response.data), 3)
+        response = self.client.get(reverse("popular-searches"), {"window": "year"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TrendingListingsTest(APITestCase):
+    """Tests for time-decayed trending scores"""
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(
+            email="owner@example.com",
+            username="owner",
+            password="pass123",
+            role="owner"
+        )
+        self.old, self.new = [
+            Listing.objects.create(
+                owner=self.owner,
+                title=title,
+                description="Central location in Berlin",
+                address=Address.objects.create(
+                    city=city, land="berlin", street="Test Street", house_number="1", postal_code="10115"
+                ),
+                price_per_night=100,
+                bedrooms=1,
+                bathrooms=1,
+                max_stayers=2,
+                house_type="apartment",
+                views_count=views
+            )
+            for title, city, views in [("Old Favourite", "Berlin", 1000), ("New Hit", "Potsdam", 0)]
+        ]
+
+    def test_recent_activity_outranks_lifetime_views(self):
+        """Test recent views beat old ones and scores decay between runs"""
+        now = timezone.now()
+        ViewHistory.objects.bulk_create(
+            [ViewHistory(listing=self.old, created_at=now - timedelta(days=10)) for _ in range(10)] +
+            [ViewHistory(listing=self.new, created_at=now - timedelta(hours=1)) for _ in range(3)]
+        )
+        ListingService.update_trending_scores(now)
+
+        response = self.client.get(reverse("popular-listings"))
+        self.assertEqual([item["id"] for item in response.data][:2], [self.new.id, self.old.id])
+        response = self.client.get(reverse("popular-listings"), {"city": "berlin"})
+        self.assertEqual([item["id"] for item in response.data], [self.old.id])
+
+        self.new.refresh_from_db()
+        score = self.new.trending_score
+        ListingService.update_trending_scores(now + timedelta(hours=72))
+        self.new.refresh_from_db()
+        self.assertAlmostEqual(self.new.trending_score, score / 2)
+
+    def test_late_flushed_views_are_counted(self):
+        """Test views written after a run with an earlier timestamp are counted by the next run"""
+        now = timezone.now()
+        ListingService.update_trending_scores(now)
+        ViewHistory.objects.create(listing=self.new, created_at=now - timedelta(seconds=5)) #flushed by the view counter
+        ListingService.update_trending_scores(now + timedelta(minutes=5))
+        self.new.refresh_from_db()
+        self.assertGreater(self.new.trending_score, 0)
+
+
+class ResponseCacheTest(APITestCase):
+    """Tests for cached listing responses"""
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(
+            email="owner@example.com",
+            username="owner",
+            password="pass123",
+            role="owner"
+        )
+        self.admin = User.objects.create_user(
+            email="admin@example.com",
+            username="admin",
+            password="pass123",
+            role="admin"
+        )
+        self.listing = Listing.objects.create(
+            owner=self.owner,
+            title="Cosy flat",
+            description="Central location in Berlin",
+            address=Address.objects.create(
+                city="Berlin", land="berlin", street="Test Street", house_number="1", postal_code="10115"
+            ),
+            price_per_night=100,
+            bedrooms=1,
+            bathrooms=1,
+            max_stayers=2,
+            house_type="apartment"
+        )
+        self.addCleanup(view_counter.clear)
+
+    def test_list_served_from_cache_until_listing_changes(self):
+        """Test repeated list request runs no queries and a listing update purges it"""
+        url = reverse("listing-list")
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url, {"page": "1"})
+        self.assertEqual(response.data["results"][0]["title"], "Cosy flat")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.listing.title = "Renamed flat"
+            self.listing.save()
+        response = self.client.get(url)
+        self.assertEqual(response.data["results"][0]["title"], "Renamed flat")
+
+    def test_cached_detail_still_counts_views(self):
+        """Test detail hits from cache are recorded as views"""
+        url = reverse("listing-detail", kwargs={"pk": self.listing.pk})
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            self.client.get(url)
+        view_counter.flush()
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.views_count, 2)
+
+    def test_stats_for_admin_only(self):
+        """Test cache stats report hits and misses to admins"""
+        url = reverse("listing-list")
+        self.client.get(url)
+        self.client.get(url)
+
+        response = self.client.get(reverse("cache-stats"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get(reverse("cache-stats"))
+        self.assertEqual(response.data["views"]["listing-list"], {"hits": 1, "misses": 1, "hit_rate": 0.5})
+
+
+class ConditionalGetTest(APITestCase):
+    """Tests for ETag/Last-Modified on listing detail"""
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(
+            email="owner@example.com",
+            username="owner",
+            password="pass123",
+            role="owner"
+        )
+        self.listing = Listing.objects.create(
+            owner=self.owner,
+            title="Cosy flat",
+            description="Central location in Berlin",
+            address=Address.objects.create(
+                city="Berlin", land="berlin", street="Test Street", house_number="1", postal_code="10115"
+            ),
+            price_per_night=100,
+            bedrooms=1,
+            bathrooms=1,
+            max_stayers=2,
+            house_type="apartment"
+        )
+        self.url = reverse("listing-detail", kwargs={"pk": self.listing.pk})
+        self.addCleanup(view_counter.clear)
+
+    def test_not_modified_until_amenities_change(self):
+        """Test matching ETag gives 304 and adding an amenity changes the ETag"""
+        response = self.client.get(self.url)
+        etag = response["ETag"]
+        self.assertIn("Last-Modified", response)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.listing.amenities.add(Amenity.objects.create(name="Sauna", category="wellness"))
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["amenities"][0]["name"], "Sauna")
+
+    def test_missing_listing_is_not_found(self):
+        """Test conditional request for unknown listing returns 404"""
+        response = self.client.get(reverse("listing-detail", kwargs={"pk": 999}), HTTP_IF_NONE_MATCH='W/"x"')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class OwnerStatsTest(APITestCase):
+    """Tests for owner portfolio stats"""
+    def setUp(self):
+        self.owner = User.objects.create_user(
+            email="owner@example.com",
+            username="owner",
+            password="pass123",
+            role="owner"
+        )
+        self.tenant = User.objects.create_user(
+            email="tenant@example.com",
+            username="tenant",
+            password="pass123",
+            role="tenant"
+        )
+        self.listings = [
+            Listing.objects.create(
+                owner=self.owner,
+                title=f"Flat {i}",
+                description="Central location in Berlin",
+                address=Address.objects.create(
+                    city="Berlin", land="berlin", street="Test Street", house_number=str(i), postal_code="10115"
+                ),
+                price_per_night=100,
+                bedrooms=1,
+                bathrooms=1,
+                max_stayers=2,
+                house_type="apartment"
+            )
+            for i in range(3)
+        ]
+        today = timezone.now().date()
+        for listing in self.listings:
+            Booking.objects.create(
+                listing=listing, tenant=self.tenant, stayers=1, book_status="completed",
+                check_in=today - timedelta(days=10), check_out=today - timedelta(days=8)
+            )
+            Booking.objects.create(
+                listing=listing, tenant=self.tenant, stayers=1,
+                check_in=today + timedelta(days=5), check_out=today + timedelta(days=6)
+            )
+        booking = Booking.objects.create(
+            listing=self.listings[0], tenant=self.tenant, stayers=1, book_status="confirmed",
+            check_in=today + timedelta(days=1), check_out=today + timedelta(days=4)
+        )
+        BookingService.sync_booked_nights(booking)
+
+    def test_stats_in_one_query(self):
+        """Test every owned listing gets its stats from one query"""
+        self.client.force_authenticate(user=self.owner)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("my-listing-stats"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["listings"]), 3)
+
+        stats = {listing["id"]: listing for listing in response.data["listings"]}[self.listings[0].id]
+        self.assertEqual(
+            (stats["pending_bookings"], stats["confirmed_bookings"], stats["completed_bookings"]), (1, 1, 1)
+        )
+        self.assertEqual(stats["upcoming_nights"], 3)
+        self.assertEqual(stats["revenue"], 200)
+        self.assertEqual(response.data["totals"]["revenue"], 600)
+        self.assertEqual(response.data["totals"]["upcoming_nights"], 3)
+
+        self.client.force_authenticate(user=self.tenant)
+        self.assertEqual(self.client.get(reverse("my-listing-stats")).data["listings"], [])
+
+
+class PricingRulesTest(APITestCase):
+    """Tests for pricing rules and price calendars"""
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(
+            email="owner@example.com",
+            username="owner",
+            password="pass123",
+            role="owner"
+        )
+        self.listing = Listing.objects.create(
+            owner=self.owner,
+            title="Cosy flat",
+            description="Central location in Berlin",
+            address=Address.objects.create(
+                city="Berlin", land="berlin", street="Test Street", house_number="1", postal_code="10115"
+            ),
+            price_per_night=100,
+            bedrooms=1,
+            bathrooms=1,
+            max_stayers=2,
+            house_type="apartment"
+        )
+        today = timezone.now().date()
+        self.monday = today + timedelta(days=7 - today.weekday())
+        self.url = reverse("listing-pricing-rules", kwargs={"pk": self.listing.pk})
+
+    def quote(self, nights):
+        listing = Listing.objects.get(pk=self.listing.pk)
+        return pricing_engine.quote(listing, self.monday, self.monday + timedelta(days=nights))
+
+    def test_rules_change_quotes(self):
+        """Test weekday, season and length of stay rules are combined and cached calendars are rebuilt"""
+        self.assertEqual(self.quote(7), Decimal("700.00"))
+        self.client.force_authenticate(user=self.owner)
+        for rule in (
+            {"kind": "weekday", "percent": 50, "weekdays": "4,5"},
+            {"kind": "length_of_stay", "percent": -10, "min_nights": 7},
+        ):
+            response = self.client.post(self.url, rule, format="json")
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.quote(7), Decimal("720.00"))
+        self.assertEqual(self.quote(5), Decimal("550.00"))
+
+        PricingRule.objects.create(
+            listing=self.listing, kind="season", percent=20, start_date=self.monday, end_date=self.monday
+        )
+        listing = Listing.objects.get(pk=self.listing.pk)
+        self.assertEqual(pricing_engine.quote(listing, self.monday, self.monday + timedelta(days=7)), Decimal("738.00"))
+        with self.assertNumQueries(0):
+            pricing_engine.quote(listing, self.monday + timedelta(days=1), self.monday + timedelta(days=3))
+
+        far = self.monday + timedelta(days=7 * 200)
+        self.assertEqual(pricing_engine.quote(listing, far, far + timedelta(days=7)), Decimal("720.00"))
+
+    def test_rule_validation_and_access(self):
+        """Test incomplete rules are rejected and rules of other owners are not accessible"""
+        self.client.force_authenticate(user=self.owner)
+        response = self.client.post(self.url, {"kind": "season", "percent": 10}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(self.url, {"kind": "weekday", "percent": 10, "weekdays": "7"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        other = User.objects.create_user(email="other@example.com", username="other", password="pass123", role="owner")
+        self.client.force_authenticate(user=other)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ListingImportTest(APITestCase):
+    """Tests for bulk listing import"""
+    HEADER = "title,description,house_type,max_stayers,bedrooms,bathrooms,price_per_night,city,land,street,house_number,postal_code,amenities\n"
+
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(
+            email="owner@example.com",
+            username="owner",
+            password="pass123",
+            role="owner"
+        )
+        Amenity.objects.create(name="Wifi", category="basic")
+        Amenity.objects.create(name="Sauna", category="premium")
+
+    def row(self, number, postal_code="10115", amenities="Wifi;Sauna"):
+        return (
+            f"Imported flat {number},Bright flat close to the park,apartment,2,1,1,80.00,"
+            f"Berlin,berlin,Import Street,{number},{postal_code},{amenities}\n"
+        )
+
+    def test_import_csv_reports_row_errors(self):
+        """Test valid rows are created with amenities and invalid or duplicate rows are reported"""
+        content = self.HEADER + self.row(1) + self.row(2, amenities="") + self.row(3, postal_code="1x") \
+            + self.row(4, amenities="Pool") + self.row(1)
+        self.client.force_authenticate(user=self.owner)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse("listing-import"), {
+                "file": SimpleUploadedFile("listings.csv", content.encode())
+            }, format="multipart")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data["created"], response.data["failed"]), (2, 3))
+        self.assertEqual([error["row"] for error in response.data["errors"]], [3, 4, 5])
+        self.assertIn("postal_code", response.data["errors"][0]["errors"])
+
+        listing = Listing.objects.get(title="Imported flat 1")
+        self.assertEqual(listing.owner, self.owner)
+        self.assertEqual(sorted(listing.amenities.values_list("name", flat=True)), ["Sauna", "Wifi"])
+        self.assertIn(listing.pk, search_index.search("imported"))
+
+        tenant = User.objects.create_user(email="tenant@example.com", username="tenant", password="pass123", role="tenant")
+        self.client.force_authenticate(user=tenant)
+        response = self.client.post(reverse("listing-import"), {
+            "file": SimpleUploadedFile("listings.csv", content.encode())
+        }, format="multipart")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_import_command_in_chunks(self):
+        """Test JSONL import through the command in chunks, malformed lines are reported"""
+        rows = [
+            {"title": f"Imported flat {i}", "description": "Bright flat close to the park", "house_type": "apartment",
+             "max_stayers": 2, "bedrooms": 1, "bathrooms": 1, "price_per_night": 80, "city": "Berlin", "land": "berlin",
+             "street": "Import Street", "house_number": str(i), "postal_code": "10115", "amenities": ["Wifi"]}
+            for i in range(5)
+        ]
+        with tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False) as file:
+            file.write("\n".join(json.dumps(row) for row in rows) + "\nnot json\n")
+        self.addCleanup(os.remove, file.name)
+
+        out, err = StringIO(), StringIO()
+        call_command("import_listings", file.name, "--owner", "owner@example.com", "--chunk-size", "2", stdout=out, stderr=err)
+        self.assertIn("Imported 5 listings", out.getvalue())
+        self.assertIn("row 6", err.getvalue())
+        self.assertEqual(Listing.amenities.through.objects.filter(amenity__name="Wifi").count(), 5)
+
+    def test_conflicting_address_fails_its_row_only(self):
+        """Test an address differing only by case is rejected and a conflict at insert fails only its row"""
+        content = self.HEADER + self.row(1) + self.row(2) + self.row(1).replace("Import Street", "IMPORT STREET ")
+        report = ListingImporter(self.owner).run(read_rows(StringIO(content), "csv"))
+        self.assertEqual((report["created"], report["failed"]), (2, 1))
+        self.assertEqual(report["errors"][0]["row"], 3)
+
+        content = self.HEADER + self.row(3) + self.row(1) + self.row(4)
+        with mock.patch.object(ListingImporter, "existing_addresses", return_value={}): #conflict only found by the db
+            report = ListingImporter(self.owner).run(read_rows(StringIO(content), "csv"))
+        self.assertEqual((report["created"], report["failed"]), (2, 1))
+        self.assertEqual(report["errors"], [{"row": 2, "errors": {"address": ["Address already exists"]}}])
+        self.assertEqual(Listing.objects.filter(title__startswith="Imported flat").count(), 4)
+
+    def test_undecodable_upload_returns_partial_report(self):
+        """Test bytes that are not UTF-8 stop the import with a row error, rows read before are reported as created"""
+        content = (self.HEADER + "".join(self.row(i) for i in range(200))).encode() + b"\xff\xfe,broken\n"
+        self.client.force_authenticate(user=self.owner)
+        response = self.client.post(reverse("listing-import"), {
+            "file": SimpleUploadedFile("listings.csv", content)
+        }, format="multipart")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertGreater(response.data["created"], 0)
+        self.assertEqual(response.data["created"], Listing.objects.filter(owner=self.owner).count())
+        self.assertEqual(response.data["failed"], 1)
+        self.assertIn("UTF-8", str(response.data["errors"][0]["errors"]))
+
+    def test_malformed_rows_are_row_errors(self):
+        """Test malformed CSV lines and amenities of a wrong type fail their rows only"""
+        content = self.HEADER + self.row(1) + f'"{"x" * 200000}",x\n' + self.row(2)
+        report = ListingImporter(self.owner).run(read_rows(StringIO(content), "csv"))
+        self.assertEqual((report["created"], report["failed"]), (2, 1))
+        self.assertEqual(report["errors"][0]["row"], 2)
+
+        base = {"title": "Imported flat", "description": "Bright flat close to the park", "house_type": "apartment",
+                "max_stayers": 2, "bedrooms": 1, "bathrooms": 1, "price_per_night": 80, "city": "Berlin",
+                "land": "berlin", "street": "Json Street", "postal_code": "10115"}
+        lines = [json.dumps({**base, "house_number": str(i), "amenities": amenities})
+                 for i, amenities in enumerate([5, [[1]], "Wifi", ["Wifi"]])]
+        report = ListingImporter(self.owner).run(read_rows(StringIO("\n".join(lines)), "jsonl"))
+        self.assertEqual((report["created"], report["failed"]), (1, 3))
+        self.assertTrue(all("amenities" in error["errors"] for error in report["errors"]))
+
+
 #Vovan@gmail.com
 #zxcvovazxc123
\ No newline at end of file
@@ -0,0 +1,198 @@
+import heapq
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Case, When, Value, PositiveIntegerField, Q
+from django.utils import timezone
+
+from core.buffers import BufferedWriter
+from .history import normalize_query
+from .models import SearchTrendBucket
+
+WINDOWS = {
+    'hour': timedelta(hours=1),
+    'day': timedelta(days=1),
+    'week': timedelta(weeks=1),
+}
+
+
+def bucket_start(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+class SpaceSaving:
+    """
+    Space-Saving heavy hitters summary
+    Tracks at most `capacity` items, the least counted one is replaced by a new item and its count is inherited,
+    so counts of tracked items can only be overestimated
+    """
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.counts = {}
+        self._heap = []  # (count, item), entries with outdated counts are skipped lazily
+
+    def add(self, item, count=1):
+        """Adds item, returns item that was evicted to make room for it"""
+        evicted = None
+        if item in self.counts:
+            self.counts[item] += count
+        elif len(self.counts) < self.capacity:
+            self.counts[item] = count
+        else:
+            while True:
+                min_count, min_item = heapq.heappop(self._heap)
+                if self.counts.get(min_item) == min_count:
+                    break
+            del self.counts[min_item]
+            evicted = min_item
+            self.counts[item] = min_count + count
+        heapq.heappush(self._heap, (self.counts[item], item))
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(value, key) for key, value in self.counts.items()]
+            heapq.heapify(self._heap)
+        return evicted
+
+
+class SearchTrends(BufferedWriter):
+    """
+    Popular searches per hourly bucket, kept with Space-Saving summaries
+    Each worker checkpoints its own increments into SearchTrendBucket and reloads the summed buckets from there,
+    so the popular searches endpoint is served from memory without scanning search history
+    """
+    name = 'search-trends'
+
+    def __init__(self):
+        super().__init__()
+        self._buckets = {}
+        self._deltas = defaultdict(Counter)  # bucket start -> increments not checkpointed yet
+        self._loaded_at = None
+        self._reload_lock = threading.Lock()
+
+    @property
+    def capacity(self):
+        return settings.SEARCH_TRENDS_CAPACITY
+
+    @property
+    def flush_seconds(self):
+        return settings.SEARCH_TRENDS_CHECKPOINT_SECONDS
+
+    @property
+    def max_pending(self):
+        return 10 * self.capacity
+
+    def _bucket(self, start):
+        summary = self._buckets.get(start)
+        if summary is None:
+            summary = self._buckets[start] = SpaceSaving(self.capacity)
+        return summary
+
+    def add(self, query, moment=None):
+        query = normalize_query(query)
+        if not query:
+            return
+        start = bucket_start(moment or timezone.now())
+        with self._lock:
+            evicted = self._bucket(start).add(query)
+            deltas = self._deltas[start]
+            deltas[query] += 1
+            if evicted is not None:
+                deltas.pop(evicted, None)
+            pending = sum(len(d) for d in self._deltas.values())
+        self._after_record(pending)
+
+    def pending(self):
+        return sum(len(d) for d in self._deltas.values())
+
+    def swap(self):
+        deltas, self._deltas = self._deltas, defaultdict(Counter)
+        return deltas
+
+    def restore(self, batch):
+        for start, deltas in batch.items():
+            self._deltas[start].update(deltas)
+
+    def clear(self):
+        with self._lock:
+            self._buckets, self._deltas, self._loaded_at = {}, defaultdict(Counter), None
+
+    def write(self, batch):
+        """Adds increments to checkpoint rows (insert missing rows first, then one UPDATE ... CASE)"""
+        keys = [(start, query) for start, deltas in batch.items() for query in deltas]
+        if not keys:
+            return 0
+        with transaction.atomic():
+            SearchTrendBucket.objects.bulk_create(
+                [SearchTrendBucket(bucket_start=start, query=query, count=0) for start, query in keys],
+                ignore_conflicts=True, batch_size=500
+            )
+            for offset in range(0, len(keys), 500):
+                chunk = keys[offset:offset + 500]
+                condition = Q()
+                for start, query in chunk:
+                    condition |= Q(bucket_start=start, query=query)
+                SearchTrendBucket.objects.filter(condition).update(count=F('count') + Case(
+                    *[When(bucket_start=start, query=query, then=Value(batch[start][query])) for start, query in chunk],
+                    default=Value(0),
+                    output_field=PositiveIntegerField()
+                ))
+        self._loaded_at = None  # show merged counts of all workers on next read
+        return len(keys)
+
+    def reload(self):
+        """Replaces in-memory buckets by checkpointed ones, keeping increments that are not checkpointed yet"""
+        since = bucket_start(timezone.now() - WINDOWS['week'])
+        rows = SearchTrendBucket.objects.filter(bucket_start__gte=since).order_by('-count').values_list(
+            'bucket_start', 'query', 'count'
+        )
+        buckets = {}
+        for start, query, count in rows:
+            summary = buckets.get(start)
+            if summary is None:
+                summary = buckets[start] = SpaceSaving(self.capacity)
+            if len(summary.counts) < summary.capacity:
+                summary.add(query, count)
+        with self._lock:
+            for start, deltas in self._deltas.items():
+                summary = buckets.get(start)
+                if summary is None:
+                    summary = buckets[start] = SpaceSaving(self.capacity)
+                for query, count in deltas.items():
+                    summary.add(query, count)
+            self._buckets = buckets
+            self._loaded_at = time.monotonic()
+
+    def _ensure_loaded(self):
+        if self._loaded_at is not None and time.monotonic() - self._loaded_at < self.flush_seconds:
+            return
+        with self._reload_lock:
+            if self._loaded_at is None or time.monotonic() - self._loaded_at >= self.flush_seconds:
+                self.reload()
+
+    def top(self, window='week', limit=10):
+        """Most popular queries of the window, merged from at most window/1h summaries"""
+        self._ensure_loaded()
+        since = bucket_start(timezone.now() - WINDOWS[window])
+        totals = Counter()
+        with self._lock:
+            for start, summary in self._buckets.items():
+                if start >= since:
+                    totals.update(summary.counts)
+        return [
+            {'query': query, 'count': count}
+            for query, count in heapq.nlargest(limit, totals.items(), key=lambda item: item[1])
+        ]
+
+    def prune(self):
+        """Drops buckets that fell out of the longest window"""
+        since = bucket_start(timezone.now() - WINDOWS['week'])
+        with self._lock:
+            self._buckets = {start: summary for start, summary in self._buckets.items() if start >= since}
+        deleted, _ = SearchTrendBucket.objects.filter(bucket_start__lt=since).delete()
+        return deleted
+
+
+search_trends = SearchTrends()
@@ -9,10 +9,14 @@ urlpatterns = [
     path('listings/my-search-history/', views.my_search_history, name='my-search-history'),
     path('listings/my-view-history/', views.my_view_history, name='my-view-history'),
 
+    path('listings/mine/stats/', views.my_listing_stats, name='my-listing-stats'),
+    path('listings/import/', views.import_listings, name='listing-import'),
     path('listings/create/', views.ListingCreateView.as_view(), name='listing-create'),
     path('listings/', views.ListingListView.as_view(), name='listing-list'),
     path('listings/<int:pk>/', views.ListingDetailView.as_view(), name='listing-detail'),
     path('listings/<int:pk>/manage/', views.ListingManageView.as_view(), name='listing-manage'),
     path('listings/<int:pk>/toggle-status/', views.toggle_listing_status, name='listing-toggle'),
     path('listings/<int:pk>/add-image/', views.add_listing_image, name='listing-add-image'),
+    path('listings/<int:pk>/pricing-rules/', views.ListingPricingRulesView.as_view(), name='listing-pricing-rules'),
+    path('listings/pricing-rules/<int:pk>/', views.PricingRuleManageView.as_view(), name='pricing-rule-manage'),
 ]
\ No newline at end of file
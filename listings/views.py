@@ -1,30 +1,72 @@
+import io
+from datetime import date, timedelta
+
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, parser_classes
 from rest_framework.generics import (
     ListAPIView, RetrieveAPIView,
     ListCreateAPIView, RetrieveUpdateDestroyAPIView
 )
-from rest_framework import filters
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
-from drf_spectacular.utils import extend_schema
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema, extend_schema_view, OpenApiParameter
 
-from .models import Listing, Amenity
+from .models import Listing, ListingImg, Amenity, PricingRule
 from .serializers import (
     ListingSerializer, ListingDetailSerializer,
     ListingCreateSerializer, AmenitySerializer,
-    ListingImgSerializer
+    ListingImgSerializer, PricingRuleSerializer
 )
 from .services import ListingService
+from .filters import ListingOrderingFilter
+from .trends import WINDOWS
+from .counters import view_counter
+from .importer import ListingImporter, read_rows, IMPORT_FORMATS
+from users.models import User
 from users.permissions import Owner, AdminOrOwner
+from core.enums import Land, UserRole
+from core.cache import cache_response, response_cache
+from core.conditional import ConditionalRetrieveMixin, related_version, not_modified, set_validators
+
+
+def listing_tags(data, kwargs):
+    """Cache tags of listings on a (paginated) list response"""
+    items = data['results'] if isinstance(data, dict) else data
+    return [f'listing:{item["id"]}' for item in items]
+
+
+def listing_list_tags(request, kwargs):
+    """Pages filtered by stay dates also depend on the availability index"""
+    if request.query_params.get('check_in') or request.query_params.get('check_out'):
+        return ['listings', 'booked-nights']
+    return ['listings']
 
 
+def listing_list_defaults(request):
+    """Params left out of the cache key, ordering is only a no-op without search (relevance order)"""
+    if request.query_params.get('search'):
+        return {'page': '1'}
+    return {'page': '1', 'ordering': '-created_at'}
+
+
+@extend_schema_view(get=extend_schema(parameters=[
+    OpenApiParameter('search', OpenApiTypes.STR, description='Full text search, results in relevance order unless ordering is given'),
+    OpenApiParameter('check_in', OpenApiTypes.DATE, description='Only listings free from this date, requires check_out'),
+    OpenApiParameter('check_out', OpenApiTypes.DATE, description='Only listings free until this date'),
+    OpenApiParameter('guests', OpenApiTypes.INT, description='Only listings for at least this many guests'),
+], description='With check_in/check_out every listing gets nights and total_price of the stay. '
+                   'total_price is priced per page for display only and is not an ordering field'))
 class ListingListView(ListAPIView):
     """List of active listings with search and filtering options"""
     serializer_class = ListingSerializer
     permission_classes = [AllowAny]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, ListingOrderingFilter] # search param is handled by ListingOrderingFilter
     filterset_fields = {
         'house_type': ['exact'],
         'bedrooms': ['exact', 'gte', 'lte'],
@@ -33,16 +75,34 @@ class ListingListView(ListAPIView):
         'price_per_night': ['gte', 'lte'],
         'address__city': ['exact', 'icontains'],
         'address__land': ['exact'],
+        'avg_rating': ['gte', 'lte'],
     }
-    search_fields = ['title', 'description', 'address__city']
-    ordering_fields = ['price_per_night', 'created_at', 'views_count']
+    ordering_fields = ['price_per_night', 'created_at', 'views_count', 'avg_rating']
     ordering = ['-created_at']
 
     def get_queryset(self):
-        user = self.request.user if self.request.user.is_authenticated else None
-        return ListingService.search_listings(self.request.query_params, user)
+        return ListingService.search_listings(self.request.query_params)
+
+    def list(self, request, *args, **kwargs):
+        search = request.query_params.get('search')
+        if search: #recorded before the cache lookup, so searches served from cache are counted too
+            user = request.user if request.user.is_authenticated else None
+            ListingService.record_search(search, user, request.META.get('REMOTE_ADDR'))
+        return self.cached_list(request, *args, **kwargs)
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        check_in, check_out = self.request.query_params.get('check_in'), self.request.query_params.get('check_out')
+        if page is not None and (check_in or check_out): #dates were validated by search_listings
+            ListingService.add_stay_prices(page, *ListingService.parse_stay(check_in, check_out))
+        return page
+
+    @cache_response('listing-list', tags=listing_list_tags, tags_for=listing_tags,
+                    defaults=listing_list_defaults)
+    def cached_list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
 
-class ListingDetailView(RetrieveAPIView):
+class ListingDetailView(ConditionalRetrieveMixin, RetrieveAPIView):
     """Listing detail view"""
     queryset = Listing.objects.filter(is_active=True).select_related(
         'owner', 'address'
@@ -50,13 +110,46 @@ class ListingDetailView(RetrieveAPIView):
     serializer_class = ListingDetailSerializer
     permission_classes = [AllowAny]
     lookup_field = 'pk'
+    #views_count is left out, buffered views would change the version on every flush
+    version_fields = (
+        'updated_at', 'address__updated_at', 'owner__updated_at', 'rating_sum', 'rating_count',
+        'images_updated', 'images_count', 'amenities_updated', 'amenities_count'
+    )
+
+    def get_version_queryset(self):
+        images_updated, images_count = related_version(ListingImg.objects.all(), 'listing')
+        amenities_updated, amenities_count = related_version(
+            Listing.amenities.through.objects.all(), 'listing', 'amenity__updated_at'
+        )
+        return Listing.objects.filter(is_active=True).annotate(
+            images_updated=images_updated, images_count=images_count,
+            amenities_updated=amenities_updated, amenities_count=amenities_count
+        )
 
     def retrieve(self, request, *args, **kwargs):
-        instance = self.get_object()
+        pk = kwargs[self.lookup_field]
         user = request.user if request.user.is_authenticated else None
-        ListingService.increment_views(instance, user)
-        serializer = self.get_serializer(instance)
-        return Response(serializer.data)
+        if 'HTTP_IF_NONE_MATCH' in request.META or 'HTTP_IF_MODIFIED_SINCE' in request.META:
+            validators = self.get_version()
+            if validators is None:
+                raise Http404
+            response = not_modified(request, *validators)
+            if response is not None: #client still has the listing, the view is counted anyway
+                view_counter.record(pk, user.pk if user else None)
+                return response
+
+        key = response_cache.make_key(f'listing-detail:{pk}', request)
+        entry = response_cache.get('listing-detail', key)
+        if entry is None:
+            versions = response_cache.tag_versions([f'listing:{pk}', 'amenities'])
+            validators = self.get_version() #read before the object, so a concurrent change gives a stale ETag, not a stale body
+            instance = self.get_object()
+            ListingService.increment_views(instance, user)
+            entry = {'data': self.get_serializer(instance).data, 'validators': validators}
+            response_cache.set(key, entry, versions)
+        else:
+            view_counter.record(pk, user.pk if user else None)
+        return set_validators(Response(entry['data']), *entry['validators'])
 
 class ListingCreateView(ListCreateAPIView):
     """Creating and listing of listings by user"""
@@ -64,7 +157,7 @@ class ListingCreateView(ListCreateAPIView):
     permission_classes = [Owner]
 
     def get_queryset(self):
-        return Listing.objects.filter(owner=self.request.user)
+        return Listing.objects.filter(owner=self.request.user).select_related('address')
 
 class ListingManageView(RetrieveUpdateDestroyAPIView):
     """deletion, update or retrieval of listing"""
@@ -77,6 +170,69 @@ class ListingManageView(RetrieveUpdateDestroyAPIView):
             return Listing.objects.all()
         return Listing.objects.filter(owner=self.request.user)
 
+class ListingPricingRulesView(ListCreateAPIView):
+    """Pricing rules of an own listing"""
+    serializer_class = PricingRuleSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = None
+
+    def get_listing(self):
+        listings = Listing.objects.all() if self.request.user.is_admin else Listing.objects.filter(owner=self.request.user)
+        return get_object_or_404(listings.only('pk'), pk=self.kwargs['pk'])
+
+    def get_queryset(self):
+        return PricingRule.objects.filter(listing=self.get_listing())
+
+    def perform_create(self, serializer):
+        serializer.save(listing=self.get_listing())
+
+class PricingRuleManageView(RetrieveUpdateDestroyAPIView):
+    """Update or deletion of a pricing rule"""
+    serializer_class = PricingRuleSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        if self.request.user.is_admin:
+            return PricingRule.objects.all()
+        return PricingRule.objects.filter(listing__owner=self.request.user)
+
+@extend_schema(
+    request={'multipart/form-data': {
+        'type': 'object',
+        'properties': {
+            'file': {'type': 'string', 'format': 'binary'},
+            'format': {'type': 'string', 'enum': list(IMPORT_FORMATS)},
+            'owner_id': {'type': 'integer'},
+        },
+    }},
+    responses={200: dict},
+    description='Bulk import of listings from a CSV or JSONL file (format by extension unless given), '
+                'admins may import for another owner. Returns created/failed counts and errors per row'
+)
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@parser_classes([MultiPartParser])
+def import_listings(request):
+    """Bulk listing import"""
+    if not (request.user.is_owner or request.user.is_admin):
+        return Response({'error': 'Only owners can import listings'}, status=status.HTTP_403_FORBIDDEN)
+
+    upload = request.FILES.get('file')
+    if not upload:
+        return Response({'error': 'File is required'}, status=status.HTTP_400_BAD_REQUEST)
+    fmt = request.data.get('format') or upload.name.rsplit('.', 1)[-1].lower()
+    if fmt not in IMPORT_FORMATS:
+        return Response({'error': f'Format must be one of {", ".join(IMPORT_FORMATS)}'}, status=status.HTTP_400_BAD_REQUEST)
+
+    owner = request.user
+    if request.user.is_admin and request.data.get('owner_id'):
+        owner = User.objects.filter(pk=request.data['owner_id'], role=UserRole.owner.name).first()
+        if owner is None:
+            return Response({'error': 'Owner not found'}, status=status.HTTP_400_BAD_REQUEST)
+
+    report = ListingImporter(owner).run(read_rows(io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline=''), fmt))
+    return Response(report)
+
 @api_view(['POST'])
 @permission_classes([AdminOrOwner])
 def toggle_listing_status(request, pk):
@@ -102,6 +258,10 @@ class AmenityListView(ListAPIView):
     serializer_class = AmenitySerializer
     permission_classes = [AllowAny]
 
+    @cache_response('amenity-list', tags=['amenities'], defaults={'page': '1'})
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
 @api_view(['POST'])
 @permission_classes([Owner])
 def add_listing_image(request, pk):
@@ -121,13 +281,20 @@ def add_listing_image(request, pk):
     serializer = ListingImgSerializer(img_obj, context={'request': request})
     return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-@extend_schema(responses={200: dict}, description='Get popular search queries')
+@extend_schema(
+    parameters=[OpenApiParameter('window', str, enum=list(WINDOWS), description='Time window, week by default')],
+    responses={200: dict},
+    description='Get popular search queries'
+)
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def popular_searches(request):
     """List of popular search queries"""
-    searches = ListingService.get_popular_searches(limit=10)
-    return Response(list(searches))
+    window = request.query_params.get('window', 'week')
+    if window not in WINDOWS:
+        return Response({'error': f'window must be one of: {", ".join(WINDOWS)}'}, status=status.HTTP_400_BAD_REQUEST)
+    searches = ListingService.get_popular_searches(limit=10, window=window)
+    return Response(searches)
 
 @extend_schema(responses={200: dict}, description='Get current user search history')
 @api_view(['GET'])
@@ -155,11 +322,50 @@ def my_view_history(request):
         for h in history
     ])
 
-@extend_schema(responses={200: ListingSerializer(many=True)}, description='Get most popular listings')
+@extend_schema(
+    parameters=[
+        OpenApiParameter('from', OpenApiTypes.DATE, description='Start of the revenue period, 30 days ago by default'),
+        OpenApiParameter('to', OpenApiTypes.DATE, description='End of the revenue period (exclusive), today by default'),
+    ],
+    responses={200: dict},
+    description='Owned listings with booking counts, upcoming booked nights, revenue for the period, rating and views'
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def my_listing_stats(request):
+    """Portfolio stats of the owner, all listings in one query"""
+    try:
+        end = date.fromisoformat(request.query_params['to']) if 'to' in request.query_params else timezone.now().date()
+        start = date.fromisoformat(request.query_params['from']) if 'from' in request.query_params else end - timedelta(days=30)
+    except ValueError:
+        return Response({'error': 'Dates must be in YYYY-MM-DD format'}, status=status.HTTP_400_BAD_REQUEST)
+    if end <= start:
+        return Response({'error': 'to must be after from'}, status=status.HTTP_400_BAD_REQUEST)
+
+    listings = list(ListingService.get_owner_stats(request.user, start, end))
+    totals = {
+        field: sum(listing[field] for listing in listings)
+        for field in ('pending_bookings', 'confirmed_bookings', 'completed_bookings', 'upcoming_nights', 'revenue', 'views_count')
+    }
+    return Response({'from': start, 'to': end, 'totals': totals, 'listings': listings})
+
+@extend_schema(
+    parameters=[
+        OpenApiParameter('city', str, description='Only listings in this city'),
+        OpenApiParameter('land', str, enum=[land.name for land in Land], description='Only listings in this land'),
+    ],
+    responses={200: ListingSerializer(many=True)},
+    description='Get trending listings'
+)
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@cache_response('popular-listings', tags=['listings'], tags_for=listing_tags)
 def popular_listings(request):
-    """List of most popular listings by views"""
-    listings = ListingService.get_popular_listings(limit=10)
+    """List of trending listings by time-decayed views, favorites and bookings"""
+    listings = ListingService.get_popular_listings(
+        limit=10,
+        city=request.query_params.get('city'),
+        land=request.query_params.get('land')
+    )
     serializer = ListingSerializer(listings, many=True, context={'request': request})
     return Response(serializer.data)
\ No newline at end of file
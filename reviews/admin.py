@@ -1,6 +1,8 @@
 from django.contrib import admin
 from django import forms
 from .models import Review, ReviewImg
+from .services import ReviewService
+from listings.services import ListingService
 
 
 class ReviewAdminForm(forms.ModelForm):
@@ -31,6 +33,18 @@ class ReviewAdmin(admin.ModelAdmin):
         ('Timestamps', {'fields': ('created_at', 'updated_at'), 'classes': ('collapse',)}),
     )
 
+    def save_model(self, request, obj, form, change):
+        if change:
+            ReviewService.update_review(obj, {})
+            if 'listing' in form.changed_data: #review moved to another listing
+                ListingService.rebuild_ratings([obj.listing_id, form.initial['listing']])
+        else:
+            super().save_model(request, obj, form, change)
+            ListingService.update_rating(obj.listing_id, obj.rating, 1)
+
+    def delete_model(self, request, obj):
+        ReviewService.delete_review(obj)
+
 
 @admin.register(ReviewImg)
 class ReviewImgAdmin(admin.ModelAdmin):
@@ -39,38 +39,10 @@ class ReviewCreateSerializer(serializers.ModelSerializer):
         fields = ['listing_id', 'rating', 'comment']
 
     def create(self, validated_data):
-        from listings.models import Listing
-        from bookings.models import Booking
-        from core.enums import BookingStatus
-
-        listing_id = validated_data.pop('listing_id')
-        user = self.context['request'].user
+        from .services import ReviewService
+        from core.exceptions import ReviewError
 
         try:
-            listing = Listing.objects.get(id=listing_id, is_active=True)
-        except Listing.DoesNotExist:
-            raise serializers.ValidationError('Listing not found or inactive')
-
-        if listing.owner == user:
-            raise serializers.ValidationError('Cannot review your own listing')
-
-        if Review.objects.filter(author=user, listing=listing).exists():
-            raise serializers.ValidationError('You have already reviewed this listing')
-
-        completed_booking = Booking.objects.filter(
-            tenant=user,
-            listing=listing,
-            book_status=BookingStatus.completed.name
-        ).first()
-
-        if not completed_booking:
-            raise serializers.ValidationError('You must have a completed booking to leave a review')
-
-        review = Review.objects.create(
-            author=user,
-            listing=listing,
-            booking=completed_booking,
-            **validated_data
-        )
-
-        return review
\ No newline at end of file
+            return ReviewService.create_review(self.context['request'].user, validated_data)
+        except ReviewError as e:
+            raise serializers.ValidationError(str(e.detail))
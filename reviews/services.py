@@ -2,9 +2,11 @@ import logging
 from django.db import transaction, IntegrityError
 from .models import Review
 from listings.models import Listing
+from listings.services import ListingService
 from bookings.models import Booking
 from core.enums import BookingStatus
 from core.exceptions import ReviewError
+from core.loader import load, forget, get_object
 
 
 logger = logging.getLogger(__name__)
@@ -13,16 +15,20 @@ class ReviewService:
     """Service for reviews logic"""
     @staticmethod
     def can_review(user, listing):
-        if listing.owner == user:
+        if listing.owner_id == user.id:
             raise ReviewError('Cannot review your own listing')
 
-        if Review.objects.filter(listing=listing, author=user).exists():
+        reviewed = load(
+            ('review-exists', listing.id, user.id),
+            lambda: Review.objects.filter(listing=listing, author=user).exists()
+        )
+        if reviewed:
             raise ReviewError('You have already reviewed this listing')
 
-        completed_booking = Booking.objects.filter(
+        completed_booking = load(('completed-booking', listing.id, user.id), lambda: Booking.objects.filter(
             listing=listing,
             tenant=user,
-            book_status=BookingStatus.completed.name).first()
+            book_status=BookingStatus.completed.name).first())
 
         if not completed_booking:
             raise ReviewError('You must have a completed booking to leave a review')
@@ -34,7 +40,7 @@ class ReviewService:
         listing_id = validated_data.pop('listing_id')
 
         try:
-            listing = Listing.objects.get(id=listing_id, is_active=True)
+            listing = get_object(Listing, id=listing_id, is_active=True)
         except Listing.DoesNotExist:
             raise ReviewError('Listing not found or inactive')
 
@@ -50,6 +56,30 @@ class ReviewService:
                 )
             except IntegrityError:
                 raise ReviewError('You have already reviewed this listing')
+            ListingService.update_rating(listing.id, review.rating, 1)
+        forget(('review-exists', listing.id, author.id))
 
         logger.info(f'Created review {review.id} for listing {listing.id}')
-        return review
\ No newline at end of file
+        return review
+
+    @staticmethod
+    def update_review(review, validated_data):
+        """Updates review and keeps listing rating aggregates in sync"""
+        with transaction.atomic():
+            old_rating = Review.objects.select_for_update().values_list('rating', flat=True).get(pk=review.pk)
+            for field, value in validated_data.items():
+                setattr(review, field, value)
+            review.save()
+            if review.rating != old_rating:
+                ListingService.update_rating(review.listing_id, review.rating - old_rating, 0)
+
+        logger.info(f'Updated review {review.id}')
+        return review
+
+    @staticmethod
+    def delete_review(review):
+        """Deletes review, listing aggregates are recalculated by the post_delete signal"""
+        with transaction.atomic():
+            review.delete()
+
+        logger.info(f'Deleted review for listing {review.listing_id}')
\ No newline at end of file
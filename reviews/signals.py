@@ -0,0 +1,17 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Review
+from core.cache import response_cache
+from listings.services import ListingService
+
+
+@receiver([post_save, post_delete], sender=Review)
+def purge_listing_reviews(sender, instance, **kwargs):
+    response_cache.purge_on_commit(f'reviews:listing:{instance.listing_id}')
+
+
+@receiver(post_delete, sender=Review)
+def recalculate_listing_rating(sender, instance, **kwargs):
+    #also runs for reviews cascade deleted with their author or booking
+    ListingService.rebuild_ratings([instance.listing_id])
@@ -1,4 +1,7 @@
 from datetime import timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.core.cache import cache
 from django.test import TestCase
 from django.urls import reverse
 from django.utils import timezone
@@ -7,6 +10,7 @@ from rest_framework import status
 from .models import Review
 from users.models import User
 from listings.models import Listing, Address
+from listings.services import ListingService
 from bookings.models import Booking
 
 
@@ -86,6 +90,7 @@ class ReviewModelTest(TestCase):
 class ReviewAPITest(APITestCase):
     """Tests for review API endpoints"""
     def setUp(self):
+        cache.clear()
         self.owner = User.objects.create_user(
             email="owner@example.com",
             username="owner",
@@ -208,4 +213,84 @@ class ReviewAPITest(APITestCase):
             "comment": "Second review attempt"
         }
         response = self.client.post(url, data)
-        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class ListingRatingAggregateTest(APITestCase):
+    """Tests for denormalized listing rating aggregates"""
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(
+            email="owner@example.com",
+            username="owner",
+            password="pass123",
+            role="owner"
+        )
+        self.tenant = User.objects.create_user(
+            email="tenant@example.com",
+            username="tenant",
+            password="pass123",
+            role="tenant"
+        )
+        self.admin = User.objects.create_superuser(
+            email="admin@example.com",
+            username="admin",
+            password="pass123"
+        )
+        self.listing = Listing.objects.create(
+            owner=self.owner,
+            title="Berlin Apartment",
+            description="Central location in Berlin",
+            address=Address.objects.create(city="Berlin", street="Test Street", postal_code="12345"),
+            price_per_night=100.00,
+            bedrooms=3,
+            bathrooms=1,
+            max_stayers=4,
+            house_type="apartment"
+        )
+        Booking.objects.create(
+            listing=self.listing,
+            tenant=self.tenant,
+            check_in=timezone.now().date() - timedelta(days=10),
+            check_out=timezone.now().date() - timedelta(days=5),
+            stayers=2,
+            book_status="completed"
+        )
+
+    def test_aggregates_follow_review_changes(self):
+        """Test create, update and delete keep rating aggregates correct"""
+        self.client.force_authenticate(user=self.tenant)
+        response = self.client.post(reverse("review-create"), {
+            "listing_id": self.listing.id,
+            "rating": 4,
+            "comment": "Excellent place to stay!"
+        })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.listing.refresh_from_db()
+        self.assertEqual((self.listing.rating_count, self.listing.avg_rating), (1, 4.0))
+
+        review = Review.objects.get(author=self.tenant)
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.patch(reverse("review-detail", args=[review.id]), {"rating": 2}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.listing.refresh_from_db()
+        self.assertEqual((self.listing.rating_sum, self.listing.avg_rating), (2, 2.0))
+
+        response = self.client.delete(reverse("review-detail", args=[review.id]))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.listing.refresh_from_db()
+        self.assertEqual((self.listing.rating_count, self.listing.avg_rating), (0, 0))
+
+    def test_aggregates_follow_cascade_delete(self):
+        """Test deleting a review author removes the rating from listing aggregates"""
+        Review.objects.create(listing=self.listing, author=self.tenant, rating=5, comment="Great place!")
+        ListingService.rebuild_ratings([self.listing.id])
+        self.tenant.delete()
+        self.listing.refresh_from_db()
+        self.assertEqual((self.listing.rating_sum, self.listing.rating_count, self.listing.avg_rating), (0, 0, 0))
+
+    def test_rebuild_command(self):
+        """Test rebuild command backfills aggregates of existing reviews"""
+        Review.objects.create(listing=self.listing, author=self.tenant, rating=5, comment="Great place!")
+        call_command("rebuild_listing_ratings", stdout=StringIO())
+        self.listing.refresh_from_db()
+        self.assertEqual((self.listing.rating_sum, self.listing.rating_count, self.listing.avg_rating), (5, 1, 5.0))
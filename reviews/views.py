@@ -9,6 +9,7 @@ from .serializers import ReviewSerializer, ReviewCreateSerializer
 from .services import ReviewService
 from core.exceptions import ReviewError
 from users.permissions import AdminOrOwner
+from core.cache import cache_response
 
 
 logger = logging.getLogger(__name__)
@@ -22,6 +23,11 @@ class ListingReviewsView(ListAPIView):
         listing_id = self.kwargs.get('listing_id')
         return Review.objects.filter(listing_id=listing_id).select_related('author')
 
+    @cache_response('listing-reviews', tags=lambda request, kwargs: [f'reviews:listing:{kwargs["listing_id"]}'],
+                    defaults={'page': '1'})
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
 class MyReviewsView(ListAPIView):
     """Lists all reviews created by current user"""
     serializer_class = ReviewSerializer
@@ -57,4 +63,10 @@ class ReviewManageView(RetrieveUpdateDestroyAPIView):
     def get_queryset(self):
         if self.request.user.is_admin:
             return Review.objects.all()
-        return Review.objects.filter(author=self.request.user)
\ No newline at end of file
+        return Review.objects.filter(author=self.request.user)
+
+    def perform_update(self, serializer):
+        serializer.instance = ReviewService.update_review(serializer.instance, serializer.validated_data)
+
+    def perform_destroy(self, instance):
+        ReviewService.delete_review(instance)
\ No newline at end of file
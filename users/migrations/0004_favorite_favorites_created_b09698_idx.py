@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-17 04:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0012_listing_trending_score_and_more'),
+        ('users', '0003_alter_user_username'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='favorite',
+            index=models.Index(fields=['created_at'], name='favorites_created_b09698_idx'),
+        ),
+    ]
@@ -110,6 +110,7 @@ class Favorite(TimestampMixin):
         verbose_name_plural = 'Favourites'
         unique_together = ('user', 'listing')
         ordering = ['-created_at']
+        indexes = [models.Index(fields=['created_at'])]
 
     def __str__(self):
         return f"{self.user.email} -> {self.listing_id}"
@@ -21,6 +21,7 @@ from .serializers import (
 )
 from .services import UserService, FavoriteService
 from .throttling import LoginRateThrottle, RegisterRateThrottle
+from core.conditional import make_validators, not_modified, set_validators
 
 logger = logging.getLogger(__name__)
 
@@ -159,7 +160,12 @@ class UserDetailView(RetrieveAPIView):
 @permission_classes([IsAuthenticated])
 def current_user(request):
     """Returns a current user"""
-    return Response(UserProfileSerializer(request.user).data)
+    #user is already loaded by authentication, age depends on the current date
+    validators = make_validators([request.user.updated_at], by_day=True)
+    response = not_modified(request, *validators)
+    if response is not None:
+        return response
+    return set_validators(Response(UserProfileSerializer(request.user).data), *validators)
 
 
 @extend_schema(